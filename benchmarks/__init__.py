@@ -0,0 +1,4 @@
+"""Micro-benchmarks for the framework's own hot paths.
+
+Run with ``python -m benchmarks.run``; see that module for options.
+"""
@@ -0,0 +1,178 @@
+"""Benchmark cases.
+
+Each case is a factory that builds its fixtures for a given payload size
+and returns the zero-argument callable to time. Every case is run at a
+``realistic`` size (what the UAT API returns) and an ``extreme`` one.
+"""
+
+import importlib.util
+import json
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Tuple
+
+from benchmarks import payloads
+from utils.artifact_store import artifact_store
+from utils.assertions import assertions
+from utils.candle_aggregator import CandleAggregator
+from utils.config_manager import ConfigManager, config
+from utils.logger import Logger
+from utils.soft_assertions import SoftAssertions
+
+STEPS_DIR = Path(__file__).resolve().parent.parent / "features" / "steps"
+
+# name -> (factory, {size label: size})
+CASES: Dict[str, Tuple[Callable[[int], Callable[[], None]], Dict[str,
+                                                                int]]] = {}
+_step_modules = {}
+
+
+def benchmark(name: str, realistic: int, extreme: int):
+    """Register a case factory under ``name``."""
+    def decorator(factory):
+        CASES[name] = (factory, {'realistic': realistic, 'extreme': extreme})
+        return factory
+
+    return decorator
+
+
+def load_steps(filename: str):
+    """Load a step module the way behave does, once per process.
+
+    Step modules are not importable packages, and their decorators register
+    with behave's global registry, so each file is executed only once.
+    """
+    if filename not in _step_modules:
+        spec = importlib.util.spec_from_file_location(
+            f"benchmark_steps_{Path(filename).stem}", STEPS_DIR / filename)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _step_modules[filename] = module
+    return _step_modules[filename]
+
+
+@benchmark('assert_json_contains', realistic=300, extreme=64)
+def bench_assert_json_contains(size: int):
+    """Key lookup on a candlestick response, or a ``size``-deep path."""
+    if size >= 100:
+        data = payloads.candlestick_response(size)
+        key_path = 'result.instrument_name'
+        expected = 'BTCUSD-PERP'
+    else:
+        data = payloads.nested_json(size, 50)
+        key_path = '.'.join(['k0'] * size)
+        expected = 1
+    return lambda: assertions.assert_json_contains(data, key_path, expected)
+
+
+@benchmark('ws_receive_decode', realistic=50, extreme=5000)
+def bench_ws_receive_decode(size: int):
+    """``WebSocketClient.receive_message`` on a book frame with ``size`` levels."""
+    steps = load_steps('bookAPI.py')
+    client = steps.WebSocketClient('wss://benchmark.invalid')
+    client.ws = payloads.FakeWebSocket(json.dumps(payloads.book_message(size)))
+    client.connected = True
+
+    def run():
+        client.receive_message()
+        client.messages.clear()
+        artifact_store.end_scenario(failed=False)
+
+    return run
+
+
+@benchmark('book_order_entries', realistic=50, extreme=5000)
+def bench_book_order_entries(size: int):
+    """Order entry validation over ``size`` asks and bids."""
+    steps = load_steps('bookAPI.py')
+    context = SimpleNamespace(ws_response=payloads.book_message(size))
+    return lambda: steps.step_order_entries_have_required_fields(context)
+
+
+@benchmark('trade_entries', realistic=50, extreme=5000)
+def bench_trade_entries(size: int):
+    """Trade entry validation over ``size`` trades."""
+    steps = load_steps('bookAPI.py')
+    context = SimpleNamespace(ws_response=payloads.trade_message(size))
+    return lambda: steps.step_trade_entries_have_required_fields(context)
+
+
+@benchmark('bulk_trade_assertions', realistic=50, extreme=50000)
+def bench_bulk_trade_assertions(size: int):
+    """Unique, sorted and joined-by-id checks over ``size`` trades."""
+    trades = payloads.trade_message(size)['result']['data']
+    stream = list(reversed(trades))
+
+    def run():
+        assertions.assert_unique_by(trades, 'd')
+        assertions.assert_sorted_by(trades, 't', strict=True)
+        assertions.assert_join_by(trades, stream, 'd', fields=('p', 'q'))
+
+    return run
+
+
+@benchmark('candlestick_required_fields', realistic=300, extreme=10000)
+def bench_candlestick_required_fields(size: int):
+    """Required-field check on a candlestick response."""
+    steps = load_steps('candlestickAPI_steps.py')
+    context = SimpleNamespace(
+        response_json=payloads.candlestick_response(size))
+    return lambda: steps.step_candlestick_has_required_fields(context)
+
+
+@benchmark('candlestick_each_field', realistic=300, extreme=10000)
+def bench_candlestick_each_field(size: int):
+    """Per-candle field check over ``size`` candles."""
+    steps = load_steps('candlestickAPI_steps.py')
+    context = SimpleNamespace(
+        response_json=payloads.candlestick_response(size),
+        soft_assertions=SoftAssertions('benchmark'))
+    return lambda: steps.step_each_candlestick_has_field(context, 'v')
+
+
+@benchmark('candle_aggregate', realistic=50, extreme=5000)
+def bench_candle_aggregate(size: int):
+    """``CandleAggregator.add_message`` on a ``size``-trade frame, three timeframes."""
+    message = payloads.trade_message(size)
+    return lambda: CandleAggregator(['M1', 'M5', 'H1']).add_message(message)
+
+
+@benchmark('config_get', realistic=3, extreme=12)
+def bench_config_get(size: int):
+    """``ConfigManager.get`` of a ``size``-segment key.
+
+    The realistic case reads the real config; the extreme one a synthetic
+    config with wide levels.
+    """
+    if size <= 3:
+        config.get('logging.traffic.max_body_bytes')
+        return lambda: config.get('logging.traffic.max_body_bytes')
+    manager = ConfigManager()
+    manager._config = payloads.nested_json(size, 200)
+    key = '.'.join(['k0'] * size)
+    return lambda: manager.get(key)
+
+
+class _FormattingNullHandler(logging.Handler):
+    """Format every record, as the file handler would, then drop it."""
+    def emit(self, record: logging.LogRecord):
+        self.format(record)
+
+
+@benchmark('log_response', realistic=2000, extreme=2000000)
+def bench_log_response(size: int):
+    """``Logger.log_response`` for a response with a ``size``-byte body.
+
+    The logger is forced to DEBUG whatever ``LOG_LEVEL`` says, so headers
+    and the body preview are rendered; records go to a handler that formats
+    and drops them, so no disk I/O is timed.
+    """
+    logger = Logger('benchmarks.log_response')
+    logger.logger.handlers = [_FormattingNullHandler()]
+    logger.logger.setLevel(logging.DEBUG)
+    logger.logger.propagate = False
+    candles = max(1, size // 120)
+    response = payloads.FakeResponse(payloads.candlestick_response(candles))
+    return lambda: logger.log_response(
+        200, elapsed_time=0.1, response=response)
@@ -0,0 +1,126 @@
+"""Synthetic payloads and transport fakes for the benchmarks."""
+
+import json
+import random
+from typing import Any, Dict
+
+_rng = random.Random(42)
+
+
+def _price() -> str:
+    return f"{_rng.uniform(10000, 90000):.1f}"
+
+
+def _size() -> str:
+    return f"{_rng.uniform(0.0001, 50):.4f}"
+
+
+def book_message(levels: int) -> Dict[str, Any]:
+    """Build a ``book`` channel message with ``levels`` asks and bids."""
+    return {
+        "id": -1,
+        "method": "subscribe",
+        "code": 0,
+        "result": {
+            "instrument_name": "BTCUSD-PERP",
+            "subscription": "book.BTCUSD-PERP.10",
+            "channel": "book",
+            "depth": levels,
+            "data": [{
+                "update": {
+                    "asks": [[_price(), _size(),
+                              str(_rng.randint(1, 20))]
+                             for _ in range(levels)],
+                    "bids": [[_price(), _size(),
+                              str(_rng.randint(1, 20))]
+                             for _ in range(levels)],
+                },
+                "t": 1700000000000,
+                "tt": 1700000000000,
+                "u": 1,
+                "pu": 0,
+                "cs": 0,
+            }],
+        },
+    }
+
+
+def trade_message(trades: int) -> Dict[str, Any]:
+    """Build a ``trade`` channel message with ``trades`` entries."""
+    return {
+        "id": -1,
+        "method": "subscribe",
+        "code": 0,
+        "result": {
+            "instrument_name": "BTCUSD-PERP",
+            "subscription": "trade.BTCUSD-PERP",
+            "channel": "trade",
+            "data": [{
+                "d": str(4611686018427387904 + i),
+                "t": 1700000000000 + i,
+                "p": _price(),
+                "q": _size(),
+                "s": "BUY" if i % 2 else "SELL",
+                "i": "BTCUSD-PERP",
+                "m": str(6000000000000 + i),
+            } for i in range(trades)],
+        },
+    }
+
+
+def candlestick_response(candles: int) -> Dict[str, Any]:
+    """Build a ``get-candlestick`` response with ``candles`` entries."""
+    return {
+        "id": -1,
+        "method": "public/get-candlestick",
+        "code": 0,
+        "result": {
+            "interval": "M5",
+            "instrument_name": "BTCUSD-PERP",
+            "data": [{
+                "o": _price(),
+                "h": _price(),
+                "l": _price(),
+                "c": _price(),
+                "v": _size(),
+                "t": 1700000000000 + i * 300000,
+            } for i in range(candles)],
+        },
+    }
+
+
+def nested_json(depth: int, width: int) -> Dict[str, Any]:
+    """Build a dict ``depth`` levels deep with ``width`` keys per level.
+
+    The path ``k0.k0...`` (``depth`` segments) leads to the leaf value 1.
+    """
+    node: Any = 1
+    for _ in range(depth):
+        level = {f"k{i}": i for i in range(1, width)}
+        level["k0"] = node
+        node = level
+    return node
+
+
+class FakeWebSocket:
+    """Stands in for ``websocket.WebSocket``; returns one frame forever."""
+    def __init__(self, frame: str):
+        self.frame = frame
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self) -> str:
+        return self.frame
+
+
+class FakeResponse:
+    """Minimal ``requests.Response`` stand-in for logging benchmarks."""
+    def __init__(self, body: Dict[str, Any], status_code: int = 200):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+        self.content = self.text.encode('utf-8')
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(self.content)),
+        }
@@ -0,0 +1,265 @@
+"""Run the micro-benchmarks and compare them with the stored baseline.
+
+Throughput is reported relative to a fixed pure-Python calibration loop, so
+a baseline recorded on one machine is usable on another. The calibration
+loop is timed right before every repeat of every case, and the median ratio
+is kept, so CPU frequency changes and noisy neighbours during a run cancel
+out. A case regresses when its relative throughput drops, or its peak
+allocation grows, by more than the tolerance; cases that were noisy when
+the baseline was recorded get a looser tolerance of their own::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --filter trade --repeat 3
+    python -m benchmarks.run --update-baseline
+
+The baseline is always written from a full run, so every case in it shares
+one calibration.
+
+Logging goes to a temporary file at WARNING by default, so the numbers are
+the framework's CPU cost rather than disk I/O; set ``LOG_LEVEL`` and
+``LOG_FILE_LEVEL`` to include it.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+def _calibrate() -> None:
+    """Fixed workload of dict, string and list operations."""
+    table = {str(i): i for i in range(200)}
+    total = 0
+    for key in table:
+        total += table[key] + len(key.replace('1', ''))
+    [x * 2 for x in range(200)]
+
+
+# Tolerance recorded for a case is its spread times this, within the bounds
+SPREAD_FACTOR = 3
+MAX_CASE_TOLERANCE = 0.6
+
+
+def measure_throughput(func, repeat: int) -> float:
+    """Median-of-``repeat`` calls per second, each run lasting ~0.2s."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return number / statistics.median(
+        timer.repeat(repeat=repeat, number=number))
+
+
+def measure_relative(func, calibration: timeit.Timer, calibration_number: int,
+                     repeat: int) -> Dict[str, float]:
+    """Throughput of ``func`` relative to the calibration loop.
+
+    Each repeat times the calibration loop and then ``func``, so both see
+    the same machine state.
+
+    Returns:
+        Median ``ops_per_sec`` and ``relative`` throughput, and ``spread``,
+        the interquartile range of the ratios over their median
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    rates, ratios = [], []
+    for _ in range(repeat):
+        calibration_rate = calibration_number / calibration.timeit(
+            calibration_number)
+        rate = number / timer.timeit(number)
+        rates.append(rate)
+        ratios.append(rate / calibration_rate)
+    relative = statistics.median(ratios)
+    spread = 0.0
+    if len(ratios) >= 4:
+        quartiles = statistics.quantiles(ratios, n=4)
+        spread = (quartiles[2] - quartiles[0]) / relative
+    return {
+        'ops_per_sec': statistics.median(rates),
+        'relative': relative,
+        'spread': spread,
+    }
+
+
+def measure_peak_memory(func) -> int:
+    """Peak bytes allocated during one (warm) call."""
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(pattern: str = '*', repeat: int = 9) -> Dict[str, Any]:
+    """Run every case matching ``pattern`` at each of its sizes.
+
+    Args:
+        pattern: Shell-style pattern on ``<case>[<size label>]``
+        repeat: Timing repeats per case
+
+    Returns:
+        Results with the calibration rate and per-case metrics
+    """
+    from benchmarks.cases import CASES
+
+    calibration_timer = timeit.Timer(_calibrate)
+    calibration_number, _ = calibration_timer.autorange()
+    calibration = measure_throughput(_calibrate, repeat)
+    results = {}
+    for name, (factory, sizes) in CASES.items():
+        for label, size in sizes.items():
+            key = f"{name}[{label}]"
+            if not fnmatch.fnmatch(key, pattern):
+                continue
+            func = factory(size)
+            measured = measure_relative(func, calibration_timer,
+                                        calibration_number, repeat)
+            results[key] = {
+                'size': size,
+                'ops_per_sec': round(measured['ops_per_sec'], 2),
+                'relative': round(measured['relative'], 6),
+                'spread': round(measured['spread'], 4),
+                'peak_bytes': measure_peak_memory(func),
+            }
+            print(f"  {key:45} {measured['ops_per_sec']:14,.1f} ops/s "
+                  f"±{measured['spread']:4.0%} "
+                  f"{results[key]['peak_bytes']:>12,} B peak")
+    return {
+        'python': platform.python_version(),
+        'calibration_ops_per_sec': round(calibration, 2),
+        'cases': results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float, memory_tolerance: float) -> List[str]:
+    """Find cases that regressed against the baseline.
+
+    Memory growth below 4 KiB is ignored as allocator noise. A case whose
+    baseline carries its own ``tolerance`` is allowed the larger of that
+    and ``tolerance``.
+
+    Args:
+        results: Output of ``run_benchmarks``
+        baseline: Stored baseline in the same format
+        tolerance: Allowed relative throughput drop (0.3 = 30%)
+        memory_tolerance: Allowed relative peak memory growth
+
+    Returns:
+        One message per regression
+    """
+    regressions = []
+    for key, current in results['cases'].items():
+        base = baseline.get('cases', {}).get(key)
+        if base is None:
+            continue
+        allowed = max(tolerance, base.get('tolerance', 0))
+        if current['relative'] < base['relative'] * (1 - allowed):
+            regressions.append(
+                f"{key}: throughput {current['relative'] / base['relative']:.0%}"
+                f" of baseline (allowed {1 - allowed:.0%})")
+        growth = current['peak_bytes'] - base['peak_bytes']
+        if growth > 4096 and growth > base['peak_bytes'] * memory_tolerance:
+            regressions.append(
+                f"{key}: peak memory {current['peak_bytes']:,} B "
+                f"(baseline {base['peak_bytes']:,} B)")
+    return regressions
+
+
+def make_baseline(results: Dict[str, Any],
+                  tolerance: float) -> Dict[str, Any]:
+    """Baseline from a full run, with a tolerance for each noisy case."""
+    cases = {}
+    for key, result in results['cases'].items():
+        case = {k: v for k, v in result.items() if k != 'spread'}
+        case_tolerance = min(MAX_CASE_TOLERANCE,
+                             result['spread'] * SPREAD_FACTOR)
+        if case_tolerance > tolerance:
+            case['tolerance'] = round(case_tolerance, 2)
+        cases[key] = case
+    return {
+        'python': results['python'],
+        'calibration_ops_per_sec': results['calibration_ops_per_sec'],
+        'cases': cases,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark framework hot paths against a baseline")
+    parser.add_argument('--filter',
+                        default='*',
+                        help="Shell pattern on case names, e.g. 'trade*'")
+    parser.add_argument('--repeat', type=int, default=9)
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.3,
+                        help="Allowed throughput drop (default: %(default)s)")
+    parser.add_argument('--memory-tolerance',
+                        type=float,
+                        default=0.10,
+                        help="Allowed peak memory growth (default: %(default)s)")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE))
+    parser.add_argument('--update-baseline',
+                        action='store_true',
+                        help="Write the results as the new baseline")
+    parser.add_argument('--json-out', help="Also write results to this file")
+    args = parser.parse_args(argv)
+    if args.update_baseline and args.filter != '*':
+        parser.error("--update-baseline needs a full run; drop --filter")
+
+    # Step modules read test_data/ relative to the working directory
+    os.chdir(ROOT_DIR)
+    log_dir = tempfile.mkdtemp(prefix='benchmarks-')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE', os.path.join(log_dir, 'benchmarks.log'))
+    os.environ.setdefault('TRAFFIC_LOG', 'false')
+
+    print("Running benchmarks")
+    results = run_benchmarks(args.filter, args.repeat)
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline = make_baseline(results, args.tolerance)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline")
+        return 0
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance,
+                          args.memory_tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
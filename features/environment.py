@@ -4,12 +4,23 @@ import os
 import sys
 from pathlib import Path
 
+from behave.model import Status
+
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from utils.logger import get_logger
-from utils.config_manager import config
+from utils.artifact_store import artifact_store
+from utils.logger import get_logger, set_log_scenario
+from utils.instrument_catalog import InstrumentCatalog
+from utils.profiling import profiler
+from utils.run_context import RunContext
+from utils.run_history import run_history
+from utils.scenario_matrix import ScenarioMatrix, is_matrix_outline, parse_shard
+from utils.soft_assertions import SoftAssertions
+from utils.step_metrics import step_metrics
+from utils.transport import transport
+from utils.watchdog import WatchdogTimeout, watchdog
 
 # Initialize logger
 logger = get_logger(__name__)
@@ -19,10 +30,18 @@ def before_all(context):
     """Run before all tests."""
     logger.info("Starting test execution")
 
+    # Read userdata before behave's config is shadowed below
+    userdata = context._runner.config.userdata
+    context.run_context = RunContext.for_environment(userdata.get('env'))
+    context.run_context.install()
+    expand_scenario_matrix(context)
+    profiler.configure(userdata)
+
     # Load configuration
-    context.config = config
-    context.api_config = config.get_api_config()
-    context.test_data = config.get_test_data()
+    context.config = context.run_context.config
+    context.api_config = context.config.get_api_config()
+    context.test_data = context.config.get_test_data()
+    context.http_client = context.run_context.http_client
 
     # Initialize shared resources
     context.base_url = context.api_config.get('base_url')
@@ -32,9 +51,61 @@ def before_all(context):
     logger.info(f"Base URL: {context.base_url}")
     logger.info(f"Default timeout: {context.timeout}s")
 
+    # Cut in-flight HTTP exchanges when a step runs out of budget
+    watchdog.add_canceller(context.http_client.abort)
+
+    # Connect before the first step, so step timings see warm connections
+    if transport.should_prewarm(userdata):
+        transport.prewarm(context.http_client, [context.base_url],
+                          [context.config.get('websocket.url')])
+
+
+def expand_scenario_matrix(context):
+    """Expand selected @matrix outlines over the instrument catalog."""
+    runner = context._runner
+    outlines = [
+        scenario for feature in runner.features
+        for scenario in feature.scenarios
+        if is_matrix_outline(scenario)
+        and runner.config.tags.check(scenario.effective_tags)
+    ]
+    if not outlines:
+        return
+
+    userdata = runner.config.userdata
+    run_config = context.run_context.config
+    matrix_config = dict(run_config.get('matrix', {}))
+    matrix_config['limit'] = userdata.get('matrix_limit',
+                                          matrix_config.get('limit'))
+    instruments = userdata.get('matrix_instruments',
+                               matrix_config.get('instruments'))
+    if instruments:
+        instruments = [name.strip() for name in instruments.split(',')]
+    else:
+        try:
+            instruments = InstrumentCatalog(
+                run_config.get('api.base_url'),
+                run_config.get('catalog', {})).get_instruments()
+        except Exception as e:
+            logger.warning(
+                f"Instrument catalog unavailable, running matrix templates only: {e}"
+            )
+            return
+
+    shard = parse_shard(userdata.get('matrix_shard',
+                                     matrix_config.get('shard')))
+    ScenarioMatrix(instruments, matrix_config, shard).expand(runner.features)
+
 
 def after_all(context):
     """Run after all tests."""
+    step_metrics.export()
+    run_history.close()
+    profiler.close()
+    # Missing if before_all failed, e.g. on an unknown environment
+    run_context = getattr(context, 'run_context', None)
+    if run_context is not None:
+        run_context.close()
     logger.info("Test execution completed")
 
 
@@ -58,45 +129,94 @@ def after_feature(context, feature):
 
 def before_scenario(context, scenario):
     """Run before each scenario."""
+    set_log_scenario(str(scenario.location))
     logger.info(f"Starting scenario: {scenario.name}")
 
     # Reset scenario-specific data
     context.response = None
     context.response_json = None
     context.ws_connection = None
+    context.ws_client = None
     context.ws_messages = []
+    # Steps may defer checks to the end of the scenario
+    context.soft_assertions = SoftAssertions(scenario.name)
+    # The session is shared by the whole run; cookies set by one scenario's
+    # responses must not reach the next
+    context.http_client.session.cookies.clear()
+
+    artifact_store.start_scenario()
+    step_metrics.start_scenario()
+    run_history.start_scenario(scenario)
+    watchdog.start_scenario(scenario)
+    # Last, so the profile covers the steps rather than this hook
+    profiler.start_scenario(scenario)
 
 
 def after_scenario(context, scenario):
     """Run after each scenario."""
     logger.info(
         f"Completed scenario: {scenario.name} - Status: {scenario.status}")
-
-    # Cleanup WebSocket connections if any
-    if hasattr(context, 'ws_connection') and context.ws_connection:
-        try:
-            context.ws_connection.close()
-            logger.debug("Closed WebSocket connection")
-        except Exception as e:
-            logger.error(f"Error closing WebSocket connection: {e}")
+    profiler.end_scenario(scenario)
+    watchdog.end_scenario()
+
+    # Cleanup WebSocket connections if any, stopping background readers
+    for name in ('ws_connection', 'ws_client'):
+        connection = getattr(context, name, None)
+        if connection:
+            try:
+                connection.close()
+                logger.debug("Closed WebSocket connection")
+            except Exception as e:
+                logger.error(f"Error closing WebSocket connection: {e}")
+
+    # Deferred checks fail the scenario from this hook
+    soft_error = context.soft_assertions.error()
+    if soft_error is not None:
+        scenario.set_status(Status.failed)
+
+    # Keep the failed scenario's payloads on disk and drop the rest
+    failed = scenario.status == "failed"
+    scenario.artifacts = [
+        str(artifact.path) for artifact in artifact_store.end_scenario(failed)
+    ]
 
     # Log scenario result
-    if scenario.status == "failed":
+    if failed:
         logger.error(f"Scenario failed: {scenario.name}")
         if hasattr(context, 'response') and context.response:
             logger.error(
                 f"Last response status: {context.response.status_code}")
-            logger.error(f"Last response body: {context.response.text}")
+            artifact = getattr(context.response, 'artifact', None)
+            if artifact is not None:
+                logger.error(f"Last response body: {artifact.preview()}")
+                logger.error(f"Full response body: {artifact.path}")
+            else:
+                logger.error(f"Last response body: {context.response.text}")
+
+    step_metrics.end_scenario(scenario)
+    run_history.end_scenario(scenario)
+    set_log_scenario(None)
+
+    if soft_error is not None:
+        raise soft_error
 
 
 def before_step(context, step):
     """Run before each step."""
     logger.debug(f"Executing step: {step.name}")
+    step_metrics.start_step()
+    watchdog.start_step(step)
 
 
 def after_step(context, step):
     """Run after each step."""
+    timed_out = watchdog.end_step(step)
+    step_metrics.end_step(context._runner, step)
+    run_history.record_step(step)
     if step.status == "failed":
         logger.error(f"Step failed: {step.name}")
         if step.error_message:
             logger.error(f"Error: {step.error_message}")
+    elif timed_out:
+        # The step finished, or swallowed the timeout, past its budget
+        raise WatchdogTimeout(timed_out)
@@ -19,6 +19,18 @@ Feature: Candlestick API Testing
 		And each candlestick should have "h" field
 		And each candlestick should have "l" field
 		And each candlestick should have "c" field
+		And the candlesticks should be in ascending time order without duplicates
+
+	@performance
+	Scenario: Candlestick request phases stay within budget
+		Given I have valid candlestick parameters
+		When I send a GET request to the candlestick endpoint
+		Then the response status code should be 200
+		And the TTFB should be less than 2.0 seconds
+		And the body download should be less than 2.0 seconds
+		And the JSON decode should be less than 0.5 seconds
+		And the total request time should be less than 5.0 seconds
+		And the "candlestick" request p95 should not regress more than 20% vs the last 7 days
 
 	@negative
 	Scenario: Get candlestick data without instrument_name parameter
@@ -33,3 +45,18 @@ Feature: Candlestick API Testing
 		When I send a GET request to the candlestick endpoint
 		Then the response status code should not be 200
 		And the response should contain an error structure
+
+	@history
+	Scenario: A day of five-minute candles is complete
+		When I fetch "M5" candlesticks for "BTCUSD-PERP" over the last 24 hours
+		Then the response status code should be 200
+		And the candlestick data should contain required fields
+		And the fetched candlesticks should have no gaps
+
+	@isolation
+	Scenario: A scenario leaves cookies behind
+		Given the HTTP session holds a cookie "session_probe"
+
+	@isolation
+	Scenario: Every scenario starts without cookies
+		Then the HTTP session should hold no cookies
@@ -0,0 +1,21 @@
+@candlestick @matrix
+Feature: Candlestick API Matrix Testing
+	As an API user
+	I want candlestick data for every listed instrument and timeframe
+	So that coverage follows the exchange product list
+
+	Background:
+		Given I have the API base URL configured
+		And I set the request headers
+
+	@positive
+	Scenario Outline: Get candlestick data for <instrument> <timeframe>
+		Given I have candlestick parameters for instrument "<instrument>" and timeframe "<timeframe>"
+		When I send a GET request to the candlestick endpoint
+		Then the response status code should be 200
+		And the response should contain "result.data"
+		And the candlestick data should contain required fields
+
+		Examples: Instrument catalog
+			| instrument  | timeframe |
+			| BTCUSD-PERP | M5        |
@@ -1,30 +1,67 @@
 """Step definitions for WebSocket testing."""
 
 import json
+import threading
 import time
-import websocket
+from collections import Counter, deque
 from behave import given, when, then
 from utils.logger import get_logger
 from utils.assertions import assertions
+from utils.run_history import run_history
+from utils.soft_assertions import SoftAssertions, is_numeric_string
+from utils.step_metrics import step_metrics
+from utils.transport import transport
+from utils.waiters import Signal, wait_until
+from utils.watchdog import watchdog
 
 logger = get_logger(__name__)
 
 
 class WebSocketClient:
-    """WebSocket client wrapper for testing."""
-    def __init__(self, url, timeout=30):
+    """WebSocket client wrapper for testing.
+
+    Frames are read on demand by ``receive_message`` until ``start_reader``
+    is called. From then on a background thread reads every frame into
+    ``inbox`` and notifies ``signal``, so waits end as soon as the data they
+    need has arrived. Wait steps read ``channel_counts`` and ``latest``
+    rather than draining ``inbox``, so it holds only the last
+    ``inbox_size`` frames for ``receive_message``.
+    """
+    def __init__(self, url, timeout=30, inbox_size=1000):
         self.url = url
         self.timeout = timeout
         self.ws = None
         self.messages = []
         self.connected = False
+        self.inbox = deque(maxlen=inbox_size)
+        self.signal = Signal()
+        # Data messages per channel since connecting, and the latest one
+        # with its arrival number
+        self.channel_counts = Counter()
+        self.latest = {}
+        # Subscriptions whose initial snapshot has been received
+        self._snapshot_seen = set()
+        self._lock = threading.Lock()
+        self._reader = None
+        self._stopping = False
 
     def connect(self):
-        """Establish WebSocket connection."""
+        """Establish WebSocket connection.
+
+        DNS, TCP and TLS go through ``utils.transport``, so cached answers
+        and TLS sessions shared with the REST client are reused.
+        """
+        import websocket
+
         try:
-            self.ws = websocket.create_connection(self.url,
-                                                  timeout=self.timeout)
+            with step_metrics.phase('network'):
+                self.ws = websocket.create_connection(
+                    self.url,
+                    timeout=self.timeout,
+                    socket=transport.open_socket(self.url, self.timeout))
+                transport.remember_session(self.ws.sock)
             self.connected = True
+            watchdog.add_canceller(self.abort)
             logger.info(f"WebSocket connected to {self.url}")
             return True
         except Exception as e:
@@ -40,26 +77,24 @@ class WebSocketClient:
             message = json.dumps(message)
 
         logger.debug(f"Sending WebSocket message: {message}")
-        self.ws.send(message)
+        with step_metrics.phase('network'):
+            self.ws.send(message)
 
     def receive_message(self, timeout=10):
         """Receive message from WebSocket with timeout."""
+        import websocket
+
         if not self.connected or not self.ws:
             raise Exception("WebSocket not connected")
 
+        if self._reader is not None:
+            return self._receive_from_inbox(timeout)
+
         self.ws.settimeout(timeout)
         try:
-            message = self.ws.recv()
-            logger.debug(f"Received WebSocket message: {message}")
-
-            # Try to parse as JSON
-            try:
-                parsed_message = json.loads(message)
-                self.messages.append(parsed_message)
-                return parsed_message
-            except json.JSONDecodeError:
-                self.messages.append(message)
-                return message
+            with step_metrics.phase('network'):
+                message = self.ws.recv()
+            return self._accept(message)
 
         except websocket.WebSocketTimeoutException:
             logger.warning("WebSocket receive timeout")
@@ -68,8 +103,130 @@ class WebSocketClient:
             logger.error(f"WebSocket receive error: {e}")
             return None
 
+    def _receive_from_inbox(self, timeout):
+        """Take the oldest frame read by the background reader."""
+        with step_metrics.phase('network'):
+            wait_until(lambda: self.inbox or not self._reader.is_alive(),
+                       timeout, self.signal)
+        if self.inbox:
+            return self.inbox.popleft()
+        if self._reader.is_alive():
+            logger.warning("WebSocket receive timeout")
+        else:
+            logger.error("WebSocket reader stopped")
+        return None
+
+    def _accept(self, message):
+        """Store, parse and count a received frame."""
+        from utils.artifact_store import artifact_store
+
+        logger.debug(f"Received WebSocket message: {message}")
+        # Frames are kept as artifact handles, not parsed objects
+        self.messages.append(artifact_store.put(message, 'ws-frame', self.url))
+
+        # Try to parse as JSON
+        try:
+            parsed_message = json.loads(message)
+        except json.JSONDecodeError:
+            return message
+        self._record_latency(parsed_message)
+
+        result = parsed_message.get('result') if isinstance(
+            parsed_message, dict) else None
+        if isinstance(result, dict) and result.get('data'):
+            channel = result.get('channel') or result.get('subscription')
+            with self._lock:
+                self.channel_counts[channel] += 1
+                self.latest[channel] = (sum(self.channel_counts.values()),
+                                        parsed_message)
+        return parsed_message
+
+    def start_reader(self):
+        """Read frames in a background thread from now on."""
+        if self._reader is not None:
+            return
+        if not self.connected or not self.ws:
+            raise Exception("WebSocket not connected")
+        self._reader = threading.Thread(target=self._read_loop,
+                                        name='ws-reader',
+                                        daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        import websocket
+
+        # Wake up regularly to notice close()
+        self.ws.settimeout(1)
+        try:
+            while not self._stopping:
+                try:
+                    message = self.ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    continue
+                except Exception as e:
+                    if not self._stopping:
+                        logger.error(f"WebSocket reader stopped: {e}")
+                    break
+                self.inbox.append(self._accept(message))
+                self.signal.notify()
+        finally:
+            self.signal.notify()
+
+    def count(self, channel):
+        """Data messages received on a channel, e.g. ``book`` or ``trade``.
+
+        Sub-channels count towards their prefix: ``book`` includes
+        ``book.update``.
+        """
+        with self._lock:
+            return sum(n for name, n in self.channel_counts.items()
+                       if name == channel or name.startswith(f"{channel}."))
+
+    def latest_message(self, channel):
+        """Most recent data message on a channel or its sub-channels."""
+        with self._lock:
+            matches = [
+                latest for name, latest in self.latest.items()
+                if name == channel or name.startswith(f"{channel}.")
+            ]
+        return max(matches, key=lambda latest: latest[0])[1] if matches else None
+
+    def _record_latency(self, message):
+        """Record feed latency of a channel update from its newest ``t``.
+
+        The first data message of a subscription is its snapshot, e.g. the
+        recent trades, whose ``t`` is historical, so it is skipped.
+        """
+        result = message.get('result') if isinstance(message, dict) else None
+        if not isinstance(result, dict) or not isinstance(
+                result.get('data'), list):
+            return
+        subscription = result.get('subscription') or result.get('channel')
+        if subscription not in self._snapshot_seen:
+            self._snapshot_seen.add(subscription)
+            return
+        timestamps = [
+            entry['t'] for entry in result['data']
+            if isinstance(entry, dict) and isinstance(entry.get('t'), (
+                int, float))
+        ]
+        if timestamps:
+            run_history.record_ws_latency(
+                subscription, time.time() - max(timestamps) / 1000)
+
+    def abort(self):
+        """Cut the connection from any thread, waking a blocked receive."""
+        self._stopping = True
+        if self.ws:
+            try:
+                self.ws.abort()
+            except Exception as e:
+                logger.debug(f"WebSocket abort failed: {e}")
+
     def close(self):
         """Close WebSocket connection."""
+        watchdog.remove_canceller(self.abort)
+        self._stopping = True
         if self.ws:
             try:
                 self.ws.close()
@@ -77,12 +234,13 @@ class WebSocketClient:
                 logger.info("WebSocket connection closed")
             except Exception as e:
                 logger.error(f"Error closing WebSocket: {e}")
+        if self._reader is not None:
+            self._reader.join(timeout=2)
 
 
 @given('I have the WebSocket URL configured')
 def step_ws_url_configured(context):
     """Verify WebSocket URL is configured."""
-    time.sleep(1)  # Ensure any previous setup is complete
     ws_config = context.config.get('websocket', {})
     context.ws_url = ws_config.get('url')
     context.ws_timeout = int(ws_config.get('timeout', 30))
@@ -129,6 +287,20 @@ def step_prepare_full_book_message(context):
         f"Prepared full book subscription: {context.subscription_message}")
 
 
+@given('I prepare a subscription message for channel "{channel}"')
+def step_prepare_channel_message(context, channel):
+    """Prepare subscription message for a single channel."""
+    context.subscription_message = {
+        "id": 1,
+        "method": "subscribe",
+        "params": {
+            "channels": [channel]
+        }
+    }
+    logger.debug(
+        f"Prepared channel subscription: {context.subscription_message}")
+
+
 @given('I prepare an invalid subscription message')
 def step_prepare_invalid_message(context):
     """Prepare invalid subscription message."""
@@ -150,15 +322,42 @@ def step_send_subscription_message(context):
     logger.info("Subscription message sent")
 
 
+@when('I wait up to {seconds:d} seconds until the book has {count:d} updates')
+def step_wait_for_book_updates(context, seconds, count):
+    """Wait for book data messages, e.g. snapshots and deltas."""
+    step_wait_for_channel_updates(context, seconds, 'book', count)
+
+
+@when('I wait up to {seconds:d} seconds until the "{channel}" channel has '
+      '{count:d} updates')
+def step_wait_for_channel_updates(context, seconds, channel, count):
+    """Wait until a channel has delivered ``count`` data messages.
+
+    Starts the background reader, so the step ends as soon as the last
+    message needed arrives. The latest message becomes ``context.ws_response``.
+    """
+    client = context.ws_client
+    client.start_reader()
+    with step_metrics.phase('network'):
+        received = wait_until(lambda: client.count(channel) >= count,
+                              seconds, client.signal)
+    assert received, (f"Received {client.count(channel)} of {count} "
+                      f"{channel} updates within {seconds}s")
+    context.ws_response = client.latest_message(channel)
+    logger.info(f"Received {client.count(channel)} {channel} updates")
+
+
 @then('I should receive a successful subscription response')
 def step_receive_successful_response(context):
     """Receive and verify successful subscription response."""
-    # Keep receiving messages until we get a subscription response
-    max_attempts = 5
+    # Keep receiving messages until we get a subscription response, within
+    # one overall deadline rather than a timeout per message
+    deadline = time.monotonic() + 10
     response = None
 
-    for i in range(max_attempts):
-        response = context.ws_client.receive_message(timeout=10)
+    while time.monotonic() < deadline:
+        response = context.ws_client.receive_message(
+            timeout=max(deadline - time.monotonic(), 0.01))
         assert response is not None, "No response received from WebSocket"
 
         # Check if this is a heartbeat message
@@ -173,7 +372,7 @@ def step_receive_successful_response(context):
         if isinstance(response, dict) and 'result' in response:
             break
 
-    assert response is not None, "No subscription response received after multiple attempts"
+    assert response is not None, "No subscription response received within 10s"
     assert 'result' in response, f"Response does not contain 'result' field: {response}"
 
     # Store response in context for further validation
@@ -312,6 +511,12 @@ def step_book_has_asks_and_bids(context):
             )
 
 
+def _book_sides(book_entry):
+    """Asks and bids of a book entry, which are inside 'update' for updates."""
+    levels = book_entry.get('update', book_entry)
+    return levels.get('asks', []), levels.get('bids', [])
+
+
 @then('each order entry should have price, size, and count')
 def step_order_entries_have_required_fields(context):
     """Check if each order entry has required fields."""
@@ -321,44 +526,47 @@ def step_order_entries_have_required_fields(context):
     data = result.get('data', [])
 
     if data:
-        book_entry = data[0]
-
-        # For book updates, asks and bids are inside 'update' object
-        if 'update' in book_entry:
-            update_data = book_entry['update']
-            asks = update_data.get('asks', [])
-            bids = update_data.get('bids', [])
-        else:
-            asks = book_entry.get('asks', [])
-            bids = book_entry.get('bids', [])
-
-        # Check asks
-        for i, ask in enumerate(asks):
-            assert len(
-                ask
-            ) >= 3, f"Ask entry {i} should have at least 3 elements: [price, size, count]"
-            # Verify elements are numeric strings
-            assert ask[0].replace('.', '').replace(
-                '-', '').isdigit(), f"Ask price {ask[0]} is not numeric"
-            assert ask[1].replace('.', '').replace(
-                '-', '').isdigit(), f"Ask size {ask[1]} is not numeric"
-            assert ask[2].isdigit(), f"Ask count {ask[2]} is not numeric"
-
-        # Check bids
-        for i, bid in enumerate(bids):
-            assert len(
-                bid
-            ) >= 3, f"Bid entry {i} should have at least 3 elements: [price, size, count]"
-            # Verify elements are numeric strings
-            assert bid[0].replace('.', '').replace(
-                '-', '').isdigit(), f"Bid price {bid[0]} is not numeric"
-            assert bid[1].replace('.', '').replace(
-                '-', '').isdigit(), f"Bid size {bid[1]} is not numeric"
-            assert bid[2].isdigit(), f"Bid count {bid[2]} is not numeric"
+        asks, bids = _book_sides(data[0])
+
+        # Report every invalid level, not just the first
+        with SoftAssertions("order entries") as soft:
+            for side, levels in (('Ask', asks), ('Bid', bids)):
+                for i, level in enumerate(levels):
+                    if len(level) < 3:
+                        soft.fail(
+                            "%s entry %d should have at least 3 elements: "
+                            "[price, size, count]", side, i)
+                        continue
+                    # Verify elements are numeric strings
+                    if not level[0].replace('.', '').replace('-',
+                                                             '').isdigit():
+                        soft.fail("%s price %s is not numeric", side, level[0])
+                    if not level[1].replace('.', '').replace('-',
+                                                             '').isdigit():
+                        soft.fail("%s size %s is not numeric", side, level[1])
+                    if not level[2].isdigit():
+                        soft.fail("%s count %s is not numeric", side, level[2])
+                soft.add_checks(4 * len(levels))
 
         logger.debug(f"All order entries have required fields")
 
 
+@then('the book asks should be ascending and bids descending by price')
+def step_book_sides_sorted(context):
+    """Check both sides of the book are ordered from the best price out."""
+    assert context.ws_response is not None, "No WebSocket response available"
+
+    data = context.ws_response.get('result', {}).get('data', [])
+    assertions.assert_list_not_empty(data)
+
+    asks, bids = _book_sides(data[0])
+    price = lambda level: float(level[0])
+    assertions.assert_sorted_by(asks, price, strict=True, label="ask level")
+    assertions.assert_sorted_by(bids, price, descending=True, strict=True,
+                                label="bid level")
+    logger.debug(f"Book sides sorted: {len(asks)} asks, {len(bids)} bids")
+
+
 @then('the error should indicate invalid channel')
 def step_error_indicates_invalid_channel(context):
     """Check if error response indicates invalid channel."""
@@ -419,47 +627,45 @@ def step_trade_entries_have_required_fields(context):
     expected_trade_fields = test_data['websocket']['expected_response_fields'][
         'trade_entry']
 
-    # Check each trade entry has required fields
-    for i, trade_entry in enumerate(data):
-        logger.debug(
-            f"Checking trade entry {i}: {json.dumps(trade_entry, indent=2)}")
-
-        for field in expected_trade_fields:
-            assert field in trade_entry, f"Trade entry {i} missing required field: {field}"
-
-        # Additional validation for specific fields
-        # Check 'd' field (trade ID) is a string
-        assert isinstance(trade_entry['d'],
-                          str), f"Trade entry {i} 'd' field should be string"
-
-        # Check 't' field (timestamp) is numeric
-        assert isinstance(
-            trade_entry['t'],
-            (int, float)), f"Trade entry {i} 't' field should be numeric"
-
-        # Check 'p' field (price) is a string representing a number
-        assert isinstance(trade_entry['p'],
-                          str), f"Trade entry {i} 'p' field should be string"
-        assert trade_entry['p'].replace('.', '').replace('-', '').isdigit(
-        ), f"Trade entry {i} 'p' field should be numeric string"
-
-        # Check 'q' field (quantity) is a string representing a number
-        assert isinstance(trade_entry['q'],
-                          str), f"Trade entry {i} 'q' field should be string"
-        assert trade_entry['q'].replace('.', '').replace('-', '').isdigit(
-        ), f"Trade entry {i} 'q' field should be numeric string"
-
-        # Check 's' field (side) is valid
-        assert trade_entry['s'] in [
-            'BUY', 'SELL'
-        ], f"Trade entry {i} 's' field should be 'BUY' or 'SELL'"
-
-        # Check 'i' field (instrument) is a string
-        assert isinstance(trade_entry['i'],
-                          str), f"Trade entry {i} 'i' field should be string"
-
-        # Check 'm' field (maker order ID) is a string
-        assert isinstance(trade_entry['m'],
-                          str), f"Trade entry {i} 'm' field should be string"
+    # Report every invalid entry, not just the first
+    with SoftAssertions("trade entries") as soft:
+        missing = soft.require_fields(data, expected_trade_fields,
+                                      'Trade entry')
+        for i, trade_entry in enumerate(data):
+            if missing and not all(field in trade_entry
+                                   for field in expected_trade_fields):
+                continue
+            # Check 'd' field (trade ID) is a string
+            if not isinstance(trade_entry['d'], str):
+                soft.fail("Trade entry %d 'd' field should be string", i)
+            # Check 't' field (timestamp) is numeric
+            if not isinstance(trade_entry['t'], (int, float)):
+                soft.fail("Trade entry %d 't' field should be numeric", i)
+            # Check 'p' (price) and 'q' (quantity) are numeric strings
+            if not is_numeric_string(trade_entry['p']):
+                soft.fail("Trade entry %d 'p' field should be numeric "
+                          "string: %r", i, trade_entry['p'])
+            if not is_numeric_string(trade_entry['q']):
+                soft.fail("Trade entry %d 'q' field should be numeric "
+                          "string: %r", i, trade_entry['q'])
+            # Check 's' field (side) is valid
+            if trade_entry['s'] not in ('BUY', 'SELL'):
+                soft.fail("Trade entry %d 's' field should be 'BUY' or "
+                          "'SELL': %r", i, trade_entry['s'])
+            # Check 'i' (instrument) and 'm' (maker order ID) are strings
+            if not isinstance(trade_entry['i'], str):
+                soft.fail("Trade entry %d 'i' field should be string", i)
+            if not isinstance(trade_entry['m'], str):
+                soft.fail("Trade entry %d 'm' field should be string", i)
+        soft.add_checks(7 * len(data))
 
     logger.debug(f"All {len(data)} trade entries have required fields")
+
+
+@then('each trade entry should have a unique trade id')
+def step_trade_ids_unique(context):
+    """Check no trade id appears twice in the trade data."""
+    assert context.ws_response is not None, "No WebSocket response available"
+
+    data = context.ws_response.get('result', {}).get('data', [])
+    assertions.assert_unique_by(data, 'd', label="trade")
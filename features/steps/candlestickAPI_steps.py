@@ -1,13 +1,100 @@
 """Step definitions for REST API testing."""
 
 import json
-import requests
-from behave import given, when, then
+from collections import namedtuple
+from behave import given, when, then, register_type
 from utils.logger import get_logger
+from utils.run_history import run_history
 from utils.assertions import assertions
+from utils.step_metrics import step_metrics
+from utils.traffic_log import traffic_log
 
 logger = get_logger(__name__)
 
+HttpPhase = namedtuple('HttpPhase', ['key', 'label'])
+
+# Step wording -> key in context.response_timings (see utils.http_client)
+HTTP_PHASES = {
+    'dns lookup': 'dns',
+    'tcp connect': 'connect',
+    'tls handshake': 'tls',
+    'ttfb': 'ttfb',
+    'body download': 'download',
+    'json decode': 'decode',
+    'total request time': 'total',
+}
+
+
+def parse_http_phase(text):
+    """Parse a phase name used in timing steps, e.g. "TTFB"."""
+    return HttpPhase(HTTP_PHASES[text.lower()], text)
+
+
+parse_http_phase.pattern = r'(?i:%s)' % '|'.join(HTTP_PHASES)
+register_type(HttpPhase=parse_http_phase)
+
+
+def send_request(context, method, url, headers=None, params=None, body=None):
+    """Send an HTTP request, log it and store the response on context.
+
+    Sets ``context.response`` (a ``StoredResponse`` whose body is held by
+    ``utils.artifact_store``), ``context.response_json`` (None when the
+    body is not JSON), ``context.response_timings`` (see
+    ``utils.http_client``) and ``context.last_request``. Transport errors
+    are recorded and re-raised.
+    """
+    import requests
+    from utils.artifact_store import StoredResponse, artifact_store
+    from utils.http_client import describe_timings
+
+    # The run context's client, see utils.run_context
+    http_client = context.http_client
+    # Kept so wait steps can repeat the request
+    context.last_request = (method, url, headers, params, body)
+    logger.log_request(method=method,
+                       url=url,
+                       headers=headers,
+                       params=params,
+                       body=body)
+
+    try:
+        with step_metrics.phase('network'):
+            response = http_client.request(method=method,
+                                           url=url,
+                                           headers=headers,
+                                           params=params,
+                                           json=body,
+                                           timeout=context.timeout)
+    except requests.exceptions.RequestException as e:
+        context.response_timings = http_client.last_timings
+        traffic_log.record(method, url, params=params, request_body=body,
+                           error=e, timings=context.response_timings)
+        run_history.record_request(method, url, None,
+                                   context.response_timings)
+        raise
+
+    context.response_timings = response.timings
+
+    # Try to parse JSON response
+    try:
+        context.response_json = http_client.json(response)
+    except json.JSONDecodeError:
+        context.response_json = None
+
+    elapsed_time = response.timings['total']
+    logger.log_response(status_code=response.status_code,
+                        elapsed_time=elapsed_time,
+                        response=response)
+    logger.debug("Timings: %s", describe_timings(response.timings))
+    traffic_log.record(method, url, params=params, request_body=body,
+                       response=response, elapsed_time=elapsed_time,
+                       timings=response.timings)
+    run_history.record_request(method, url, response.status_code,
+                               response.timings)
+    context.response = StoredResponse(
+        response,
+        artifact_store.put(response.content, 'response', f"{method} {url}"))
+
 
 @given('I have the API base URL configured')
 def step_have_base_url(context):
@@ -68,47 +155,98 @@ def step_candlestick_params_invalid_instrument(context):
         f"Request parameters (invalid instrument): {context.request_params}")
 
 
+@given(
+    'I have candlestick parameters for instrument "{instrument}" and timeframe "{timeframe}"'
+)
+def step_candlestick_params_for_instrument(context, instrument, timeframe):
+    """Set candlestick parameters for a matrix instrument and timeframe."""
+    context.request_params = {
+        'instrument_name': instrument,
+        'timeframe': timeframe
+    }
+    logger.debug(f"Request parameters: {context.request_params}")
+
+
 @when('I send a GET request to the candlestick endpoint')
 def step_send_get_candlestick(context):
     """Send GET request to candlestick endpoint."""
+    import requests
+
     print("✅ LOADED: rest_steps.py")
     endpoint = context.api_config['endpoints']['candlestick']
     url = f"{context.base_url}{endpoint}"
 
-    logger.log_request(method="GET",
-                       url=url,
-                       headers=context.request_headers,
-                       params=context.request_params)
-
     try:
-        context.response = requests.get(url,
-                                        headers=context.request_headers,
-                                        params=context.request_params,
-                                        timeout=context.timeout)
-
-        # Log response
-        logger.log_response(
-            status_code=context.response.status_code,
-            headers=dict(context.response.headers),
-            body=context.response.text[:500]
-            if context.response.text else None,
-            elapsed_time=context.response.elapsed.total_seconds())
-
-        # Try to parse JSON response
-        try:
-            context.response_json = context.response.json()
-        except json.JSONDecodeError:
-            context.response_json = None
-            logger.warning("Response is not valid JSON")
-
+        send_request(context,
+                     "GET",
+                     url,
+                     headers=context.request_headers,
+                     params=context.request_params)
     except requests.exceptions.RequestException as e:
         logger.error(f"Request failed: {e}")
         raise
 
+    if context.response_json is None:
+        logger.warning("Response is not valid JSON")
+
+
+@when('I fetch "{timeframe}" candlesticks for "{instrument}" over the last {hours:d} hours')
+def step_fetch_candlestick_history(context, timeframe, instrument, hours):
+    """Fetch a candle range through the local candle store.
+
+    Closed candles already in the store are not requested again; only the
+    missing sub-ranges and the still-open candle go to the API. The result
+    is set as ``context.response_json`` so the usual candlestick checks
+    apply to the whole range.
+    """
+    import time
+    from utils.candle_store import candle_store, paged_fetch
+
+    url = f"{context.base_url}{context.api_config['endpoints']['candlestick']}"
+    headers = getattr(context, 'request_headers', context.headers)
+
+    def request(params):
+        send_request(context, "GET", url, headers=headers, params=params)
+        assertions.assert_status_code(context.response, 200)
+        return (context.response_json or {}).get('result', {}).get('data', [])
+
+    now_ms = int(time.time() * 1000)
+    page_size = int(context.config.get('candle_store.page_size', 300))
+    result = candle_store.get(instrument, timeframe,
+                              now_ms - hours * 3600 * 1000, now_ms,
+                              paged_fetch(request, instrument, timeframe,
+                                          page_size), now_ms)
+    context.candle_fetch = result
+    context.response_json = {
+        'result': {
+            'instrument_name': instrument,
+            'interval': timeframe,
+            'data': result['candles'],
+        }
+    }
+
+
+@then('the fetched candlesticks should have no gaps')
+def step_fetched_candlesticks_contiguous(context):
+    """Check consecutive candles in the fetched range are one timeframe apart."""
+    from utils.timeframes import next_open
+
+    timeframe = context.response_json['result']['interval']
+    candles = context.response_json['result']['data']
+    assertions.assert_list_not_empty(candles)
+    gaps = [(a['t'], b['t']) for a, b in zip(candles, candles[1:])
+            if next_open(a['t'], timeframe) != b['t']]
+    assertions.assert_equals(
+        len(gaps), 0, f"{len(gaps)} gaps in {timeframe} candles, first "
+        f"between t={gaps[0][0]} and t={gaps[0][1]}" if gaps else None)
+    logger.debug(f"{len(candles)} contiguous {timeframe} candles")
+
 
 @when('I send a {method} request to "{endpoint}"')
 def step_send_request(context, method, endpoint):
     """Send HTTP request to specified endpoint."""
+    import requests
+
     url = f"{context.base_url}{endpoint}"
 
     # Get request data from context
@@ -116,36 +254,48 @@ def step_send_request(context, method, endpoint):
     params = getattr(context, 'request_params', None)
     data = getattr(context, 'request_body', None)
 
-    logger.log_request(method=method,
-                       url=url,
-                       headers=headers,
-                       params=params,
-                       body=data)
-
     try:
-        context.response = requests.request(method=method,
-                                            url=url,
-                                            headers=headers,
-                                            params=params,
-                                            json=data,
-                                            timeout=context.timeout)
-
-        logger.log_response(
-            status_code=context.response.status_code,
-            headers=dict(context.response.headers),
-            body=context.response.text[:500]
-            if context.response.text else None,
-            elapsed_time=context.response.elapsed.total_seconds())
-
-        # Try to parse JSON response
-        try:
-            context.response_json = context.response.json()
-        except json.JSONDecodeError:
-            context.response_json = None
+        send_request(context, method, url, headers=headers, params=params,
+                     body=data)
     except requests.exceptions.RequestException as e:
         logger.error(f"Request failed: {e}")
 
 
+def _json_path_value(data, key_path):
+    """Value at a dotted path such as "result.data", or None if absent."""
+    for key in key_path.split('.'):
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and key.isdigit() and int(key) < len(data):
+            data = data[int(key)]
+        else:
+            return None
+    return data
+
+
+@when('I wait up to {seconds:d} seconds until the response "{key_path}" '
+      'is not empty')
+def step_wait_until_response_not_empty(context, seconds, key_path):
+    """Repeat the last request, backing off, until a field has data."""
+    import requests
+    from utils.waiters import poll_until
+
+    if _json_path_value(context.response_json, key_path):
+        return
+    assert getattr(context, 'last_request', None), "No request to repeat"
+
+    def fetch():
+        try:
+            send_request(context, *context.last_request)
+        except requests.exceptions.RequestException:
+            return None
+        return context.response_json
+
+    met, _ = poll_until(fetch, lambda data: _json_path_value(data, key_path),
+                        seconds)
+    assert met, f'Response "{key_path}" still empty after {seconds}s'
+
+
 @then('the response status code should be {expected_code:d}')
 def step_check_status_code(context, expected_code):
     """Check response status code."""
@@ -238,20 +388,54 @@ def step_candlestick_has_required_fields(context):
 
 @then('each candlestick should have "{field}" field')
 def step_each_candlestick_has_field(context, field):
-    """Check if each candlestick has a specific field."""
+    """Check if each candlestick has a specific field.
+
+    Missing fields are recorded in the scenario's soft assertions, so a run
+    of these steps reports every missing field when the scenario ends.
+    """
     assert context.response_json is not None, "Response is not valid JSON"
 
     data = context.response_json.get('result', {}).get('data', [])
     assertions.assert_list_not_empty(data)
 
+    soft = context.soft_assertions
+    missing = soft.failures
     for i, candle in enumerate(data):
-        assert field in candle, f"Candlestick at index {i} missing field: {field}"
+        if field not in candle:
+            soft.fail("Candlestick at index %d missing field: %s", i, field)
+    soft.add_checks(len(data))
 
-    logger.debug(f"All {len(data)} candlesticks have field: {field}")
+    if soft.failures == missing:
+        logger.debug(f"All {len(data)} candlesticks have field: {field}")
+
+
+@then('the candlesticks should be in ascending time order without duplicates')
+def step_candlesticks_in_time_order(context):
+    """Check candle open times strictly increase."""
+    assert context.response_json is not None, "Response is not valid JSON"
+
+    data = context.response_json.get('result', {}).get('data', [])
+    assertions.assert_sorted_by(data, 't', strict=True, label="candlestick")
 
 
 @then('the response time should be less than {max_seconds:f} seconds')
 def step_check_response_time(context, max_seconds):
-    """Check if response time is within acceptable limit."""
-    elapsed_time = context.response.elapsed.total_seconds()
+    """Check if response time is within acceptable limit.
+
+    Uses the full exchange time, including body download and JSON decode.
+    """
+    timings = getattr(context, 'response_timings', None)
+    if timings:
+        elapsed_time = timings['total']
+    else:
+        elapsed_time = context.response.elapsed.total_seconds()
     assertions.assert_response_time(elapsed_time, max_seconds)
+
+
+@then('the {phase:HttpPhase} should be less than {max_seconds:f} seconds')
+def step_check_response_phase(context, phase, max_seconds):
+    """Check a single phase of the last HTTP exchange, e.g. TTFB."""
+    timings = getattr(context, 'response_timings', None)
+    assert timings, "No HTTP timings recorded for the last request"
+    assertions.assert_response_time(timings[phase.key], max_seconds,
+                                    label=phase.label)
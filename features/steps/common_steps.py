@@ -2,6 +2,7 @@
 
 from behave import given, when, then
 from utils.logger import get_logger
+from utils.step_metrics import step_metrics
 
 logger = get_logger(__name__)
 
@@ -11,7 +12,8 @@ def step_wait(context, seconds):
     """Wait for specified number of seconds."""
     import time
     logger.debug(f"Waiting for {seconds} seconds")
-    time.sleep(seconds)
+    with step_metrics.phase('waiting'):
+        time.sleep(seconds)
 
 
 @given('I set the timeout to {seconds:d} seconds')
@@ -43,3 +45,16 @@ def step_save_response_to_context(context, key):
         logger.debug(f"Saved response text to context.{key}")
     else:
         logger.warning(f"No response available to save to context.{key}")
+
+
+@given('the HTTP session holds a cookie "{name}"')
+def step_set_cookie(context, name):
+    """Put a cookie in the shared session's jar, as a Set-Cookie would."""
+    context.http_client.session.cookies.set(name, 'probe')
+
+
+@then('the HTTP session should hold no cookies')
+def step_no_cookies(context):
+    """Check that no cookies were carried over from earlier scenarios."""
+    cookies = sorted(context.http_client.session.cookies.keys())
+    assert not cookies, f"HTTP session still holds cookies: {cookies}"
@@ -0,0 +1,57 @@
+"""Step definitions cross-checking WebSocket trades against REST candles."""
+
+import time
+from behave import when, then
+from utils.candle_aggregator import CandleAggregator
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@when('I aggregate trades into "{timeframes}" candles for {seconds:d} seconds')
+def step_aggregate_trades(context, timeframes, seconds):
+    """Build candles from the subscribed trade channel for a while.
+
+    ``timeframes`` is a comma-separated list, e.g. "M1,M5". Candles are
+    only complete once a whole timeframe has passed after the first trade,
+    so run for at least two timeframes.
+    """
+    aggregator = CandleAggregator(
+        name.strip() for name in timeframes.split(','))
+    deadline = time.monotonic() + seconds
+    messages = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        message = context.ws_client.receive_message(
+            timeout=min(remaining, 5))
+        if message is not None:
+            messages += 1
+            aggregator.add_message(message)
+
+    context.candle_aggregator = aggregator
+    logger.info(f"Aggregated {aggregator.trades} trades from {messages} "
+                f"messages in {seconds}s "
+                f"({aggregator.out_of_order} out of order)")
+
+
+@then('the aggregated "{timeframe}" candles for "{instrument}" should match '
+      'the REST candlesticks within {price_pct:f}% price and '
+      '{volume_pct:f}% volume')
+def step_aggregated_candles_match_rest(context, timeframe, instrument,
+                                       price_pct, volume_pct):
+    """Compare every fully observed candle with the REST response."""
+    assert context.response_json is not None, "Response is not valid JSON"
+    rest_candles = context.response_json.get('result', {}).get('data', [])
+
+    compared, mismatches = context.candle_aggregator.compare(
+        instrument, timeframe, rest_candles, price_pct / 100,
+        volume_pct / 100)
+    assert compared, (
+        f"No complete {timeframe} candles for {instrument} to compare; "
+        f"aggregate for longer or check the trade subscription")
+    assert not mismatches, (
+        f"{len(mismatches)} mismatches between trade stream and REST "
+        f"{timeframe} candles:\n" + '\n'.join(mismatches[:20]))
+    logger.info(f"{compared} {timeframe} candles for {instrument} match REST")
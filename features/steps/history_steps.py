@@ -0,0 +1,45 @@
+"""Step definitions comparing this run with the run history."""
+
+from behave import then
+from utils.logger import get_logger
+from utils.run_history import run_history
+
+logger = get_logger(__name__)
+
+
+def check_regression(metric, tag, quantile, percent, days):
+    """Fail if this run's percentile regressed against the rolling baseline."""
+    result = run_history.compare(metric,
+                                 quantile,
+                                 days,
+                                 percent,
+                                 tag=tag)
+    if result['current'] is None:
+        raise AssertionError(
+            f"No {metric} measurements for @{tag} in this run")
+    if result['change'] is None:
+        logger.warning(
+            f"No baseline for @{tag} {metric} p{quantile} in the last "
+            f"{days} days ({result['baseline_samples']} samples); "
+            f"skipping regression check")
+        return
+
+    message = (f"@{tag} {metric} p{quantile} is {result['current']:.3f}s vs "
+               f"{result['baseline']:.3f}s over the last {days} days "
+               f"({result['change']:+.1f}%, allowed +{percent}%)")
+    assert not result['regressed'], message
+    logger.info(message)
+
+
+@then('the "{tag}" request p{quantile:d} should not regress more than '
+      '{percent:d}% vs the last {days:d} days')
+def step_request_no_regression(context, tag, quantile, percent, days):
+    """Compare total request time of @tag scenarios with earlier runs."""
+    check_regression('total', tag, quantile, percent, days)
+
+
+@then('the "{tag}" feed latency p{quantile:d} should not regress more than '
+      '{percent:d}% vs the last {days:d} days')
+def step_feed_latency_no_regression(context, tag, quantile, percent, days):
+    """Compare WebSocket feed latency of @tag scenarios with earlier runs."""
+    check_regression('ws_latency', tag, quantile, percent, days)
@@ -0,0 +1,71 @@
+"""Step definitions for WebSocket connection storms."""
+
+from behave import when, then
+from utils.logger import get_logger
+from utils.stats import percentile
+from utils.step_metrics import step_metrics
+from utils.ws_storm import ConnectionStorm, subscription_message
+
+logger = get_logger(__name__)
+
+
+def run_storm(context, count, concurrency, message=None):
+    """Run a storm against the configured WebSocket URL."""
+    storm = ConnectionStorm(context.ws_url, count, concurrency, message)
+    with step_metrics.phase('network'):
+        context.storm_result = storm.run()
+
+
+def _distribution_check(context, name, values, quantile, max_seconds):
+    value = percentile(values, quantile)
+    assert value is not None, (
+        f"No {name} measured: {context.storm_result.describe()}")
+    assert value < max_seconds, (
+        f"Storm {name} p{quantile} is {value:.3f}s, expected less than "
+        f"{max_seconds}s: {context.storm_result.describe()}")
+    logger.info(f"Storm {name} p{quantile}: {value:.3f}s")
+
+
+@when('I open {count:d} WebSocket connections with concurrency '
+      '{concurrency:d}')
+def step_open_connections(context, count, concurrency):
+    """Open many connections at once, with no subscription."""
+    run_storm(context, count, concurrency)
+
+
+@when('I open {count:d} WebSocket connections with concurrency '
+      '{concurrency:d} subscribed to "{channel}"')
+def step_open_subscribed_connections(context, count, concurrency, channel):
+    """Open many connections at once, each subscribed to ``channel``.
+
+    Every connection waits for its first data message, which gives the
+    first message latency distribution.
+    """
+    run_storm(context, count, concurrency, subscription_message(channel))
+
+
+@then('at most {percent:d}% of the storm connections should fail')
+def step_storm_failure_rate(context, percent):
+    """Check the share of failed connections, whatever the reason."""
+    result = context.storm_result
+    assert result.failure_rate <= percent, (
+        f"{result.failure_rate:.1f}% of storm connections failed, allowed "
+        f"{percent}%: {result.describe()}")
+
+
+@then('the storm connect time p{quantile:d} should be less than '
+      '{max_seconds:f} seconds')
+def step_storm_connect_time(context, quantile, max_seconds):
+    """Check the connect time (TCP, TLS and upgrade) distribution."""
+    _distribution_check(context, 'connect time',
+                        context.storm_result.connect_times, quantile,
+                        max_seconds)
+
+
+@then('the storm first message latency p{quantile:d} should be less than '
+      '{max_seconds:f} seconds')
+def step_storm_first_message_latency(context, quantile, max_seconds):
+    """Check the subscribe-to-first-data-message distribution."""
+    _distribution_check(context, 'first message latency',
+                        context.storm_result.first_message_latencies,
+                        quantile, max_seconds)
@@ -18,6 +18,7 @@ Feature: WebSocket Book Subscription Testing
         And the book data should contain required fields with simple parameters
         And the trade data should contain required fields
         And each trade entry should have required fields
+        And each trade entry should have a unique trade id
 
 
     @positive
@@ -30,6 +31,16 @@ Feature: WebSocket Book Subscription Testing
         And the book data should contain required fields
         And the book should have asks and bids arrays
         And each order entry should have price, size, and count
+        And the book asks should be ascending and bids descending by price
+
+    @positive
+    Scenario: Book updates stream after subscribing
+        Given I have a WebSocket connection to the book endpoint
+        And I prepare a full book subscription message
+        When I send the subscription message
+        And I wait up to 15 seconds until the book has 3 updates
+        Then the book should have asks and bids arrays
+        And each order entry should have price, size, and count
 
     @negative
     Scenario: Subscribe with invalid channel
@@ -0,0 +1,22 @@
+@consistency @websocket
+Feature: Trade Stream and Candlestick Consistency
+    As an API user
+    I want candles built from the live trade stream to match the REST candlesticks
+    So that both channels report the same market
+
+    Background:
+        Given I have the WebSocket URL configured
+        And I set the WebSocket timeout
+        And I have the API base URL configured
+        And I set the request headers
+
+    @slow
+    Scenario: One-minute candles from trades match REST candlesticks
+        Given I have candlestick parameters for instrument "BTCUSD-PERP" and timeframe "M1"
+        And I have a WebSocket connection to the book endpoint
+        And I prepare a subscription message for channel "trade.BTCUSD-PERP"
+        When I send the subscription message
+        And I aggregate trades into "M1" candles for 150 seconds
+        And I send a GET request to the candlestick endpoint
+        Then the response status code should be 200
+        And the aggregated "M1" candles for "BTCUSD-PERP" should match the REST candlesticks within 0.01% price and 1.0% volume
@@ -0,0 +1,21 @@
+@book @matrix
+Feature: WebSocket Channel Matrix Testing
+    As an API user
+    I want to subscribe to market channels for every listed instrument
+    So that coverage follows the exchange product list
+
+    Background:
+        Given I have the WebSocket URL configured
+        And I set the WebSocket timeout
+
+    @positive
+    Scenario Outline: Subscribe to <channel>
+        Given I have a WebSocket connection to the book endpoint
+        And I prepare a subscription message for channel "<channel>"
+        When I send the subscription message
+        Then I should receive a successful subscription response
+        And the response should contain subscription confirmation
+
+        Examples: Instrument catalog
+            | instrument  | channel           |
+            | BTCUSD-PERP | trade.BTCUSD-PERP |
@@ -0,0 +1,19 @@
+@storm @websocket @slow
+Feature: WebSocket Connection Storm
+    As an API operator
+    I want many clients to connect and subscribe at the same time
+    So that connection setup and fan-out hold up under a burst of clients
+
+    Background:
+        Given I have the WebSocket URL configured
+
+    Scenario: Burst of connections
+        When I open 500 WebSocket connections with concurrency 50
+        Then at most 1% of the storm connections should fail
+        And the storm connect time p95 should be less than 2.0 seconds
+
+    Scenario: Subscription fan-out
+        When I open 500 WebSocket connections with concurrency 50 subscribed to "trade.BTCUSD-PERP"
+        Then at most 1% of the storm connections should fail
+        And the storm connect time p95 should be less than 2.0 seconds
+        And the storm first message latency p95 should be less than 5.0 seconds
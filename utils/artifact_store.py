@@ -0,0 +1,294 @@
+"""Bounded store for response bodies and WebSocket frames.
+
+Payloads are kept in memory up to a per-process budget
+(``artifacts.memory_budget_mb``). Past the budget, the least recently used
+ones are spilled to gzip files under ``artifacts.dir``. Payloads larger
+than ``artifacts.inline_max_kb`` go straight to disk. Callers hold an
+``Artifact`` handle and read the payload only when they need it.
+
+At the end of a scenario its artifacts are dropped, except for a failed
+scenario (or with ``keep: all``). Then the last ``keep_last`` artifacts of
+each kind are written to disk and their paths attached to the scenario, for
+the failure log and the streaming report. Outside a scenario (CLI tools,
+benchmarks, frames arriving between scenarios) only the last ``keep_last``
+artifacts are held.
+
+At exit the remaining artifacts are dropped and the run directory is
+removed unless something was kept. Only the newest ``keep_runs`` run
+directories are retained, which also clears what killed runs left behind.
+"""
+
+import atexit
+import gzip
+import itertools
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from utils.config_manager import config
+from utils.logger import RUN_ID, get_logger
+from utils.run_context import LazySettings
+
+logger = get_logger(__name__)
+
+
+class Artifact:
+    """Handle to a stored payload, loaded on demand."""
+    __slots__ = ('id', 'kind', 'name', 'size', 'path', '_data', '_store')
+
+    def __init__(self, store: 'ArtifactStore', artifact_id: int, kind: str,
+                 name: Optional[str], data: bytes):
+        self._store = store
+        self.id = artifact_id
+        self.kind = kind
+        self.name = name
+        self.size = len(data)
+        self.path: Optional[Path] = None
+        self._data: Optional[bytes] = data
+
+    @property
+    def in_memory(self) -> bool:
+        """Whether the payload is held in memory rather than on disk."""
+        return self._data is not None
+
+    def read_bytes(self) -> bytes:
+        """Load the payload (empty once the artifact has been dropped)."""
+        return self._store._read(self)
+
+    def read_text(self) -> str:
+        """Load the payload as UTF-8 text."""
+        return self.read_bytes().decode('utf-8', errors='replace')
+
+    def preview(self, limit: Optional[int] = None) -> str:
+        """First ``limit`` characters (default ``artifacts.preview_chars``)."""
+        limit = limit or self._store.preview_chars
+        text = self.read_text()
+        if len(text) <= limit:
+            return text
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+    def persist(self) -> Path:
+        """Write the payload to disk if it is not there yet, returning the path."""
+        return self._store.persist(self)
+
+    def __str__(self) -> str:
+        where = str(self.path) if self.path else 'in memory'
+        name = f" {self.name}" if self.name else ''
+        return f"{self.kind}{name} ({self.size} bytes, {where})"
+
+
+class StoredResponse:
+    """Stand-in for a ``requests.Response`` whose body lives in the store.
+
+    Keeps the attributes steps and assertions read (``status_code``,
+    ``headers``, ``elapsed``, ``url``, ``timings``) and loads ``content``
+    and ``text`` from the artifact on access.
+    """
+    def __init__(self, response, artifact: Artifact):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.elapsed = response.elapsed
+        self.url = response.url
+        self.reason = response.reason
+        self.encoding = response.encoding
+        self.timings = getattr(response, 'timings', None)
+        self.artifact = artifact
+
+    @property
+    def content(self) -> bytes:
+        return self.artifact.read_bytes()
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+def _prune_runs(root: Path, keep_runs: int):
+    """Delete all but the newest ``keep_runs`` run directories under root."""
+    if keep_runs <= 0 or not root.is_dir():
+        return
+    runs = sorted((path for path in root.iterdir()
+                   if path.is_dir() and path.name != RUN_ID),
+                  key=lambda path: path.stat().st_mtime,
+                  reverse=True)
+    # The current run counts as one
+    for path in runs[keep_runs - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class ArtifactStore(LazySettings):
+    """Keeps payloads within a memory budget, spilling LRU ones to disk."""
+    def __init__(self, artifact_config: Optional[Dict[str, Any]] = None):
+        """Initialize artifact store.
+
+        Args:
+            artifact_config: Artifact settings. Defaults to ``artifacts``
+        """
+        self._artifact_config = artifact_config
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._memory: 'OrderedDict[int, Artifact]' = OrderedDict()
+        self._scenario: List[Artifact] = []
+        self._in_scenario = False
+        self.memory_bytes = 0
+        self.spilled = 0
+        self.kept = 0
+
+    def _load_settings(self) -> Dict[str, Any]:
+        artifact_config = self._artifact_config or config.get('artifacts', {})
+        root = Path(artifact_config.get('dir', 'reports/artifacts'))
+        keep_runs = int(artifact_config.get('keep_runs', 10))
+        _prune_runs(root, keep_runs)
+        atexit.register(self.close)
+        return {
+            'root': root,
+            'directory': root / RUN_ID,
+            'budget': int(float(artifact_config.get('memory_budget_mb', 64))
+                          * 1024 * 1024),
+            'inline_max': int(
+                float(artifact_config.get('inline_max_kb', 1024)) * 1024),
+            'preview_chars': int(artifact_config.get('preview_chars', 2000)),
+            'keep': str(artifact_config.get('keep', 'failed')).lower(),
+            'keep_last': int(artifact_config.get('keep_last', 20)),
+            'keep_runs': keep_runs,
+        }
+
+    def start_scenario(self):
+        """Collect artifacts for a scenario until ``end_scenario``."""
+        with self._lock:
+            self._in_scenario = True
+
+    def put(self,
+            data: Union[bytes, str],
+            kind: str,
+            name: Optional[str] = None) -> Artifact:
+        """Store a payload for the current scenario.
+
+        Args:
+            data: Payload; text is stored as UTF-8
+            kind: Short type label, e.g. ``response`` or ``ws-frame``
+            name: Optional description, e.g. the request URL
+
+        Returns:
+            Handle to the payload
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self._lock:
+            artifact = Artifact(self, next(self._ids), kind, name, data or b'')
+            self._scenario.append(artifact)
+            if not self._in_scenario and len(self._scenario) > self.keep_last:
+                self._drop(self._scenario.pop(0))
+            if artifact.size > self.inline_max:
+                self._spill(artifact)
+            else:
+                self._memory[artifact.id] = artifact
+                self.memory_bytes += artifact.size
+                while self.memory_bytes > self.budget and self._memory:
+                    self._spill(next(iter(self._memory.values())))
+            return artifact
+
+    def _read(self, artifact: Artifact) -> bytes:
+        with self._lock:
+            if artifact._data is not None:
+                if artifact.id in self._memory:
+                    self._memory.move_to_end(artifact.id)
+                return artifact._data
+            if artifact.path is None:
+                return b''
+            # Under the lock, so _drop cannot unlink the file mid-read
+            with gzip.open(artifact.path, 'rb') as f:
+                return f.read()
+
+    def _spill(self, artifact: Artifact):
+        """Move a payload to a gzip file and free its memory."""
+        if artifact._data is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Parallel workers share the run directory
+        path = self.directory / (f"{os.getpid()}-{artifact.id:07d}-"
+                                 f"{artifact.kind}.gz")
+        with gzip.open(path, 'wb', compresslevel=1) as f:
+            f.write(artifact._data)
+        artifact.path = path
+        artifact._data = None
+        if self._memory.pop(artifact.id, None) is not None:
+            self.memory_bytes -= artifact.size
+        self.spilled += 1
+
+    def persist(self, artifact: Artifact) -> Path:
+        """Write an artifact to disk if it is only in memory."""
+        with self._lock:
+            self._spill(artifact)
+            return artifact.path
+
+    def _drop(self, artifact: Artifact):
+        """Forget an artifact, deleting its spill file."""
+        if self._memory.pop(artifact.id, None) is not None:
+            self.memory_bytes -= artifact.size
+        artifact._data = None
+        if artifact.path is not None:
+            artifact.path.unlink(missing_ok=True)
+            artifact.path = None
+
+    def end_scenario(self, failed: bool) -> List[Artifact]:
+        """Release the current scenario's artifacts.
+
+        Args:
+            failed: Whether the scenario failed
+
+        Returns:
+            Artifacts kept on disk for the report
+        """
+        with self._lock:
+            artifacts, self._scenario = self._scenario, []
+            self._in_scenario = False
+            keep = self.keep == 'all' or (self.keep == 'failed' and failed)
+            kept_ids = set()
+            if keep:
+                by_kind: Dict[str, List[Artifact]] = {}
+                for artifact in artifacts:
+                    by_kind.setdefault(artifact.kind, []).append(artifact)
+                for same_kind in by_kind.values():
+                    kept_ids.update(a.id for a in same_kind[-self.keep_last:])
+            kept = []
+            for artifact in artifacts:
+                if artifact.id in kept_ids:
+                    self._spill(artifact)
+                    kept.append(artifact)
+                else:
+                    self._drop(artifact)
+            self.kept += len(kept)
+        if kept:
+            logger.info(f"Kept {len(kept)} artifacts in {self.directory}")
+        return kept
+
+    def close(self):
+        """Drop every artifact still held and remove an unused run directory.
+
+        Parallel workers share the run directory, so it is only removed
+        once empty.
+        """
+        if not self.settings_loaded:
+            return
+        with self._lock:
+            artifacts, self._scenario = self._scenario, []
+            self._in_scenario = False
+            for artifact in artifacts:
+                self._drop(artifact)
+            if not self.kept:
+                try:
+                    self.directory.rmdir()
+                except OSError:
+                    pass
+
+
+# Global artifact store instance
+artifact_store = ArtifactStore()
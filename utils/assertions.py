@@ -1,12 +1,92 @@
 """Custom assertion utilities for API testing."""
 
 import json
-from typing import Any, Dict, List, Optional, Union
-from jsonschema import validate, ValidationError
+from operator import itemgetter
+from typing import (Any, Callable, Dict, Hashable, Iterable, List, Optional,
+                    Sequence, Tuple, Union)
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Key of a collection item: a dict key / list index, or a function of the item
+Key = Union[str, int, Callable[[Any], Hashable], None]
+
+# Violations listed in a bulk assertion message; the rest are only counted
+MAX_REPORTED = 20
+
+
+def _key_func(key: Key) -> Optional[Callable[[Any], Hashable]]:
+    """Turn a ``Key`` into a function, or None for the item itself."""
+    if key is None or callable(key):
+        return key
+    return itemgetter(key)
+
+
+def _identity(item: Any) -> Any:
+    """Key of an item that is its own key."""
+    return item
+
+
+def _keys(items: Iterable, key: Key) -> List:
+    """Extract the key of every item, in order."""
+    get = _key_func(key)
+    return list(items) if get is None else list(map(get, items))
+
+
+def _field(get: Callable[[Any], Any], item: Any) -> Any:
+    """A field of an item through its accessor, or None if it is missing."""
+    try:
+        return get(item)
+    except (KeyError, IndexError):
+        return None
+
+
+def _positions(keys: List) -> List[Tuple[Any, List[int]]]:
+    """Positions of every distinct key, in first-seen order.
+
+    Unhashable keys (e.g. lists from a payload) are compared pairwise,
+    which is quadratic but still correct.
+    """
+    try:
+        positions: Dict[Hashable, List[int]] = {}
+        for i, k in enumerate(keys):
+            positions.setdefault(k, []).append(i)
+        return list(positions.items())
+    except TypeError:
+        groups: List[Tuple[Any, List[int]]] = []
+        for i, k in enumerate(keys):
+            for seen, group in groups:
+                if seen == k:
+                    group.append(i)
+                    break
+            else:
+                groups.append((k, [i]))
+        return groups
+
+
+def _sample(values: Iterable) -> str:
+    """Up to ``MAX_REPORTED`` values, sorted when they are comparable."""
+    values = list(values)
+    try:
+        values.sort()
+    except TypeError:
+        values.sort(key=repr)
+    shown = ', '.join(repr(v) for v in values[:MAX_REPORTED])
+    if len(values) > MAX_REPORTED:
+        shown += f", ... ({len(values) - MAX_REPORTED} more)"
+    return shown
+
+
+def _fail(summary: str, details: Sequence[str] = ()):
+    """Log and raise a bulk assertion failure listing the first details."""
+    lines = [summary]
+    lines += [f"  - {detail}" for detail in details[:MAX_REPORTED]]
+    if len(details) > MAX_REPORTED:
+        lines.append(f"  ... and {len(details) - MAX_REPORTED} more")
+    error_msg = '\n'.join(lines)
+    logger.error(error_msg)
+    raise AssertionError(error_msg)
+
 
 class AssertionError(Exception):
     """Custom assertion error with detailed message."""
@@ -32,7 +112,7 @@ class Assertions:
             error_msg = message or f"Expected {expected}, but got {actual}"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"Assertion passed: {actual} == {expected}")
+        logger.debug("Assertion passed: %r == %r", actual, expected)
     
     @staticmethod
     def assert_not_equals(actual: Any, expected: Any, message: str = None):
@@ -50,7 +130,7 @@ class Assertions:
             error_msg = message or f"Expected values to be different, but both are {actual}"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"Assertion passed: {actual} != {expected}")
+        logger.debug("Assertion passed: %r != %r", actual, expected)
     
     @staticmethod
     def assert_status_code(response, expected_code: int):
@@ -67,9 +147,11 @@ class Assertions:
         if actual_code != expected_code:
             error_msg = f"Expected status code {expected_code}, but got {actual_code}"
             logger.error(error_msg)
-            logger.error(f"Response body: {response.text}")
+            artifact = getattr(response, 'artifact', None)
+            logger.error(f"Response body: "
+                         f"{artifact.preview() if artifact else response.text}")
             raise AssertionError(error_msg)
-        logger.debug(f"Status code assertion passed: {actual_code}")
+        logger.debug("Status code assertion passed: %s", actual_code)
     
     @staticmethod
     def assert_json_contains(json_data: Dict, key_path: str, expected_value: Any = None):
@@ -102,7 +184,7 @@ class Assertions:
                 logger.error(error_msg)
                 raise AssertionError(error_msg)
         
-        logger.debug(f"JSON contains assertion passed for key: {key_path}")
+        logger.debug("JSON contains assertion passed for key: %s", key_path)
     
     @staticmethod
     def assert_json_not_contains(json_data: Dict, key_path: str):
@@ -124,7 +206,7 @@ class Assertions:
                     current_data = current_data[key]
                 else:
                     # Key not found, assertion passes
-                    logger.debug(f"JSON not contains assertion passed: {key_path} not found")
+                    logger.debug("JSON not contains assertion passed: %s not found", key_path)
                     return
             
             # If we reach here, key was found
@@ -133,7 +215,7 @@ class Assertions:
             raise AssertionError(error_msg)
         except (KeyError, TypeError):
             # Key not found, assertion passes
-            logger.debug(f"JSON not contains assertion passed: {key_path} not found")
+            logger.debug("JSON not contains assertion passed: %s not found", key_path)
     
     @staticmethod
     def assert_json_schema(json_data: Dict, schema: Dict):
@@ -146,6 +228,8 @@ class Assertions:
         Raises:
             AssertionError: If validation fails
         """
+        from jsonschema import validate, ValidationError
+
         try:
             validate(instance=json_data, schema=schema)
             logger.debug("JSON schema validation passed")
@@ -169,7 +253,7 @@ class Assertions:
             error_msg = f"Expected list to contain {item}, but it doesn't. List: {lst}"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"List contains assertion passed: {item} in list")
+        logger.debug("List contains assertion passed: %r in list", item)
     
     @staticmethod
     def assert_list_not_empty(lst: List):
@@ -185,7 +269,7 @@ class Assertions:
             error_msg = "Expected list to be non-empty, but it's empty"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"List not empty assertion passed: {len(lst)} items")
+        logger.debug("List not empty assertion passed: %d items", len(lst))
     
     @staticmethod
     def assert_greater_than(actual: Union[int, float], expected: Union[int, float]):
@@ -202,7 +286,7 @@ class Assertions:
             error_msg = f"Expected {actual} to be greater than {expected}"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"Greater than assertion passed: {actual} > {expected}")
+        logger.debug("Greater than assertion passed: %s > %s", actual, expected)
     
     @staticmethod
     def assert_less_than(actual: Union[int, float], expected: Union[int, float]):
@@ -219,7 +303,7 @@ class Assertions:
             error_msg = f"Expected {actual} to be less than {expected}"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"Less than assertion passed: {actual} < {expected}")
+        logger.debug("Less than assertion passed: %s < %s", actual, expected)
     
     @staticmethod
     def assert_in_range(value: Union[int, float], min_val: Union[int, float], 
@@ -245,24 +329,233 @@ class Assertions:
                 error_msg = f"Expected {value} to be in range ({min_val}, {max_val})"
                 logger.error(error_msg)
                 raise AssertionError(error_msg)
-        logger.debug(f"In range assertion passed: {value} in range")
+        logger.debug("In range assertion passed: %s in range", value)
+    
+    @staticmethod
+    def assert_all_in(items: Iterable, allowed: Iterable, key: Key = None,
+                      label: str = "item"):
+        """Assert that the key of every item is in ``allowed``.
+
+        ``allowed`` is turned into a set once, so the check is linear in
+        ``len(items) + len(allowed)``.
+
+        Args:
+            items: Items to check
+            allowed: Allowed keys
+            key: Dict key, list index or function giving each item's key;
+                None checks the items themselves
+            label: Item name used in the error message
+
+        Raises:
+            AssertionError: Listing every item whose key is not allowed
+        """
+        if not isinstance(allowed, (set, frozenset, dict)):
+            allowed = set(allowed)
+        keys = _keys(items, key)
+        missing = [(i, k) for i, k in enumerate(keys) if k not in allowed]
+        if missing:
+            _fail(f"{len(missing)} of {len(keys)} {label}s not in the "
+                  f"expected set", [f"{label} {i}: {k!r}" for i, k in missing])
+        logger.debug("All-in assertion passed: %d %ss", len(keys), label)
+    
+    @staticmethod
+    def assert_none_in(items: Iterable, forbidden: Iterable, key: Key = None,
+                       label: str = "item"):
+        """Assert that no item's key is in ``forbidden``.
+
+        Args:
+            items: Items to check
+            forbidden: Keys that must not appear
+            key: Dict key, list index or function giving each item's key
+            label: Item name used in the error message
+
+        Raises:
+            AssertionError: Listing every item with a forbidden key
+        """
+        if not isinstance(forbidden, (set, frozenset, dict)):
+            forbidden = set(forbidden)
+        keys = _keys(items, key)
+        found = [(i, k) for i, k in enumerate(keys) if k in forbidden]
+        if found:
+            _fail(f"{len(found)} of {len(keys)} {label}s have a forbidden "
+                  f"value", [f"{label} {i}: {k!r}" for i, k in found])
+        logger.debug("None-in assertion passed: %d %ss", len(keys), label)
+    
+    @staticmethod
+    def assert_unique_by(items: Iterable, key: Key = None,
+                         label: str = "item"):
+        """Assert that no two items share a key.
+
+        Args:
+            items: Items to check
+            key: Dict key, list index or function giving each item's key
+            label: Item name used in the error message
+
+        Raises:
+            AssertionError: Listing every duplicated key and its positions
+        """
+        keys = _keys(items, key)
+        try:
+            unique = len(set(keys)) == len(keys)
+        except TypeError:
+            unique = False
+        duplicates = [] if unique else [
+            (k, p) for k, p in _positions(keys) if len(p) > 1
+        ]
+        if duplicates:
+            _fail(f"{len(duplicates)} duplicated keys among {len(keys)} "
+                  f"{label}s",
+                  [f"{k!r} at {label}s {p}" for k, p in duplicates])
+        logger.debug("Unique assertion passed: %d %ss", len(keys), label)
+    
+    @staticmethod
+    def assert_sorted_by(items: Iterable, key: Key = None,
+                         descending: bool = False, strict: bool = False,
+                         label: str = "item"):
+        """Assert that items are ordered by key.
+
+        Args:
+            items: Items to check
+            key: Dict key, list index or function giving each item's key
+            descending: Expect descending instead of ascending order
+            strict: Also reject equal neighbouring keys
+            label: Item name used in the error message
+
+        Raises:
+            AssertionError: Listing every position where the order breaks
+        """
+        keys = _keys(items, key)
+        # Sorting already ordered data is a linear pass in C
+        in_order = sorted(keys, reverse=descending) == keys
+        if in_order and strict:
+            # Sorted, so equal keys are neighbours; no hashing needed
+            in_order = all(a != b for a, b in zip(keys, keys[1:]))
+        if not in_order:
+            if descending:
+                broken = [(i, a, b) for i, (a, b) in enumerate(
+                    zip(keys, keys[1:]), 1) if b > a or (strict and b == a)]
+            else:
+                broken = [(i, a, b) for i, (a, b) in enumerate(
+                    zip(keys, keys[1:]), 1) if b < a or (strict and b == a)]
+            order = 'descending' if descending else 'ascending'
+            if strict:
+                order = f"strictly {order}"
+            _fail(f"{len(broken)} of {len(keys)} {label}s break {order} "
+                  f"order",
+                  [f"{label} {i}: {b!r} after {a!r}" for i, a, b in broken])
+        logger.debug("Sorted assertion passed: %d %ss", len(keys), label)
+    
+    @staticmethod
+    def assert_set_equal_by(actual: Iterable, expected: Iterable,
+                            key: Key = None, expected_key: Key = None,
+                            label: str = "item"):
+        """Assert that two collections hold the same set of keys.
+
+        Multiplicity is ignored; combine with ``assert_unique_by`` to
+        check it.
+
+        Args:
+            actual: Actual items
+            expected: Expected items
+            key: Key of the actual items
+            expected_key: Key of the expected items. Defaults to ``key``
+            label: Item name used in the error message
+
+        Raises:
+            AssertionError: With the missing and unexpected keys
+        """
+        actual_keys = set(_keys(actual, key))
+        expected_keys = set(
+            _keys(expected, key if expected_key is None else expected_key))
+        missing = expected_keys - actual_keys
+        unexpected = actual_keys - expected_keys
+        if missing or unexpected:
+            details = []
+            if missing:
+                details.append(f"missing {len(missing)}: {_sample(missing)}")
+            if unexpected:
+                details.append(
+                    f"unexpected {len(unexpected)}: {_sample(unexpected)}")
+            _fail(f"{label} keys differ ({len(actual_keys)} actual, "
+                  f"{len(expected_keys)} expected)", details)
+        logger.debug("Set equality assertion passed: %d %s keys",
+                     len(actual_keys), label)
+    
+    @staticmethod
+    def assert_join_by(left: Iterable, right: Iterable, key: Key = None,
+                       right_key: Key = None, fields: Sequence[Key] = (),
+                       label: str = "item") -> List[Tuple[Any, Any]]:
+        """Assert every left item has a right item with the same key.
+
+        ``right`` is indexed by key once; each left item is then matched
+        in constant time and, if ``fields`` is given, compared field by
+        field.
+
+        Args:
+            left: Items that must all be matched
+            right: Items to match against; extra ones are ignored
+            key: Key of the left items. Defaults to the item itself
+            right_key: Key of the right items. Defaults to ``key``
+            fields: Dict keys, list indexes or functions giving values that
+                must be equal in matched items; a missing one reads as None
+            label: Item name used in the error message
+
+        Returns:
+            Matched ``(left, right)`` pairs, in left order
+
+        Raises:
+            AssertionError: Listing unmatched keys and field mismatches
+        """
+        left = list(left)
+        get_left = _key_func(key) or _identity
+        get_right = _key_func(key if right_key is None else right_key)
+        get_right = get_right or _identity
+        getters = [(getattr(field, '__name__', field), _key_func(field))
+                   for field in fields]
+        index = {get_right(item): item for item in right}
+
+        pairs = []
+        details = []
+        unmatched = 0
+        for item in left:
+            k = get_left(item)
+            partner = index.get(k)
+            if partner is None:
+                unmatched += 1
+                details.append(f"{k!r}: no match")
+                continue
+            for field, get in getters:
+                value = _field(get, item)
+                other = _field(get, partner)
+                if value != other:
+                    details.append(f"{k!r}: {field} {value!r} != {other!r}")
+            pairs.append((item, partner))
+        if details:
+            _fail(f"{unmatched} of {len(left)} {label}s unmatched, "
+                  f"{len(details) - unmatched} field mismatches", details)
+        logger.debug("Join assertion passed: %d %ss matched", len(pairs),
+                     label)
+        return pairs
     
     @staticmethod
-    def assert_response_time(elapsed_time: float, max_time: float):
+    def assert_response_time(elapsed_time: float, max_time: float,
+                             label: str = "Response time"):
         """Assert that response time is within acceptable limit.
         
         Args:
             elapsed_time: Actual response time in seconds
             max_time: Maximum acceptable time in seconds
+            label: What was timed, e.g. a phase such as "TTFB"
             
         Raises:
             AssertionError: If response time exceeds limit
         """
         if elapsed_time > max_time:
-            error_msg = f"Response time {elapsed_time:.2f}s exceeds maximum {max_time:.2f}s"
+            error_msg = f"{label} {elapsed_time:.3f}s exceeds maximum {max_time:.3f}s"
             logger.error(error_msg)
             raise AssertionError(error_msg)
-        logger.debug(f"Response time assertion passed: {elapsed_time:.2f}s < {max_time:.2f}s")
+        logger.debug("%s assertion passed: %.3fs < %.3fs", label, elapsed_time,
+                     max_time)
 
 
 # Create global instance for easy access
@@ -0,0 +1,208 @@
+"""Incremental OHLCV candles built from WebSocket ``trade.*`` frames.
+
+Each trade updates one open candle per timeframe in O(1): a dict lookup on
+the candle open time and a few comparisons. Candles are kept per
+instrument and timeframe, up to ``max_candles`` per series.
+
+Only candles that opened after the first trade was seen, and have since
+closed, are *complete* (every trade in them was observed). ``compare``
+checks only those against REST candles, so partially observed windows at
+either end never cause false mismatches.
+"""
+
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+from utils.timeframes import candle_open, next_open
+
+
+class Candle:
+    """One OHLCV candle, updated trade by trade."""
+    __slots__ = ('t', 'o', 'h', 'l', 'c', 'v', 'trades')
+
+    def __init__(self, t: int, price: float, quantity: float):
+        self.t = t
+        self.o = self.h = self.l = self.c = price
+        self.v = quantity
+        self.trades = 1
+
+    def update(self, price: float, quantity: float):
+        """Add a trade that happened after every trade seen so far."""
+        if price > self.h:
+            self.h = price
+        elif price < self.l:
+            self.l = price
+        self.c = price
+        self.v += quantity
+        self.trades += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Candle in the REST ``result.data`` shape."""
+        return {
+            't': self.t,
+            'o': self.o,
+            'h': self.h,
+            'l': self.l,
+            'c': self.c,
+            'v': self.v,
+            'trades': self.trades
+        }
+
+
+class CandleAggregator:
+    """Maintains OHLCV candles per instrument and timeframe from trades."""
+    def __init__(self,
+                 timeframes: Iterable[str],
+                 max_candles: int = 1000,
+                 dedupe_window: int = 10000):
+        """Initialize candle aggregator.
+
+        Args:
+            timeframes: Timeframe codes to build, e.g. ``["M1", "M5"]``
+            max_candles: Candles kept per instrument and timeframe
+            dedupe_window: Recent trade IDs remembered to drop repeats
+                (the subscription snapshot overlaps the live stream)
+        """
+        self.timeframes = list(timeframes)
+        self.max_candles = max_candles
+        self.series: Dict[Tuple[str, str], 'OrderedDict[int, Candle]'] = {}
+        self.first_trade: Dict[str, int] = {}
+        self.last_trade: Dict[str, int] = {}
+        self.trades = 0
+        self.out_of_order = 0
+        self._seen = set()
+        self._seen_order = deque(maxlen=dedupe_window)
+
+    def add_trade(self, trade: Dict[str, Any]) -> bool:
+        """Apply one trade entry (``i``, ``p``, ``q``, ``t``, ``d`` keys).
+
+        Args:
+            trade: Trade entry from a ``trade.*`` frame
+
+        Returns:
+            False if the trade was a repeat and ignored
+        """
+        trade_id = trade.get('d')
+        if trade_id is not None:
+            if trade_id in self._seen:
+                return False
+            if len(self._seen_order) == self._seen_order.maxlen:
+                self._seen.discard(self._seen_order[0])
+            self._seen_order.append(trade_id)
+            self._seen.add(trade_id)
+
+        instrument = trade['i']
+        t = trade['t']
+        price = float(trade['p'])
+        quantity = float(trade['q'])
+        if instrument not in self.first_trade or t < self.first_trade[
+                instrument]:
+            self.first_trade[instrument] = t
+        if t >= self.last_trade.get(instrument, t):
+            self.last_trade[instrument] = t
+            in_order = True
+        else:
+            self.out_of_order += 1
+            in_order = False
+
+        for timeframe in self.timeframes:
+            series = self.series.get((instrument, timeframe))
+            if series is None:
+                series = self.series[(instrument, timeframe)] = OrderedDict()
+            start = candle_open(t, timeframe)
+            candle = series.get(start)
+            if candle is None:
+                series[start] = Candle(start, price, quantity)
+                if len(series) > self.max_candles:
+                    series.popitem(last=False)
+            elif in_order:
+                candle.update(price, quantity)
+            else:
+                # A late trade can still move the high, low and volume,
+                # but not the close
+                candle.h = max(candle.h, price)
+                candle.l = min(candle.l, price)
+                candle.v += quantity
+                candle.trades += 1
+        self.trades += 1
+        return True
+
+    def add_message(self, message: Any) -> int:
+        """Apply every trade in a WebSocket message; other messages are ignored.
+
+        Args:
+            message: Parsed WebSocket message
+
+        Returns:
+            Number of new trades applied
+        """
+        result = message.get('result') if isinstance(message, dict) else None
+        if not isinstance(result, dict) or not str(
+                result.get('subscription', result.get('channel',
+                                                      ''))).startswith('trade'):
+            return 0
+        # Frames list newest first; apply oldest first
+        return sum(
+            self.add_trade(trade)
+            for trade in reversed(result.get('data') or []))
+
+    def candles(self, instrument: str, timeframe: str) -> List[Candle]:
+        """All candles of one series, oldest first."""
+        series = self.series.get((instrument, timeframe), {})
+        return sorted(series.values(), key=lambda candle: candle.t)
+
+    def complete_candles(self, instrument: str,
+                         timeframe: str) -> List[Candle]:
+        """Candles whose every trade was observed: opened after the first
+        trade seen and closed before the latest one."""
+        first = self.first_trade.get(instrument)
+        last = self.last_trade.get(instrument)
+        if first is None:
+            return []
+        coverage_start = next_open(candle_open(first, timeframe), timeframe)
+        return [
+            candle for candle in self.candles(instrument, timeframe)
+            if candle.t >= coverage_start
+            and next_open(candle.t, timeframe) <= last
+        ]
+
+    def compare(self,
+                instrument: str,
+                timeframe: str,
+                rest_candles: List[Dict[str, Any]],
+                price_tolerance: float = 0.0,
+                volume_tolerance: float = 0.0) -> Tuple[int, List[str]]:
+        """Compare complete candles against REST candles for the same window.
+
+        Args:
+            instrument: Instrument name
+            timeframe: Timeframe code
+            rest_candles: ``result.data`` from ``get-candlestick``
+            price_tolerance: Allowed relative difference of o/h/l/c
+            volume_tolerance: Allowed relative difference of volume
+
+        Returns:
+            Tuple of the number of candles compared and mismatch descriptions
+        """
+        rest = {candle['t']: candle for candle in rest_candles}
+        compared = 0
+        mismatches = []
+        for candle in self.complete_candles(instrument, timeframe):
+            expected = rest.get(candle.t)
+            if expected is None:
+                mismatches.append(f"t={candle.t}: in trade stream "
+                                  f"({candle.trades} trades) but not in REST")
+                continue
+            compared += 1
+            for field, tolerance in (('o', price_tolerance),
+                                     ('h', price_tolerance),
+                                     ('l', price_tolerance),
+                                     ('c', price_tolerance),
+                                     ('v', volume_tolerance)):
+                actual = getattr(candle, field)
+                wanted = float(expected[field])
+                if abs(actual - wanted) > tolerance * max(abs(wanted), 1e-12):
+                    mismatches.append(f"t={candle.t} {field}: trades give "
+                                      f"{actual:g}, REST has {wanted:g}")
+        return compared, mismatches
+
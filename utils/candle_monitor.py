@@ -0,0 +1,377 @@
+"""Continuous candlestick data-quality monitor.
+
+Polls the candlestick endpoint for a set of instruments on an interval and
+validates only the candles that are new or changed since the previous poll.
+Each instrument keeps a high-water mark on candle ``t``; older candles are
+compared by value against what was seen before, which is much cheaper than
+validating the whole ``result.data`` array again::
+
+    python -m utils.candle_monitor --instruments BTCUSD-PERP,ETHUSD-PERP
+    python -m utils.candle_monitor --timeframe M1 --interval 15
+    # Bounded run, exit 1 if any issue was found
+    python -m utils.candle_monitor --iterations 20
+
+Issues reported:
+
+- ``invalid``: missing or non-numeric field, ``l``/``h`` not bounding
+  ``o``/``c``, negative volume or a ``t`` not on a candle boundary
+- ``gap``: candles missing between two consecutive candles
+- ``rewrite``: a closed candle changed after it was seen closed
+- ``stall``: the newest candle is older than ``monitor.stall_periods``
+  timeframes (reported once until the feed advances again)
+- ``error``: the request failed or the response had no ``result.data``
+
+Issues are logged and appended to ``monitor.issues_path`` as JSON lines.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.config_manager import config
+from utils.logger import RUN_ID, get_logger
+from utils.timeframes import DAY_MS, is_aligned, next_open, timeframe_ms
+
+logger = get_logger(__name__)
+
+Issue = namedtuple('Issue', ['kind', 'instrument', 't', 'detail'])
+
+PRICE_FIELDS = ('o', 'h', 'l', 'c')
+
+
+def validate_candle(candle: Dict[str, Any], timeframe: str) -> Optional[str]:
+    """Check one candle's fields and OHLC consistency.
+
+    Args:
+        candle: Candle object from ``result.data``
+        timeframe: Timeframe the candle was requested for
+
+    Returns:
+        Description of the first problem found, or None if valid
+    """
+    values = {}
+    for field in PRICE_FIELDS + ('v',):
+        if field not in candle:
+            return f"missing field {field}"
+        try:
+            values[field] = float(candle[field])
+        except (TypeError, ValueError):
+            return f"non-numeric {field}: {candle[field]!r}"
+    if values['l'] > min(values['o'], values['c']):
+        return f"low {values['l']} above open/close"
+    if values['h'] < max(values['o'], values['c']):
+        return f"high {values['h']} below open/close"
+    if values['v'] < 0:
+        return f"negative volume {values['v']}"
+    # Weekly candles are not epoch-aligned on every venue
+    length = timeframe_ms(timeframe)
+    if length is not None and length <= DAY_MS and not is_aligned(
+            candle['t'], timeframe):
+        return f"t {candle['t']} is not on a {timeframe} boundary"
+    return None
+
+
+def _fingerprint(candle: Dict[str, Any]) -> tuple:
+    """Values compared to detect a changed candle."""
+    return (candle.get('o'), candle.get('h'), candle.get('l'),
+            candle.get('c'), candle.get('v'))
+
+
+class FeedState:
+    """What one instrument's feed looked like at the previous poll."""
+    __slots__ = ('high_water', 'open_fingerprint', 'closed', 'stalled')
+
+    def __init__(self):
+        self.high_water: Optional[int] = None
+        self.open_fingerprint: Optional[tuple] = None
+        # Closed candle t -> fingerprint, oldest first
+        self.closed: Dict[int, tuple] = {}
+        self.stalled = False
+
+
+class CandleMonitor:
+    """Polls candlesticks and validates them incrementally per instrument."""
+    def __init__(self,
+                 instruments: List[str],
+                 timeframe: Optional[str] = None,
+                 monitor_config: Optional[Dict[str, Any]] = None,
+                 base_url: Optional[str] = None):
+        """Initialize candle monitor.
+
+        Args:
+            instruments: Instrument names to poll
+            timeframe: Timeframe code. Defaults to ``monitor.timeframe``
+            monitor_config: Monitor settings. Defaults to ``monitor``
+            base_url: API base URL. Defaults to ``api.base_url``
+
+        Raises:
+            ValueError: If the timeframe is unknown
+        """
+        monitor_config = monitor_config or config.get('monitor', {})
+        self.instruments = list(instruments)
+        self.timeframe = timeframe or monitor_config.get('timeframe', 'M1')
+        self.length = timeframe_ms(self.timeframe)
+        self.interval = float(monitor_config.get('interval_seconds', 30))
+        self.stall_periods = float(monitor_config.get('stall_periods', 3))
+        self.retain = int(monitor_config.get('retain_candles', 500))
+        self.count = monitor_config.get('count') or None
+        self.issues_path = Path(
+            monitor_config.get('issues_path', 'reports/candle_monitor.jsonl'))
+        self.url = (base_url or config.get('api.base_url', '')) + config.get(
+            'api.endpoints.candlestick', '/exchange/v1/public/get-candlestick')
+        self.timeout = float(config.get('api.timeout', 30))
+        self.headers = config.get('api.headers', {})
+
+        self.feeds: Dict[str, FeedState] = {}
+        self.stats = dict.fromkeys(
+            ('polls', 'candles', 'validated', 'issues'), 0)
+
+    def check(self,
+              instrument: str,
+              candles: List[Dict[str, Any]],
+              now_ms: Optional[int] = None) -> List[Issue]:
+        """Validate what changed in one instrument's candles since last time.
+
+        Args:
+            instrument: Instrument name
+            candles: ``result.data`` from the latest poll, in any order
+            now_ms: Current time in epoch milliseconds, for stall detection
+
+        Returns:
+            Issues found
+        """
+        state = self.feeds.setdefault(instrument, FeedState())
+        high_water = state.high_water
+        issues = []
+        fresh = []
+        newest = None
+
+        for candle in candles:
+            t = candle.get('t')
+            if not isinstance(t, int):
+                issues.append(
+                    Issue('invalid', instrument, t, f"bad t: {t!r}"))
+                continue
+            fingerprint = _fingerprint(candle)
+            if high_water is None or t > high_water:
+                fresh.append(candle)
+            elif t == high_water:
+                if fingerprint != state.open_fingerprint:
+                    fresh.append(candle)
+                newest = candle
+            else:
+                seen = state.closed.get(t)
+                if seen is not None and seen != fingerprint:
+                    issues.append(
+                        Issue('rewrite', instrument, t,
+                              f"closed candle changed from {seen} to "
+                              f"{fingerprint}"))
+                    state.closed[t] = fingerprint
+                    fresh.append(candle)
+
+        self.stats['candles'] += len(candles)
+        self.stats['validated'] += len(fresh)
+        for candle in fresh:
+            problem = validate_candle(candle, self.timeframe)
+            if problem:
+                issues.append(Issue('invalid', instrument, candle['t'],
+                                    problem))
+
+        new = sorted((c for c in fresh
+                      if high_water is None or c['t'] > high_water),
+                     key=lambda c: c['t'])
+        issues.extend(self._gaps(instrument, high_water, new))
+
+        if new:
+            # The previous open candle and all but the newest new one closed
+            if newest is not None:
+                state.closed[high_water] = _fingerprint(newest)
+            for candle in new[:-1]:
+                state.closed[candle['t']] = _fingerprint(candle)
+            state.high_water = new[-1]['t']
+            state.open_fingerprint = _fingerprint(new[-1])
+            while len(state.closed) > self.retain:
+                del state.closed[next(iter(state.closed))]
+        elif newest is not None:
+            state.open_fingerprint = _fingerprint(newest)
+
+        issues.extend(self._stall(instrument, state, now_ms))
+        return issues
+
+    def _gaps(self, instrument: str, high_water: Optional[int],
+              new: List[Dict[str, Any]]) -> List[Issue]:
+        """Find missing candles between consecutive new candles."""
+        issues = []
+        previous = high_water
+        for candle in new:
+            t = candle['t']
+            if previous is not None:
+                expected = next_open(previous, self.timeframe)
+                if t > expected:
+                    missing = 0
+                    while expected < t:
+                        missing += 1
+                        expected = next_open(expected, self.timeframe)
+                    issues.append(
+                        Issue('gap', instrument, t,
+                              f"{missing} candle(s) missing after {previous}"))
+            previous = t
+        return issues
+
+    def _stall(self, instrument: str, state: FeedState,
+               now_ms: Optional[int]) -> List[Issue]:
+        """Report a feed whose newest candle stopped advancing."""
+        if now_ms is None:
+            return []
+        length = self.length or 31 * DAY_MS
+        if state.high_water is None:
+            stalled, detail = True, "no candles returned"
+        else:
+            age = now_ms - state.high_water
+            stalled = age > self.stall_periods * length
+            detail = f"newest candle is {age / 1000:.0f}s old"
+        if stalled and not state.stalled:
+            state.stalled = True
+            return [Issue('stall', instrument, state.high_water, detail)]
+        if not stalled and state.stalled:
+            state.stalled = False
+            logger.info(f"Candle feed {instrument} {self.timeframe} resumed")
+        return []
+
+    def fetch(self, instrument: str) -> List[Dict[str, Any]]:
+        """Fetch one instrument's candles.
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails
+            ValueError: If the response has no ``result.data`` list
+        """
+        from utils.http_client import http_client
+
+        params = {'instrument_name': instrument, 'timeframe': self.timeframe}
+        if self.count:
+            params['count'] = self.count
+        response = http_client.request('GET',
+                                       self.url,
+                                       headers=self.headers,
+                                       params=params,
+                                       timeout=self.timeout)
+        response.raise_for_status()
+        data = http_client.json(response).get('result', {}).get('data')
+        if not isinstance(data, list):
+            raise ValueError("Candlestick response has no result.data")
+        return data
+
+    def poll_once(self) -> List[Issue]:
+        """Poll every instrument once, logging and recording any issues.
+
+        Returns:
+            Issues found in this poll
+        """
+        import requests
+
+        start = time.perf_counter()
+        validated = self.stats['validated']
+        issues = []
+        for instrument in self.instruments:
+            try:
+                candles = self.fetch(instrument)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                issues.append(Issue('error', instrument, None, str(e)))
+                continue
+            issues.extend(
+                self.check(instrument, candles, int(time.time() * 1000)))
+
+        self.stats['polls'] += 1
+        self.stats['issues'] += len(issues)
+        for issue in issues:
+            logger.warning(f"Candle {issue.kind} {issue.instrument} "
+                           f"t={issue.t}: {issue.detail}")
+        self._record(issues)
+        logger.info(f"Poll {self.stats['polls']}: {len(self.instruments)} "
+                    f"instruments, {self.stats['validated'] - validated} "
+                    f"candles validated, {len(issues)} issues in "
+                    f"{time.perf_counter() - start:.2f}s")
+        return issues
+
+    def _record(self, issues: List[Issue]):
+        """Append issues to the issues file."""
+        if not issues:
+            return
+        self.issues_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.issues_path, 'a', encoding='utf-8') as f:
+            for issue in issues:
+                f.write(json.dumps(dict(issue._asdict(),
+                                        run_id=RUN_ID,
+                                        timeframe=self.timeframe,
+                                        ts=time.time())) + '\n')
+
+    def run(self, iterations: Optional[int] = None) -> int:
+        """Poll on the configured interval until stopped.
+
+        Args:
+            iterations: Number of polls, or None to run until interrupted
+
+        Returns:
+            Total number of issues found
+        """
+        logger.info(f"Monitoring {len(self.instruments)} instruments "
+                    f"({self.timeframe}) every {self.interval:.0f}s")
+        try:
+            while iterations is None or self.stats['polls'] < iterations:
+                started = time.monotonic()
+                self.poll_once()
+                if iterations is not None and self.stats[
+                        'polls'] >= iterations:
+                    break
+                time.sleep(
+                    max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            logger.info("Candle monitor stopped")
+        logger.info(f"Candle monitor: {self.stats['polls']} polls, "
+                    f"{self.stats['candles']} candles received, "
+                    f"{self.stats['validated']} validated, "
+                    f"{self.stats['issues']} issues")
+        return self.stats['issues']
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    monitor_config = config.get('monitor', {})
+    parser = argparse.ArgumentParser(
+        description="Continuously validate candlestick data")
+    parser.add_argument('--instruments',
+                        default=monitor_config.get('instruments') or '',
+                        help="Comma-separated instrument names "
+                        "(default: monitor.instruments)")
+    parser.add_argument('--timeframe',
+                        default=monitor_config.get('timeframe', 'M1'),
+                        help="Timeframe code (default: %(default)s)")
+    parser.add_argument('--interval',
+                        type=float,
+                        default=float(
+                            monitor_config.get('interval_seconds', 30)),
+                        help="Seconds between polls (default: %(default)s)")
+    parser.add_argument('--iterations',
+                        type=int,
+                        help="Stop after this many polls and exit 1 if any "
+                        "issue was found")
+    args = parser.parse_args(argv)
+
+    instruments = [
+        name.strip() for name in args.instruments.split(',') if name.strip()
+    ]
+    if not instruments:
+        parser.error("no instruments given")
+    monitor = CandleMonitor(instruments, args.timeframe,
+                            dict(monitor_config,
+                                 interval_seconds=args.interval))
+    issues = monitor.run(args.iterations)
+    return 1 if issues and args.iterations is not None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
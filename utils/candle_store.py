@@ -0,0 +1,398 @@
+"""On-disk candlestick store with gap-aware incremental fetch.
+
+Closed candles are immutable, so once fetched they are kept under
+``candle_store.path``, one directory per instrument and timeframe::
+
+    .cache/candles/BTCUSD-PERP/M5/
+        coverage.json                      # [[start, end], ...] fetched
+        1700000000000-1700086400000.seg    # one columnar segment per fetch
+
+A segment is a small header followed by one contiguous little-endian column
+per field (``t`` as int64, then ``o``, ``h``, ``l``, ``c``, ``v`` as
+float64), then one int8 column per price/volume field with the number of
+decimals the API sent. The API sends numeric strings, e.g. ``"0.1200"``;
+reads turn the float back into that string, exponents written out (a
+scale of -1 marks a JSON number, returned as a float), so stored candles
+look like fresh ones.
+Reads memory-map the file and binary-search the ``t`` column, so only the
+requested rows are decoded. Segments of an older format are deleted and
+their ranges fetched again.
+
+``coverage.json`` records the time ranges already fetched, including ranges
+that had no candles, and ``get`` asks the API only for the missing
+sub-ranges. The candle still open at fetch time is never stored. Writes are
+atomic. If two processes update the same series at once, one coverage
+update can be lost, and that range is simply fetched again; duplicate rows
+are dropped on read.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from utils.config_manager import config
+from utils.fileio import atomic_write
+from utils.logger import get_logger
+from utils.run_context import LazySettings
+from utils.timeframes import candle_open
+
+logger = get_logger(__name__)
+
+MAGIC = b'CNDL'
+VERSION = 2
+HEADER = struct.Struct('<4sHxxQ')  # magic, version, row count
+FIELDS = ('t', 'o', 'h', 'l', 'c', 'v')
+
+Range = Tuple[int, int]
+Fetcher = Callable[[int, int], List[Dict[str, Any]]]
+
+
+def subtract_ranges(start: int, end: int, covered: List[Range]) -> List[Range]:
+    """Parts of ``[start, end)`` not in the sorted, merged ``covered`` list."""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    """Sort ranges and merge the ones that overlap or touch."""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _scale(value: Union[str, float]) -> int:
+    """Decimals of a numeric string, or -1 for a JSON number."""
+    if not isinstance(value, str):
+        return -1
+    try:
+        exponent = Decimal(value).as_tuple().exponent
+    except InvalidOperation:
+        raise ValueError(f"Not a number: {value!r}") from None
+    # Not an int for NaN and infinity
+    if not isinstance(exponent, int) or exponent >= 0:
+        return 0
+    return min(127, -exponent)
+
+
+def write_segment(path: Path, candles: List[Dict[str, Any]]):
+    """Atomically write candles, sorted by ``t``, as a columnar segment."""
+    candles = sorted(candles, key=lambda candle: candle['t'])
+    parts = [
+        HEADER.pack(MAGIC, VERSION, len(candles)),
+        array('q', (int(candle['t']) for candle in candles)).tobytes()
+    ]
+    for field in FIELDS[1:]:
+        parts.append(
+            array('d', (float(candle[field]) for candle in candles)).tobytes())
+    for field in FIELDS[1:]:
+        parts.append(
+            array('b', (_scale(candle[field]) for candle in candles)).tobytes())
+    atomic_write(path, b''.join(parts))
+
+
+def segment_version(path: Path) -> Optional[int]:
+    """Format version of a segment, None if it is not one."""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, version, _ = HEADER.unpack(header)
+    return version if magic == MAGIC else None
+
+
+def read_segment(path: Path, start: int, end: int) -> List[Dict[str, Any]]:
+    """Read the candles of a segment with ``start <= t < end``.
+
+    Raises:
+        ValueError: If the file is not a segment
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= HEADER.size:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, count = HEADER.unpack_from(mapped)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a candle segment: {path}")
+            view = memoryview(mapped)
+            try:
+                offset = HEADER.size
+                t_column = view[offset:offset + 8 * count].cast('q')
+                low = bisect.bisect_left(t_column, start)
+                high = bisect.bisect_left(t_column, end, low)
+                columns = [t_column[low:high].tolist()]
+                scale_offset = offset + 8 * count * len(FIELDS)
+                for i in range(1, len(FIELDS)):
+                    column_offset = offset + 8 * count * i
+                    column = view[column_offset:column_offset +
+                                  8 * count].cast('d')
+                    values = column[low:high].tolist()
+                    column.release()
+                    scales = view[scale_offset + count * (i - 1) + low:
+                                  scale_offset + count * (i - 1) +
+                                  high].cast('b').tolist()
+                    columns.append([
+                        f"{value:.{scale}f}" if scale >= 0 else value
+                        for value, scale in zip(values, scales)
+                    ])
+                t_column.release()
+            finally:
+                view.release()
+    return [dict(zip(FIELDS, row)) for row in zip(*columns)]
+
+
+class CandleStore(LazySettings):
+    """Local time-series store of closed candles per instrument and timeframe."""
+    def __init__(self,
+                 path: Optional[str] = None,
+                 store_config: Optional[Dict[str, Any]] = None):
+        """Initialize candle store.
+
+        Args:
+            path: Store directory. Defaults to ``candle_store.path``
+            store_config: Store settings. Defaults to ``candle_store``
+        """
+        self._path = path
+        self._store_config = store_config
+        # Series already checked for segments of an older format
+        self._checked = set()
+
+    def _load_settings(self) -> Dict[str, Any]:
+        store_config = self._store_config or config.get('candle_store', {})
+        return {
+            'root': Path(self._path
+                         or store_config.get('path', '.cache/candles')),
+            'enabled': str(store_config.get('enabled',
+                                            True)).lower() != 'false',
+            'max_segments': int(store_config.get('max_segments', 64)),
+        }
+
+    def _series_dir(self, instrument: str, timeframe: str) -> Path:
+        return self.root / instrument / timeframe
+
+    def coverage(self, instrument: str, timeframe: str) -> List[Range]:
+        """Time ranges already fetched for a series, merged and sorted."""
+        path = self._series_dir(instrument, timeframe) / 'coverage.json'
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return merge_ranges([tuple(r) for r in json.load(f)])
+        except (OSError, ValueError):
+            return []
+
+    def _write_coverage(self, series_dir: Path, ranges: List[Range]):
+        atomic_write(series_dir / 'coverage.json',
+                     json.dumps([list(r) for r in ranges]))
+
+    def _drop_stale(self, instrument: str, timeframe: str):
+        """Delete older-format segments and uncover their ranges."""
+        series_dir = self._series_dir(instrument, timeframe)
+        stale = []
+        for segment in series_dir.glob('*.seg'):
+            try:
+                version = segment_version(segment)
+            except OSError:
+                continue
+            if version != VERSION:
+                first, _, last = segment.stem.partition('-')
+                try:
+                    stale.append((int(first), int(last)))
+                except ValueError:
+                    pass
+                segment.unlink(missing_ok=True)
+        if stale:
+            stale = merge_ranges(stale)
+            self._write_coverage(series_dir, [
+                kept for covered_start, covered_end in self.coverage(
+                    instrument, timeframe) for kept in subtract_ranges(
+                        covered_start, covered_end, stale)
+            ])
+            logger.info(f"Dropped {len(stale)} old-format ranges of "
+                        f"{instrument} {timeframe}")
+
+    def read(self, instrument: str, timeframe: str, start: int,
+             end: int) -> List[Dict[str, Any]]:
+        """Read stored candles with ``start <= t < end``, oldest first."""
+        series_dir = self._series_dir(instrument, timeframe)
+        rows: Dict[int, Dict[str, Any]] = {}
+        for segment in sorted(series_dir.glob('*.seg')):
+            first, _, last = segment.stem.partition('-')
+            try:
+                if int(last) <= start or int(first) >= end:
+                    continue
+                for candle in read_segment(segment, start, end):
+                    rows[candle['t']] = candle
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable segment {segment}: {e}")
+        return [rows[t] for t in sorted(rows)]
+
+    def write(self, instrument: str, timeframe: str, start: int, end: int,
+              candles: List[Dict[str, Any]]):
+        """Store candles fetched for ``[start, end)`` and mark it covered.
+
+        Args:
+            instrument: Instrument name
+            timeframe: Timeframe code
+            start: Range start (epoch ms), inclusive
+            end: Range end (epoch ms), exclusive; only closed candles
+            candles: Candles in the range, any order
+        """
+        series_dir = self._series_dir(instrument, timeframe)
+        series_dir.mkdir(parents=True, exist_ok=True)
+        in_range = [c for c in candles if start <= int(c['t']) < end]
+        if in_range:
+            write_segment(series_dir / f"{start}-{end}.seg", in_range)
+        self._write_coverage(
+            series_dir,
+            merge_ranges(self.coverage(instrument, timeframe) +
+                         [(start, end)]))
+        if len(list(series_dir.glob('*.seg'))) > self.max_segments:
+            self.compact(instrument, timeframe)
+
+    def compact(self, instrument: str, timeframe: str):
+        """Rewrite a series' segments as one segment per covered range."""
+        series_dir = self._series_dir(instrument, timeframe)
+        old_segments = list(series_dir.glob('*.seg'))
+        for start, end in self.coverage(instrument, timeframe):
+            candles = self.read(instrument, timeframe, start, end)
+            if candles:
+                write_segment(series_dir / f"{start}-{end}.seg", candles)
+        kept = {
+            series_dir / f"{start}-{end}.seg"
+            for start, end in self.coverage(instrument, timeframe)
+        }
+        for segment in old_segments:
+            if segment not in kept:
+                segment.unlink(missing_ok=True)
+        logger.debug(f"Compacted {len(old_segments)} segments of "
+                     f"{instrument} {timeframe}")
+
+    def get(self,
+            instrument: str,
+            timeframe: str,
+            start: int,
+            end: int,
+            fetch: Fetcher,
+            now_ms: Optional[int] = None) -> Dict[str, Any]:
+        """Get candles in ``[start, end)``, fetching only what is not stored.
+
+        Args:
+            instrument: Instrument name
+            timeframe: Timeframe code
+            start: Range start (epoch ms), rounded down to a candle open
+            end: Range end (epoch ms), exclusive
+            fetch: Called as ``fetch(start, end)`` for each missing range;
+                returns candle dicts
+            now_ms: Current time in epoch ms. Defaults to the clock
+
+        Returns:
+            Dict with ``candles`` (oldest first), ``fetched`` (missing
+            ranges requested from the API) and ``cached`` (candles served
+            from the store)
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        start = candle_open(start, timeframe)
+        # The candle open at ``now`` may still change: never store it
+        closed_end = min(end, candle_open(now_ms, timeframe))
+
+        if not self.enabled:
+            candles = fetch(start, end)
+            return {
+                'candles': sorted(candles, key=lambda c: c['t']),
+                'fetched': [(start, end)],
+                'cached': 0,
+            }
+
+        if (instrument, timeframe) not in self._checked:
+            self._drop_stale(instrument, timeframe)
+            self._checked.add((instrument, timeframe))
+        missing = subtract_ranges(start, closed_end,
+                                  self.coverage(instrument, timeframe))
+        for gap_start, gap_end in missing:
+            self.write(instrument, timeframe, gap_start, gap_end,
+                       fetch(gap_start, gap_end))
+        candles = self.read(instrument, timeframe, start, closed_end)
+        cached = len(candles) - sum(
+            1 for candle in candles
+            if any(s <= candle['t'] < e for s, e in missing))
+
+        fetched = list(missing)
+        if closed_end < end:
+            # The still-open tail is always fetched fresh
+            tail_start = max(start, closed_end)
+            tail = [
+                c for c in fetch(tail_start, end)
+                if tail_start <= int(c['t']) < end
+            ]
+            candles.extend(sorted(tail, key=lambda c: c['t']))
+            fetched.append((tail_start, end))
+        logger.info(f"Candles {instrument} {timeframe}: {len(candles)} "
+                    f"({cached} from store), fetched {len(fetched)} ranges")
+        return {'candles': candles, 'fetched': fetched, 'cached': cached}
+
+
+def paged_fetch(request: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+                instrument: str,
+                timeframe: str,
+                page_size: int) -> Fetcher:
+    """Build a fetcher that pages through ``[start, end)`` newest first.
+
+    The candlestick endpoint returns at most ``count`` candles ending at
+    ``end_ts``, so pages walk backwards until the range start is reached.
+
+    Args:
+        request: Sends one request with the given query parameters and
+            returns ``result.data``
+        instrument: Instrument name
+        timeframe: Timeframe code
+        page_size: ``count`` per request
+
+    Returns:
+        Fetcher for ``CandleStore.get``
+    """
+    def fetch(start: int, end: int) -> List[Dict[str, Any]]:
+        candles: Dict[int, Dict[str, Any]] = {}
+        cursor = end
+        while cursor > start:
+            page = request({
+                'instrument_name': instrument,
+                'timeframe': timeframe,
+                'count': page_size,
+                'start_ts': start,
+                'end_ts': cursor - 1,
+            })
+            page = [c for c in page if start <= int(c['t']) < cursor]
+            for candle in page:
+                candles[int(candle['t'])] = candle
+            if len(page) < page_size:
+                break
+            cursor = min(int(c['t']) for c in page)
+        return list(candles.values())
+
+    return fetch
+
+
+# Global candle store instance
+candle_store = CandleStore()
@@ -1,33 +1,63 @@
-"""Configuration manager for handling YAML config files and environment variables."""
+"""Configuration manager for handling YAML config files and environment variables.
+
+``config`` is the configuration in effect: the process configuration, unless
+a ``utils.run_context.RunContext`` has activated its own for the current
+thread or asyncio task, or installed it for the whole process.
+"""
 
 import os
-import yaml
+import threading
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any, Dict
-from dotenv import load_dotenv
+from typing import Any, Dict, Mapping, Optional
 
 
 class ConfigManager:
-    """Manages configuration from YAML files and environment variables."""
-    def __init__(self, config_path: str = None):
+    """Manages configuration from YAML files and environment variables.
+
+    The file is read on first access, so importing this module has no I/O
+    and does not import ``yaml`` or ``dotenv``.
+    """
+    def __init__(self,
+                 config_path: str = None,
+                 env: Optional[Mapping[str, str]] = None,
+                 overrides: Optional[Mapping[str, Any]] = None):
         """Initialize configuration manager.
         
         Args:
             config_path: Path to the configuration file. Defaults to config/config.yml
+            env: Environment variables that take precedence over the
+                process environment for ``${VAR:default}`` values
+            overrides: Values by dot-separated key path (e.g.,
+                ``{'api.timeout': 5}``), applied after loading
         """
-        # Load environment variables
-        load_dotenv()
-
         # Set default config path
         if config_path is None:
             config_path = Path(
                 __file__).parent.parent / "config" / "config.yml"
 
         self.config_path = Path(config_path)
-        self._config = self._load_config()
+        self.env = dict(env or {})
+        self.overrides = dict(overrides or {})
+        self._config: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _get_config(self) -> Dict[str, Any]:
+        """Get the loaded configuration, loading it on first use."""
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    self._config = self._load_config()
+        return self._config
 
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file."""
+        import yaml
+        from dotenv import load_dotenv
+
+        # Load environment variables
+        load_dotenv()
+
         if not self.config_path.exists():
             raise FileNotFoundError(
                 f"Configuration file not found: {self.config_path}")
@@ -36,7 +66,24 @@ class ConfigManager:
             config = yaml.safe_load(file)
 
         # Replace environment variables
-        return self._replace_env_vars(config)
+        config = self._replace_env_vars(config)
+        for key_path, value in self.overrides.items():
+            self._set(config, key_path, value)
+        return config
+
+    @staticmethod
+    def _set(config: Dict[str, Any], key_path: str, value: Any):
+        """Set a value by dot-separated key path, creating sections."""
+        *sections, last = key_path.split('.')
+        for key in sections:
+            config = config.setdefault(key, {})
+        config[last] = value
+
+    def _getenv(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Look up an environment variable, own ``env`` first."""
+        if name in self.env:
+            return str(self.env[name])
+        return os.getenv(name, default)
 
     def _replace_env_vars(self, config: Any) -> Any:
         """Recursively replace environment variables in configuration.
@@ -61,9 +108,9 @@ class ConfigManager:
             env_expr = config[2:-1]
             if ':' in env_expr:
                 env_name, default_value = env_expr.split(':', 1)
-                return os.getenv(env_name, default_value)
+                return self._getenv(env_name, default_value)
             else:
-                value = os.getenv(env_expr)
+                value = self._getenv(env_expr)
                 if value is None:
                     raise ValueError(
                         f"Environment variable not found: {env_expr}")
@@ -82,7 +129,7 @@ class ConfigManager:
             Configuration value
         """
         keys = key_path.split('.')
-        value = self._config
+        value = self._get_config()
 
         try:
             for key in keys:
@@ -108,5 +155,48 @@ class ConfigManager:
         self._config = self._load_config()
 
 
+# Configuration activated for the current thread or asyncio task
+_active_config: ContextVar[Optional[ConfigManager]] = ContextVar(
+    'active_config', default=None)
+# Configuration installed for the whole process
+_process_config: Optional[ConfigManager] = None
+
+
+def activate_config(manager: Optional[ConfigManager]):
+    """Make ``manager`` the configuration of the current thread or task.
+
+    Args:
+        manager: Configuration, or None to fall back to the process one
+
+    Returns:
+        Token for ``deactivate_config``
+    """
+    return _active_config.set(manager)
+
+
+def deactivate_config(token):
+    """Restore the configuration in effect before ``activate_config``."""
+    _active_config.reset(token)
+
+
+def install_config(manager: Optional[ConfigManager]):
+    """Make ``manager`` the configuration of every thread.
+
+    Args:
+        manager: Configuration, or None to restore config/config.yml
+    """
+    global _process_config
+    _process_config = manager
+
+
+class _CurrentConfig(ConfigManager):
+    """The process configuration, or the one activated or installed."""
+    def _get_config(self) -> Dict[str, Any]:
+        active = _active_config.get() or _process_config
+        if active is not None and active is not self:
+            return active._get_config()
+        return super()._get_config()
+
+
 # Global configuration instance
-config = ConfigManager()
+config = _CurrentConfig()
@@ -0,0 +1,713 @@
+"""Distributed behave runner: one coordinator, workers on any number of hosts.
+
+The coordinator discovers scenarios, owns the queue and merges the results
+into ``reports/`` exactly like ``utils.parallel_runner``. Workers connect
+over plain TCP, pull batches of scenarios, run each batch in a separate
+behave process and send back its JSON, JUnit, log, traffic and step metrics
+output::
+
+    python -m utils.distributed coordinator --port 8765 --tags=@rest
+    python -m utils.distributed worker --host ci-runner-1 --port 8765
+
+    # Coordinator and three workers on this host
+    python -m utils.distributed local --workers 3 -- --no-capture
+
+Every worker host needs the same checkout, since batches name scenarios by
+``features/...:line`` location. Messages are newline-delimited JSON objects
+with a ``type`` key:
+
+- worker ``hello`` -> coordinator ``welcome`` (run ID, tags, behave args)
+- worker ``request`` -> coordinator ``batch``, ``wait`` (queue empty but
+  batches still in flight) or ``done``
+- worker ``heartbeat`` while a batch runs, then ``result``
+
+A worker that disconnects or misses heartbeats for
+``distributed.heartbeat_timeout`` seconds has its in-flight batch requeued,
+up to ``distributed.max_attempts`` times. The run fails with the remaining
+batches reported as lost if no worker is connected for
+``distributed.idle_timeout`` seconds, or, in ``local`` mode, once every
+worker process has exited.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.config_manager import config
+from utils.logger import RUN_ID, get_logger
+from utils.parallel_runner import (discover_scenarios, log_records,
+                                   merge_results, run_worker)
+from utils.scheduler import Scheduler
+
+logger = get_logger(__name__)
+
+
+def send_message(stream, message: Dict[str, Any],
+                 lock: Optional[threading.Lock] = None):
+    """Write one JSON message line to a socket file."""
+    data = json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+    if lock is None:
+        stream.write(data)
+        stream.flush()
+        return
+    with lock:
+        stream.write(data)
+        stream.flush()
+
+
+def read_message(stream) -> Optional[Dict[str, Any]]:
+    """Read one JSON message line, or None once the peer has closed."""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def make_batches(scenarios: List[Dict[str, Any]],
+                 scheduler: Scheduler,
+                 batch_size: int,
+                 matrix_shards: int) -> List[Dict[str, Any]]:
+    """Group scenarios into batches, longest estimated batch first.
+
+    Plain scenarios are sorted by estimate and cut into batches of
+    ``batch_size``. ``@matrix`` outlines become ``matrix_shards`` batches,
+    each running every outline with its own ``MATRIX_SHARD``.
+
+    Args:
+        scenarios: Scenarios from ``discover_scenarios``
+        scheduler: Scheduler providing duration estimates
+        batch_size: Plain scenarios per batch
+        matrix_shards: Number of slices of the instrument matrix
+
+    Returns:
+        Batches with ``id``, ``locations``, ``matrix_shard``, ``estimate``
+        and ``attempts`` keys
+    """
+    plain = sorted((s for s in scenarios if not s['matrix']),
+                   key=scheduler.estimate,
+                   reverse=True)
+    matrix = [s for s in scenarios if s['matrix']]
+
+    batches = []
+    for start in range(0, len(plain), batch_size):
+        chunk = plain[start:start + batch_size]
+        batches.append({
+            'locations': [s['location'] for s in chunk],
+            'matrix_shard': None,
+            'estimate': sum(scheduler.estimate(s) for s in chunk),
+        })
+    if matrix:
+        matrix_estimate = sum(scheduler.estimate(s) for s in matrix)
+        for index in range(matrix_shards):
+            batches.append({
+                'locations': [s['location'] for s in matrix],
+                'matrix_shard': f"{index}/{matrix_shards}",
+                'estimate': matrix_estimate / matrix_shards,
+            })
+
+    batches.sort(key=lambda b: b['estimate'], reverse=True)
+    for batch_id, batch in enumerate(batches):
+        batch.update(id=batch_id, attempts=0)
+    return batches
+
+
+class WorkQueue:
+    """Thread-safe queue of batches, tracking which worker runs each one."""
+    def __init__(self, batches: List[Dict[str, Any]], max_attempts: int = 3):
+        """Initialize work queue.
+
+        Args:
+            batches: Batches from ``make_batches``
+            max_attempts: Times a batch is handed out before it is given up
+        """
+        self.max_attempts = max_attempts
+        self.pending = deque(batches)
+        self.in_flight: Dict[int, Any] = {}
+        self.results: List[Dict[str, Any]] = []
+        self.lost: List[Dict[str, Any]] = []
+        self.total = len(batches)
+        self._condition = threading.Condition()
+
+    def take(self, owner: Any) -> Optional[Dict[str, Any]]:
+        """Hand the next batch to a worker.
+
+        Args:
+            owner: Worker connection taking the batch
+
+        Returns:
+            The batch, ``{}`` if none is pending but some are still in
+            flight (the worker should ask again), or None when done
+        """
+        with self._condition:
+            if self.pending:
+                batch = self.pending.popleft()
+                batch['attempts'] += 1
+                self.in_flight[batch['id']] = (owner, batch)
+                return batch
+            return {} if self.in_flight else None
+
+    def complete(self, owner: Any, batch_id: int, result: Dict[str, Any]):
+        """Record a finished batch, ignoring results for batches not held."""
+        with self._condition:
+            held = self.in_flight.get(batch_id)
+            if held is None or held[0] is not owner:
+                logger.warning(f"Ignoring result for batch {batch_id} "
+                               f"not held by {result['worker']}")
+                return
+            del self.in_flight[batch_id]
+            self.results.append(result)
+            self._condition.notify_all()
+
+    def requeue(self, owner: Any,
+                batch_ids: Optional[List[int]] = None) -> List[int]:
+        """Put a worker's in-flight batches back at the head of the queue.
+
+        Args:
+            owner: Worker connection that went away or lost the batches
+            batch_ids: Batches to requeue. Defaults to all the worker holds
+
+        Returns:
+            IDs of the batches requeued
+        """
+        with self._condition:
+            requeued = []
+            for batch_id, (held_by, batch) in list(self.in_flight.items()):
+                if held_by is not owner or (batch_ids is not None
+                                            and batch_id not in batch_ids):
+                    continue
+                del self.in_flight[batch_id]
+                if batch['attempts'] >= self.max_attempts:
+                    logger.error(f"Giving up on batch {batch_id} after "
+                                 f"{batch['attempts']} attempts: "
+                                 f"{', '.join(batch['locations'])}")
+                    self.lost.append(batch)
+                else:
+                    self.pending.appendleft(batch)
+                    requeued.append(batch_id)
+            self._condition.notify_all()
+            return requeued
+
+    def abandon(self) -> List[Dict[str, Any]]:
+        """Give up on every pending and in-flight batch.
+
+        Returns:
+            The batches given up, now also in ``lost``
+        """
+        with self._condition:
+            abandoned = list(self.pending) + [
+                batch for _, batch in self.in_flight.values()
+            ]
+            self.pending.clear()
+            self.in_flight.clear()
+            self.lost.extend(abandoned)
+            self._condition.notify_all()
+            return abandoned
+
+    @property
+    def done(self) -> bool:
+        """Whether every batch has finished or been given up."""
+        with self._condition:
+            return not self.pending and not self.in_flight
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until done.
+
+        Args:
+            timeout: Seconds to wait, or None to wait indefinitely
+
+        Returns:
+            True if done, False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self.pending and not self.in_flight, timeout)
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _WorkerConnection(socketserver.StreamRequestHandler):
+    """Serves one worker until it disconnects, requeueing what it held."""
+    def handle(self):
+        coordinator = self.server.coordinator
+        self.request.settimeout(coordinator.heartbeat_timeout)
+        self.name = '%s:%s' % self.client_address
+        coordinator.worker_connected()
+        try:
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+                if not self._dispatch(coordinator, message):
+                    break
+        except (OSError, ValueError) as e:
+            logger.warning(f"Lost worker {self.name}: {e}")
+        finally:
+            coordinator.worker_disconnected()
+            requeued = coordinator.queue.requeue(self)
+            if requeued:
+                logger.warning(f"Worker {self.name} disconnected, requeued "
+                               f"batches {requeued}")
+
+    def _dispatch(self, coordinator: 'Coordinator',
+                  message: Dict[str, Any]) -> bool:
+        """Handle one message. Returns False to close the connection."""
+        kind = message.get('type')
+        if kind == 'hello':
+            self.name = message.get('worker', self.name)
+            logger.info(f"Worker {self.name} connected")
+            send_message(self.wfile, {
+                'type': 'welcome',
+                'run_id': RUN_ID,
+                'tags': coordinator.tags,
+                'behave_args': coordinator.behave_args,
+            })
+        elif kind == 'request':
+            batch = coordinator.queue.take(self)
+            if batch is None:
+                send_message(self.wfile, {'type': 'done'})
+                return False
+            if not batch:
+                send_message(self.wfile, {'type': 'wait'})
+            else:
+                logger.info(f"Batch {batch['id']} -> {self.name} "
+                            f"({len(batch['locations'])} locations, "
+                            f"attempt {batch['attempts']})")
+                send_message(self.wfile, {
+                    'type': 'batch',
+                    'id': batch['id'],
+                    'locations': batch['locations'],
+                    'matrix_shard': batch['matrix_shard'],
+                })
+        elif kind == 'result':
+            # A behave process killed by a signal, or one that never wrote
+            # its results, is lost work rather than a test failure
+            if (message['returncode'] < 0
+                    or not message.get('files', {}).get('json')):
+                logger.warning(f"Batch {message['id']} produced no results on "
+                               f"{self.name} (exit {message['returncode']})")
+                coordinator.queue.requeue(self, [message['id']])
+            else:
+                result = coordinator.save_result(self.name, message)
+                coordinator.queue.complete(self, message['id'], result)
+        elif kind != 'heartbeat':
+            logger.warning(f"Unknown message from {self.name}: {kind}")
+        return True
+
+
+class Coordinator:
+    """Owns the scenario queue and collects results from remote workers."""
+    def __init__(self,
+                 batches: List[Dict[str, Any]],
+                 tags: Optional[List[str]] = None,
+                 behave_args: Optional[List[str]] = None,
+                 host: Optional[str] = None,
+                 port: Optional[int] = None):
+        """Initialize coordinator and bind its listening socket.
+
+        Args:
+            batches: Batches from ``make_batches``
+            tags: Behave ``--tags`` expressions, sent to every worker
+            behave_args: Extra behave arguments, sent to every worker
+            host: Address to listen on. Defaults to ``distributed.host``
+            port: Port to listen on (0 for any). Defaults to
+                ``distributed.port``
+        """
+        dist_config = config.get('distributed', {})
+        self.tags = list(tags or [])
+        self.behave_args = list(behave_args or [])
+        self.heartbeat_timeout = float(
+            dist_config.get('heartbeat_timeout', 30))
+        self.idle_timeout = float(dist_config.get('idle_timeout', 300))
+        self.connected = 0
+        self._idle_since = time.monotonic()
+        self._connected_lock = threading.Lock()
+        self.queue = WorkQueue(batches,
+                               int(dist_config.get('max_attempts', 3)))
+        self.results_dir = Path(
+            config.get('parallel.workers_dir',
+                       'reports/workers')) / 'distributed'
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+        address = (host or dist_config.get('host', '0.0.0.0'),
+                   int(dist_config.get('port', 8765) if port is None else port))
+        self.server = _CoordinatorServer(address, _WorkerConnection)
+        self.server.coordinator = self
+
+    @property
+    def port(self) -> int:
+        """Port actually bound (useful when started with port 0)."""
+        return self.server.server_address[1]
+
+    def worker_connected(self):
+        """Count a worker connection."""
+        with self._connected_lock:
+            self.connected += 1
+
+    def worker_disconnected(self):
+        """Count a closed worker connection."""
+        with self._connected_lock:
+            self.connected -= 1
+            if not self.connected:
+                self._idle_since = time.monotonic()
+
+    def _stalled(self, processes: List[subprocess.Popen]) -> Optional[str]:
+        """Why no worker can finish the remaining batches, if so."""
+        with self._connected_lock:
+            if self.connected:
+                return None
+            idle = time.monotonic() - self._idle_since
+        if processes and all(p.poll() is not None for p in processes):
+            codes = ', '.join(str(p.returncode) for p in processes)
+            return f"All local workers exited (exit codes {codes})"
+        if idle > self.idle_timeout:
+            return f"No worker connected for {idle:.0f}s"
+        return None
+
+    def save_result(self, worker: str,
+                    message: Dict[str, Any]) -> Dict[str, Any]:
+        """Write a batch's output under the results directory.
+
+        Args:
+            worker: Worker name
+            message: ``result`` message
+
+        Returns:
+            Worker result in the form ``merge_results`` expects
+        """
+        name = f"b{message['id']}"
+        batch_dir = self.results_dir / name
+        result = {
+            'worker': f"{name} ({worker})",
+            'batch': message['id'],
+            'json': batch_dir / 'results.json',
+            'html': None,
+            'junit': batch_dir / 'junit',
+            'log': batch_dir / 'test_log.log',
+            'traffic': batch_dir / 'traffic.jsonl',
+            'metrics': batch_dir / 'metrics.json',
+            'scenarios': message['scenarios'],
+            'returncode': message['returncode'],
+            'duration': message['duration'],
+        }
+        result['junit'].mkdir(parents=True, exist_ok=True)
+        files = message.get('files', {})
+        for key in ('json', 'log', 'traffic', 'metrics'):
+            if files.get(key) is not None:
+                result[key].write_text(files[key], encoding='utf-8')
+        for filename, text in (files.get('junit') or {}).items():
+            (result['junit'] / Path(filename).name).write_text(
+                text, encoding='utf-8')
+        logger.info(f"Batch {message['id']} finished on {worker}: "
+                    f"exit {message['returncode']}, "
+                    f"{message['duration']:.1f}s")
+        return result
+
+    def serve(self,
+              processes: Optional[List[subprocess.Popen]] = None) -> WorkQueue:
+        """Serve workers until every batch has finished or been given up.
+
+        Remaining batches are given up once no worker is connected for
+        ``idle_timeout`` seconds, or once every process in ``processes``
+        has exited.
+
+        Args:
+            processes: Local worker processes to watch
+
+        Returns:
+            The work queue, holding results and lost batches
+        """
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        logger.info(f"Coordinator listening on port {self.port}, "
+                    f"{self.queue.total} batches queued")
+        try:
+            while not self.queue.wait(1.0):
+                reason = self._stalled(processes or [])
+                if reason is not None:
+                    abandoned = self.queue.abandon()
+                    logger.error(f"{reason}; giving up on "
+                                 f"{len(abandoned)} batches")
+                    break
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+        return self.queue
+
+
+def run_coordinator(paths: List[str],
+                    tags: Optional[List[str]] = None,
+                    behave_args: Optional[List[str]] = None,
+                    host: Optional[str] = None,
+                    port: Optional[int] = None,
+                    batch_size: Optional[int] = None,
+                    local_workers: int = 0) -> int:
+    """Queue scenarios, serve workers and merge results into ``reports/``.
+
+    Args:
+        paths: Feature files or directories
+        tags: Behave ``--tags`` expressions
+        behave_args: Extra behave command line arguments for every batch
+        host: Address to listen on. Defaults to ``distributed.host``
+        port: Port to listen on. Defaults to ``distributed.port``
+        batch_size: Scenarios per batch. Defaults to
+            ``distributed.batch_size``
+        local_workers: Worker processes to start on this host
+
+    Returns:
+        0 if every batch ran and passed, 1 otherwise
+    """
+    dist_config = config.get('distributed', {})
+    scenarios = discover_scenarios(paths, tags)
+    if not scenarios:
+        logger.warning("No scenarios selected")
+        return 0
+
+    scheduler = Scheduler()
+    batches = make_batches(
+        scenarios, scheduler,
+        max(1, batch_size or int(dist_config.get('batch_size', 4))),
+        max(1, int(dist_config.get('matrix_shards', 4))))
+    coordinator = Coordinator(batches, tags, behave_args, host, port)
+
+    workers = [
+        subprocess.Popen([
+            sys.executable, '-m', 'utils.distributed', 'worker', '--host',
+            '127.0.0.1', '--port',
+            str(coordinator.port)
+        ]) for _ in range(local_workers)
+    ]
+    try:
+        queue = coordinator.serve(workers)
+    finally:
+        for worker in workers:
+            try:
+                worker.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+    results = sorted(queue.results, key=lambda r: r['batch'])
+    reports_dir = Path(config.get('parallel.reports_dir', 'reports'))
+    merge_results(results, reports_dir, scheduler)
+
+    failed = [r['worker'] for r in results if r['returncode'] != 0]
+    if failed:
+        logger.error(f"Failed batches: {', '.join(failed)}")
+    if queue.lost:
+        logger.error(f"Batches never completed: "
+                     f"{[batch['id'] for batch in queue.lost]}")
+    return 1 if failed or queue.lost else 0
+
+
+def _read_text(path: Path) -> Optional[str]:
+    """Read a worker output file, or None if the batch did not write it."""
+    try:
+        return path.read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return None
+
+
+def _connect(host: str, port: int, timeout: float) -> socket.socket:
+    """Connect to the coordinator, retrying until it is listening."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((host, port), timeout=10)
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run_remote_worker(host: str,
+                      port: int,
+                      connect_timeout: float = 30.0) -> int:
+    """Pull batches from a coordinator and run them until the queue is empty.
+
+    Args:
+        host: Coordinator host
+        port: Coordinator port
+        connect_timeout: Seconds to keep retrying the first connection
+
+    Returns:
+        0 when the coordinator reports the run done, 1 if it went away
+    """
+    dist_config = config.get('distributed', {})
+    heartbeat_interval = float(dist_config.get('heartbeat_interval', 5))
+    name = f"{socket.gethostname()}-{os.getpid()}"
+    workers_dir = Path(config.get('parallel.workers_dir',
+                                  'reports/workers')) / f"remote-{name}"
+
+    try:
+        sock = _connect(host, port, connect_timeout)
+    except OSError as e:
+        logger.error(f"Cannot reach coordinator {host}:{port}: {e}")
+        return 1
+    sock.settimeout(None)
+    stream = sock.makefile('rwb')
+    lock = threading.Lock()
+
+    try:
+        send_message(stream, {'type': 'hello', 'worker': name}, lock)
+        welcome = read_message(stream)
+        if welcome is None or welcome.get('type') != 'welcome':
+            logger.error(f"Unexpected reply from coordinator: {welcome}")
+            return 1
+        logger.info(f"Worker {name} joined run {welcome['run_id']}")
+
+        while True:
+            send_message(stream, {'type': 'request'}, lock)
+            message = read_message(stream)
+            if message is None:
+                logger.error("Coordinator closed the connection")
+                return 1
+            if message['type'] == 'done':
+                return 0
+            if message['type'] == 'wait':
+                time.sleep(1)
+                continue
+            result = _run_batch(message, welcome, workers_dir, stream, lock,
+                                heartbeat_interval)
+            send_message(stream, result, lock)
+    except OSError as e:
+        logger.error(f"Lost connection to coordinator: {e}")
+        return 1
+    finally:
+        stream.close()
+        sock.close()
+
+
+def _run_batch(batch: Dict[str, Any], welcome: Dict[str, Any],
+               workers_dir: Path, stream, lock: threading.Lock,
+               heartbeat_interval: float) -> Dict[str, Any]:
+    """Run one batch in a behave process, heartbeating until it finishes.
+
+    Returns:
+        The ``result`` message for the coordinator
+    """
+    batch_dir = workers_dir / f"b{batch['id']}"
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    shard, _, shards = (batch['matrix_shard'] or '0/1').partition('/')
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(heartbeat_interval):
+            try:
+                send_message(stream, {'type': 'heartbeat'}, lock)
+            except OSError:
+                return
+
+    thread = threading.Thread(target=heartbeat, daemon=True)
+    thread.start()
+    try:
+        result = run_worker(int(shard), int(shards),
+                            [{'location': loc} for loc in batch['locations']],
+                            batch_dir, welcome['tags'], welcome['behave_args'],
+                            run_id=welcome['run_id'])
+    finally:
+        stop.set()
+        thread.join()
+
+    junit = {
+        path.name: _read_text(path)
+        for path in sorted(result['junit'].glob('TESTS-*.xml'))
+    }
+    return {
+        'type': 'result',
+        'id': batch['id'],
+        'scenarios': result['scenarios'],
+        'returncode': result['returncode'],
+        'duration': result['duration'],
+        'files': {
+            'json': _read_text(result['json']),
+            'junit': junit,
+            'log': ''.join(log_records(result['log'], welcome['run_id'])),
+            'traffic': _read_text(result['traffic']),
+            'metrics': _read_text(result['metrics']),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Run behave scenarios across hosts",
+        epilog="Arguments after -- are passed to every behave batch.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for command in ('coordinator', 'local'):
+        sub = commands.add_parser(
+            command,
+            help="Serve the scenario queue" if command == 'coordinator' else
+            "Run a coordinator and workers on this host")
+        sub.add_argument('paths', nargs='*', default=['features'])
+        sub.add_argument('-t',
+                         '--tags',
+                         action='append',
+                         help="Behave tag expression (repeatable)")
+        sub.add_argument('--batch-size',
+                         type=int,
+                         help="Scenarios per batch "
+                         "(default: distributed.batch_size)")
+        if command == 'coordinator':
+            sub.add_argument('--host',
+                             help="Listen address (default: distributed.host)")
+            sub.add_argument('--port',
+                             type=int,
+                             help="Listen port (default: distributed.port)")
+        else:
+            sub.add_argument('-w',
+                             '--workers',
+                             type=int,
+                             default=2,
+                             help="Local worker processes "
+                             "(default: %(default)s)")
+
+    worker = commands.add_parser('worker', help="Run batches for a coordinator")
+    worker.add_argument('--host', required=True, help="Coordinator host")
+    worker.add_argument('--port',
+                        type=int,
+                        default=int(config.get('distributed.port', 8765)),
+                        help="Coordinator port (default: %(default)s)")
+    worker.add_argument('--connect-timeout',
+                        type=float,
+                        default=30.0,
+                        help="Seconds to retry connecting "
+                        "(default: %(default)s)")
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, behave_args = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        return run_remote_worker(args.host, args.port, args.connect_timeout)
+    if args.command == 'local':
+        return run_coordinator(args.paths,
+                               args.tags,
+                               behave_args,
+                               host='127.0.0.1',
+                               port=0,
+                               batch_size=args.batch_size,
+                               local_workers=max(1, args.workers))
+    return run_coordinator(args.paths, args.tags, behave_args, args.host,
+                           args.port, args.batch_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""Small file helpers shared by the caches, stores and reports."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Union
+
+
+def atomic_write(path: Union[str, Path], data: Union[str, bytes]):
+    """Replace a file with new content; readers see the old or the new file.
+
+    The content is written to a temporary file next to ``path``, named after
+    this process and thread so concurrent writers never share one, and then
+    renamed over ``path``. The temporary file is removed if writing fails.
+
+    Args:
+        path: File to replace; missing parent directories are created
+        data: Content; text is written as UTF-8
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(
+        f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
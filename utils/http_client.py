@@ -0,0 +1,276 @@
+"""HTTP client that records a per-phase timing breakdown of each exchange.
+
+Phases, in seconds:
+
+- ``dns``: name resolution (0 on a reused connection, near 0 when cached
+  by ``utils.transport``)
+- ``connect``: TCP connect (0 on a reused connection)
+- ``tls``: TLS handshake (0 for plain HTTP or a reused connection; shorter
+  when the session is resumed)
+- ``ttfb``: request sent until response headers are parsed
+- ``download``: reading the response body
+- ``decode``: JSON decoding
+- ``total``: wall time of the whole exchange, including decode
+
+``requests``' own ``response.elapsed`` stops at the headers, so it leaves out
+the body download and decode.
+"""
+
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.wait import wait_for_read
+
+from utils.transport import read_pending_tickets, transport
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download', 'decode', 'total')
+
+_local = threading.local()
+
+
+def _timings() -> Dict[str, float]:
+    """Timings of the exchange in progress on this thread."""
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        timings = _local.timings = dict.fromkeys(PHASES, 0.0)
+    return timings
+
+
+class _TimedConnectionMixin:
+    """Splits urllib3's connection setup and response wait into phases."""
+    def _new_conn(self) -> socket.socket:
+        timings = _timings()
+        start = time.perf_counter()
+        try:
+            addresses = transport.resolve(self._dns_host, self.port,
+                                          allowed_gai_family(),
+                                          socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        finally:
+            resolved = time.perf_counter()
+            timings['dns'] += resolved - start
+
+        # Connect to the resolved addresses so DNS is not timed twice; the
+        # hostname is restored before TLS so SNI and verification use it
+        host = self._dns_host
+        error = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except Exception as e:
+                    error = e
+            raise error
+        finally:
+            self._dns_host = host
+            timings['connect'] += time.perf_counter() - resolved
+
+    def request(self, *args, **kwargs):
+        client = getattr(_local, 'client', None)
+        if client is not None:
+            with client._in_flight_lock:
+                client._in_flight[threading.get_ident()] = self
+        super().request(*args, **kwargs)
+        self._request_sent = time.perf_counter()
+
+    def getresponse(self):
+        response = super().getresponse()
+        sent = getattr(self, '_request_sent', None)
+        if sent is not None:
+            _timings()['ttfb'] += time.perf_counter() - sent
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """Plain HTTP connection with DNS, connect and TTFB timing."""
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPS connection that also times the TLS handshake.
+
+    Uses ``utils.transport``'s shared TLS context, so sessions are resumed.
+    """
+    def __init__(self, *args, **kwargs):
+        if kwargs.get('ssl_context') is None:
+            kwargs['ssl_context'] = transport.ssl_context
+        super().__init__(*args, **kwargs)
+
+    def connect(self):
+        timings = _timings()
+        before = timings['dns'] + timings['connect']
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        timings['tls'] += elapsed - (timings['dns'] + timings['connect'] -
+                                     before)
+        self._session_kept = False
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether the idle connection is still usable.
+
+        urllib3 drops a pooled connection whose socket is readable; late
+        TLS session tickets are processed (and kept) instead.
+        """
+        if self.sock is None:
+            return False
+        if not wait_for_read(self.sock, timeout=0.0):
+            return True
+        if read_pending_tickets(self.sock):
+            transport.remember_session(self.sock)
+            return not wait_for_read(self.sock, timeout=0.0)
+        return False
+
+    def getresponse(self):
+        response = super().getresponse()
+        # TLS 1.3 tickets usually arrive with the first response
+        if not getattr(self, '_session_kept', True):
+            transport.remember_session(self.sock)
+            self._session_kept = True
+        return response
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Transport adapter whose connection pools use the timed connections."""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """``requests`` session that attaches phase timings to each response.
+
+    Connections are kept alive between requests, so only the first request
+    to a host pays for DNS, connect and TLS.
+    """
+    def __init__(self):
+        """Initialize HTTP client."""
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Connection each thread is exchanging on, so another thread can
+        # abort it
+        self._in_flight: Dict[int, Any] = {}
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def last_timings(self) -> Dict[str, float]:
+        """Timings of the latest exchange on this thread, even a failed one."""
+        return dict(_timings())
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request and read the full body.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Passed to ``requests.Session.request``
+
+        Returns:
+            Response with a ``timings`` dict attribute (see module docs)
+        """
+        _local.timings = dict.fromkeys(PHASES, 0.0)
+        _local.client = self
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, stream=True,
+                                            **kwargs)
+            headers_read = time.perf_counter()
+            response.content  # Read the body now to time the download
+            _local.timings['download'] = time.perf_counter() - headers_read
+        finally:
+            _local.timings['total'] = time.perf_counter() - start
+            _local.client = None
+            with self._in_flight_lock:
+                self._in_flight.pop(threading.get_ident(), None)
+        response.timings = _local.timings
+        return response
+
+    def abort(self, thread_id: Optional[int] = None) -> int:
+        """Cut in-flight exchanges, waking threads blocked on the socket.
+
+        Safe to call from any thread; the aborted requests fail with a
+        connection error.
+
+        Args:
+            thread_id: Only abort this thread's exchange. Defaults to all
+
+        Returns:
+            Number of exchanges aborted
+        """
+        with self._in_flight_lock:
+            connections = [
+                connection for ident, connection in self._in_flight.items()
+                if thread_id is None or ident == thread_id
+            ]
+        aborted = 0
+        for connection in connections:
+            sock = getattr(connection, 'sock', None)
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                aborted += 1
+            except OSError:
+                pass
+        return aborted
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def json(self, response: requests.Response) -> Any:
+        """Decode a JSON body, adding the time to the response's timings.
+
+        Args:
+            response: Response returned by ``request``
+
+        Returns:
+            Decoded JSON
+
+        Raises:
+            ValueError: If the body is not valid JSON
+        """
+        start = time.perf_counter()
+        try:
+            return response.json()
+        finally:
+            elapsed = time.perf_counter() - start
+            timings = getattr(response, 'timings', None)
+            if timings is not None:
+                timings['decode'] = elapsed
+                timings['total'] += elapsed
+
+
+def describe_timings(timings: Optional[Dict[str, float]]) -> str:
+    """Format timings as ``dns=1ms connect=12ms ...`` for log lines."""
+    if not timings:
+        return ''
+    return ' '.join(f"{phase}={timings[phase] * 1000:.0f}ms"
+                    for phase in PHASES if phase in timings)
+
+
+# Global HTTP client instance
+http_client = HttpClient()
@@ -0,0 +1,120 @@
+"""Instrument catalog with an on-disk TTL cache."""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.config_manager import config
+from utils.fileio import atomic_write
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class InstrumentCatalog:
+    """Fetches the exchange instrument list and caches it on disk.
+
+    The cache file is shared by every behave process on the host, so parallel
+    workers only hit the instruments endpoint once per TTL window.
+    """
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 catalog_config: Optional[Dict[str, Any]] = None):
+        """Initialize instrument catalog.
+
+        Args:
+            base_url: API base URL. Defaults to ``api.base_url`` from config
+            catalog_config: Catalog settings. Defaults to ``catalog`` from config
+        """
+        catalog_config = catalog_config or config.get('catalog', {})
+        self.base_url = base_url or config.get('api.base_url')
+        self.endpoint = catalog_config.get(
+            'endpoint', '/exchange/v1/public/get-instruments')
+        self.cache_path = Path(
+            catalog_config.get('cache_path', '.cache/instruments.json'))
+        self.ttl = float(catalog_config.get('ttl_seconds', 3600))
+        self.inst_types = catalog_config.get('inst_types') or []
+        self.timeout = int(config.get('api.timeout', 30))
+
+    def get_instruments(self, refresh: bool = False) -> List[str]:
+        """Get instrument names, fetching the catalog only when the cache is stale.
+
+        Args:
+            refresh: Ignore the cache and fetch the catalog again
+
+        Returns:
+            Sorted list of instrument names
+        """
+        import requests
+
+        cached = None if refresh else self._read_cache()
+        if cached is not None and self._is_fresh(cached):
+            return self._select(cached['instruments'])
+
+        try:
+            instruments = self._fetch()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if cached is not None:
+                logger.warning(
+                    f"Instrument catalog fetch failed, using stale cache: {e}")
+                return self._select(cached['instruments'])
+            raise
+
+        self._write_cache(instruments)
+        return self._select(instruments)
+
+    def _fetch(self) -> List[Dict[str, Any]]:
+        """Fetch the raw instrument list from the API."""
+        import requests
+
+        url = f"{self.base_url}{self.endpoint}"
+        logger.info(f"Fetching instrument catalog: {url}")
+
+        response = requests.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json().get('result', {}).get('data')
+        if not isinstance(data, list):
+            raise ValueError("Instrument catalog response has no result.data")
+        return data
+
+    def _select(self, instruments: List[Dict[str, Any]]) -> List[str]:
+        """Filter raw instruments by type and tradability."""
+        names = []
+        for instrument in instruments:
+            if self.inst_types and instrument.get(
+                    'inst_type') not in self.inst_types:
+                continue
+            if instrument.get('tradable') is False:
+                continue
+            name = instrument.get('symbol') or instrument.get(
+                'instrument_name')
+            if name:
+                names.append(name)
+        return sorted(set(names))
+
+    def _is_fresh(self, cached: Dict[str, Any]) -> bool:
+        """Check whether a cache entry is within its TTL."""
+        return time.time() - cached.get('fetched_at', 0) < self.ttl
+
+    def _read_cache(self) -> Optional[Dict[str, Any]]:
+        """Read the cache file, ignoring missing or corrupt files."""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached.get('instruments'), list):
+            return None
+        return cached
+
+    def _write_cache(self, instruments: List[Dict[str, Any]]):
+        """Atomically replace the cache file."""
+        atomic_write(
+            self.cache_path,
+            json.dumps({
+                'fetched_at': time.time(),
+                'instruments': instruments
+            }))
+        logger.debug(
+            f"Cached {len(instruments)} instruments to {self.cache_path}")
@@ -0,0 +1,283 @@
+"""Size- and time-based log rotation with background compression.
+
+Rotated segments are named ``<stem>.<timestamp>.<run_id>.log.gz`` and listed in
+``<stem>.index.jsonl`` together with the scenario ids they contain, so a
+segment can be found again by run or scenario id::
+
+    python -m utils.log_rotation --run-id 20261019T020726-4242
+    python -m utils.log_rotation --scenario features/rest/candlestick.feature:12
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.fileio import atomic_write
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """Rotating file handler bounded by size, age and retention.
+
+    Rollover only renames the active file; gzip compression and pruning of
+    old segments run on a single background thread.
+    """
+    def __init__(self,
+                 filename: str,
+                 run_id: str,
+                 max_bytes: int = 0,
+                 interval_seconds: float = 0,
+                 backup_count: int = 0,
+                 retention_days: float = 0,
+                 compress: bool = True,
+                 encoding: Optional[str] = 'utf-8'):
+        """Initialize handler.
+
+        Args:
+            filename: Active log file path
+            run_id: Run id embedded in segment names and the index
+            max_bytes: Rotate when the active file would exceed this size (0 = off)
+            interval_seconds: Rotate when the active file is older than this (0 = off)
+            backup_count: Keep at most this many segments (0 = unlimited)
+            retention_days: Delete segments older than this (0 = forever)
+            compress: Gzip rotated segments
+            encoding: File encoding
+        """
+        super().__init__(filename,
+                         maxBytes=max_bytes,
+                         backupCount=backup_count,
+                         encoding=encoding)
+        self.run_id = run_id
+        self.interval_seconds = interval_seconds
+        self.retention_days = retention_days
+        self.compress = compress
+
+        path = Path(self.baseFilename)
+        self.index_path = path.with_name(f"{path.stem}.index.jsonl")
+        self._segment_glob = f"{path.stem}.*.log*"
+        self._opened_at = time.time()
+        self._scenarios = set()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def emit(self, record):
+        """Track scenario ids of the active segment, then write the record."""
+        scenario_id = getattr(record, 'scenario_id', None)
+        if scenario_id and scenario_id != '-':
+            self._scenarios.add(scenario_id)
+        super().emit(record)
+
+    def shouldRollover(self, record) -> bool:
+        """Roll over on size (inherited) or segment age."""
+        if (self.interval_seconds
+                and time.time() - self._opened_at >= self.interval_seconds
+                and os.path.exists(self.baseFilename)
+                and os.path.getsize(self.baseFilename) > 0):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        """Rename the active file to a segment and compress it in background."""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        started = self._opened_at
+        ended = time.time()
+        path = Path(self.baseFilename)
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(ended))
+        segment = path.with_name(f"{path.stem}.{stamp}.{self.run_id}.log")
+        counter = 1
+        while segment.exists() or Path(f"{segment}.gz").exists():
+            segment = path.with_name(
+                f"{path.stem}.{stamp}-{counter}.{self.run_id}.log")
+            counter += 1
+
+        if path.exists():
+            os.replace(path, segment)
+            entry = {
+                'segment': segment.name + ('.gz' if self.compress else ''),
+                'run_id': self.run_id,
+                'scenarios': sorted(self._scenarios),
+                'start': started,
+                'end': ended,
+            }
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            self._submit(self._finish_segment, segment)
+
+        self._scenarios = set()
+        self._opened_at = time.time()
+        if not self.delay:
+            self.stream = self._open()
+
+    def close(self):
+        """Close the stream and wait for pending compression jobs."""
+        super().close()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _submit(self, func, *args):
+        """Run a job on the background maintenance thread."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='log-rotation')
+            self._executor.submit(func, *args)
+
+    def _finish_segment(self, segment: Path):
+        """Compress a rotated segment and apply the retention policy."""
+        if self.compress:
+            with open(segment, 'rb') as src, gzip.open(f"{segment}.gz",
+                                                       'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            segment.unlink()
+        self._prune()
+
+    def _prune(self):
+        """Delete segments beyond the backup count or retention window."""
+        directory = Path(self.baseFilename).parent
+        segments = sorted(directory.glob(self._segment_glob),
+                          key=lambda p: p.stat().st_mtime,
+                          reverse=True)
+        cutoff = (time.time() - self.retention_days * 86400
+                  if self.retention_days else None)
+
+        removed = set()
+        for i, segment in enumerate(segments):
+            expired = cutoff is not None and segment.stat().st_mtime < cutoff
+            if expired or (self.backupCount and i >= self.backupCount):
+                segment.unlink(missing_ok=True)
+                removed.add(segment.name)
+
+        if removed and self.index_path.exists():
+            entries = [
+                entry for entry in read_index(self.index_path)
+                if entry.get('segment') not in removed
+                and entry.get('segment', '').rsplit('.gz', 1)[0] not in removed
+            ]
+            atomic_write(self.index_path,
+                         ''.join(json.dumps(entry) + '\n' for entry in entries))
+
+
+def read_index(index_path: Path) -> List[Dict[str, Any]]:
+    """Read segment index entries, skipping corrupt lines.
+
+    Args:
+        index_path: Path to ``<stem>.index.jsonl``
+
+    Returns:
+        List of index entries
+    """
+    entries = []
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def open_segment(path: Path):
+    """Open a plain or gzip segment for text reading."""
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def segment_paths(log_file: str,
+                  run_id: Optional[str] = None,
+                  scenario: Optional[str] = None) -> List[Path]:
+    """Rotated segments matching a run and/or scenario id, then the active file.
+
+    Segments are listed in rotation order, so reading the returned files one
+    after the other yields records in time order.
+
+    Args:
+        log_file: Active log file path
+        run_id: Run id to match
+        scenario: Scenario id (``feature:line``) to match
+
+    Returns:
+        Existing segment paths, followed by the active file if it exists
+    """
+    path = Path(log_file)
+    index_path = path.with_name(f"{path.stem}.index.jsonl")
+    paths = []
+    if index_path.exists():
+        for entry in read_index(index_path):
+            if run_id and entry.get('run_id') != run_id:
+                continue
+            if scenario and scenario not in entry.get('scenarios', []):
+                continue
+            segment = path.with_name(entry['segment'])
+            if not segment.exists():
+                # Compression may still be pending
+                segment = path.with_name(entry['segment'].rsplit('.gz', 1)[0])
+            if segment.exists():
+                paths.append(segment)
+    if path.exists():
+        paths.append(path)
+    return paths
+
+
+def search_logs(log_file: str,
+                run_id: Optional[str] = None,
+                scenario: Optional[str] = None,
+                text: Optional[str] = None) -> Iterator[str]:
+    """Yield log lines matching a run id, scenario id and/or text.
+
+    Only segments whose index entry matches are opened; the active log file
+    is always searched.
+
+    Args:
+        log_file: Active log file path
+        run_id: Run id to match
+        scenario: Scenario id (``feature:line``) to match
+        text: Plain substring to match
+
+    Returns:
+        Iterator over matching lines
+    """
+    needles = [n for n in (run_id, scenario, text) if n]
+    for segment in segment_paths(log_file, run_id, scenario):
+        with open_segment(segment) as f:
+            for line in f:
+                if all(needle in line for needle in needles):
+                    yield line.rstrip('\n')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for searching rotated logs."""
+    parser = argparse.ArgumentParser(
+        description="Search rotated test logs by run or scenario id")
+    parser.add_argument('log_file',
+                        nargs='?',
+                        default='reports/test_log.log',
+                        help="Active log file (default: %(default)s)")
+    parser.add_argument('--run-id', help="Run id to match")
+    parser.add_argument('--scenario', help="Scenario id (feature:line)")
+    parser.add_argument('--grep', help="Substring to match")
+    args = parser.parse_args(argv)
+
+    found = 0
+    for line in search_logs(args.log_file, args.run_id, args.scenario,
+                            args.grep):
+        print(line)
+        found += 1
+    return 0 if found else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
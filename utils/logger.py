@@ -1,30 +1,202 @@
-"""Logger utility for test framework."""
+"""Logger utility for test framework.
 
+All loggers share one process-wide ``QueueListener``. Callers only enqueue
+records; the console and file handlers format and write them on the listener
+thread, so slow disks never block step execution. The listener and its files
+are created on the first emitted record, not at import.
+"""
+
+import atexit
 import logging
-import colorlog
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 from utils.config_manager import config
+from utils.log_rotation import CompressingRotatingFileHandler
 
+# Identifies this run in log records and rotated segment names
+RUN_ID = os.environ.get('BEHAVE_RUN_ID') or (
+    f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}")
 
-class Logger:
-    """Custom logger with colored console output and file logging."""
-    def __init__(self, name: str, log_file: Optional[str] = None):
-        """Initialize logger.
-        
-        Args:
-            name: Logger name
-            log_file: Path to log file. If None, uses config default
-        """
-        self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
+_scenario_id = '-'
+_environment = '-'
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_file_handlers: Dict[str, logging.Handler] = {}
+_pending_files: Dict[str, tuple] = {}
+_loggers: Dict[tuple, "Logger"] = {}
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Enqueue the record untouched instead of formatting it here."""
+        return record
+
+
+class _Lazy:
+    """Defer computing a log argument until the record is formatted."""
+    __slots__ = ('func', )
+
+    def __init__(self, func: Callable[[], Any]):
+        self.func = func
+
+    def __str__(self) -> str:
+        return str(self.func())
+
+
+class _LogScope:
+    """Environment and scenario id of one thread or asyncio task."""
+    __slots__ = ('environment', 'scenario_id')
+
+    def __init__(self, environment: str):
+        self.environment = environment
+        self.scenario_id = '-'
+
+
+_log_scope: ContextVar[Optional[_LogScope]] = ContextVar('log_scope',
+                                                         default=None)
+
+
+class _RunContextFilter(logging.Filter):
+    """Stamp records with the run id, environment and current scenario id.
+
+    Runs in the calling thread, before the record is queued, so records of
+    a thread or task inside ``enter_log_scope`` get that scope's values.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = RUN_ID
+        scope = _log_scope.get()
+        if scope is None:
+            record.environment = _environment
+            record.scenario_id = _scenario_id
+        else:
+            record.environment = scope.environment
+            record.scenario_id = scope.scenario_id
+        return True
+
+
+def set_log_scenario(scenario_id: Optional[str] = None):
+    """Set the scenario id stamped on subsequent log records.
+
+    Inside ``enter_log_scope`` this only affects the current scope.
+
+    Args:
+        scenario_id: Scenario id (e.g. ``feature:line``), or None to clear
+    """
+    global _scenario_id
+    scope = _log_scope.get()
+    if scope is None:
+        _scenario_id = scenario_id or '-'
+    else:
+        scope.scenario_id = scenario_id or '-'
+
+
+def set_log_environment(environment: Optional[str] = None):
+    """Set the environment stamped on log records outside any scope.
+
+    Args:
+        environment: Environment name, or None to clear
+    """
+    global _environment
+    _environment = environment or '-'
+
+
+def enter_log_scope(environment: str):
+    """Give the current thread or asyncio task its own log environment.
+
+    Args:
+        environment: Environment name for ``%(environment)s``
+
+    Returns:
+        Token for ``exit_log_scope``
+    """
+    return _log_scope.set(_LogScope(environment))
+
+
+def exit_log_scope(token):
+    """Leave the scope entered with ``enter_log_scope``."""
+    _log_scope.reset(token)
+
+
+class _FileFormatter(logging.Formatter):
+    """File formatter that writes already formatted records unchanged."""
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, 'formatted', False):
+            return record.msg
+        return super().format(record)
 
-        # Remove existing handlers
-        self.logger.handlers = []
+
+class _NameFilter(logging.Filter):
+    """Pass only records from one logger, for per-logger log files."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.name == self.name
+
+
+def _default_log_file() -> str:
+    """Get the shared log file path from config."""
+    return config.get_logging_config().get('file_path',
+                                           'reports/test_log.log')
+
+
+def _levels() -> tuple:
+    """Get the configured console and file log levels."""
+    log_config = config.get_logging_config()
+    return (getattr(logging, log_config.get('level', 'INFO')),
+            getattr(logging, log_config.get('file_level', 'DEBUG')))
+
+
+def _make_file_handler(log_file: str) -> logging.Handler:
+    """Create a file handler at the file level, creating parent directories.
+
+    Uses a rotating handler when ``logging.rotation`` is configured.
+    """
+    log_config = config.get_logging_config()
+    log_format = log_config.get(
+        'file_format',
+        log_config.get('format',
+                       '%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_path = Path(log_file)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    rotation = log_config.get('rotation')
+    if rotation:
+        file_handler = CompressingRotatingFileHandler(
+            str(log_path),
+            run_id=RUN_ID,
+            max_bytes=int(rotation.get('max_bytes', 0)),
+            interval_seconds=float(rotation.get('interval_seconds', 0)),
+            backup_count=int(rotation.get('backup_count', 0)),
+            retention_days=float(rotation.get('retention_days', 0)),
+            compress=str(rotation.get('compress', True)).lower() == 'true')
+    else:
+        file_handler = logging.FileHandler(log_path, encoding='utf-8')
+    file_handler.setLevel(_levels()[1])
+    file_handler.setFormatter(_FileFormatter(log_format))
+    return file_handler
+
+
+def _start_listener():
+    """Create the shared handlers and start the listener thread.
+
+    Called on the first emitted record, so merely creating loggers at import
+    time opens no files and does not import ``colorlog``.
+    """
+    global _listener
+    import colorlog
+
+    with _lock:
+        if _listener is not None:
+            return
 
         # Get logging config
         log_config = config.get_logging_config()
-        log_level = getattr(logging, log_config.get('level', 'INFO'))
+        log_level = _levels()[0]
         log_format = log_config.get(
             'format', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -42,20 +214,120 @@ class Logger:
                 'CRITICAL': 'red,bg_white',
             })
         console_handler.setFormatter(console_format)
-        self.logger.addHandler(console_handler)
 
-        # File handler
-        if log_file is None:
-            log_file = log_config.get('file_path', 'reports/test_log.log')
+        # Shared file handler
+        log_file = _default_log_file()
+        handlers = [console_handler, _make_file_handler(log_file)]
+        _file_handlers[str(Path(log_file))] = handlers[-1]
 
-        log_path = Path(log_file)
-        log_path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-logger files requested before the listener started
+        for key, (name, extra_file) in list(_pending_files.items()):
+            if key not in _file_handlers:
+                file_handler = _make_file_handler(extra_file)
+                file_handler.addFilter(_NameFilter(name))
+                _file_handlers[key] = file_handler
+                handlers.append(file_handler)
+        _pending_files.clear()
 
-        file_handler = logging.FileHandler(log_path, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(log_format)
-        file_handler.setFormatter(file_formatter)
-        self.logger.addHandler(file_handler)
+        # Records below every handler level are dropped before formatting
+        level = min(_levels())
+        for logger in _loggers.values():
+            logger.logger.setLevel(level)
+
+        _listener = QueueListener(_queue,
+                                  *handlers,
+                                  respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+class _LazyStartQueueHandler(_DeferredQueueHandler):
+    """Shared queue handler that starts the listener on first use."""
+    def emit(self, record: logging.LogRecord):
+        if _listener is None:
+            _start_listener()
+        super().emit(record)
+
+
+_queue = queue.SimpleQueue()
+_queue_handler = _LazyStartQueueHandler(_queue)
+_queue_handler.addFilter(_RunContextFilter())
+
+
+def _add_file_handler(name: str, log_file: str):
+    """Attach an extra file handler receiving only records from ``name``."""
+    key = str(Path(log_file))
+    with _lock:
+        if key in _file_handlers:
+            return
+        if _listener is None:
+            _pending_files[key] = (name, log_file)
+            return
+        file_handler = _make_file_handler(log_file)
+        file_handler.addFilter(_NameFilter(name))
+        _file_handlers[key] = file_handler
+        _listener.handlers = _listener.handlers + (file_handler, )
+
+
+def write_formatted(text: str, scenario_id: Optional[str] = None):
+    """Write an already formatted record to the shared log file.
+
+    The record goes through the shared file handler, so e.g. records merged
+    from worker logs are rotated and indexed by scenario id like any other.
+
+    Args:
+        text: Formatted record, possibly several lines
+        scenario_id: Scenario id the record belongs to
+    """
+    if _listener is None:
+        _start_listener()
+    handler = _file_handlers[str(Path(_default_log_file()))]
+    handler.handle(
+        logging.makeLogRecord({
+            'msg': text.rstrip('\n'),
+            'levelno': logging.CRITICAL,
+            'levelname': 'CRITICAL',
+            'formatted': True,
+            'scenario_id': scenario_id or '-',
+        }))
+
+
+def shutdown_logging():
+    """Drain queued records and close all handlers.
+
+    A later record starts a fresh listener.
+    """
+    global _listener
+
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _file_handlers.clear()
+
+
+class Logger:
+    """Custom logger with colored console output and file logging."""
+    def __init__(self, name: str, log_file: Optional[str] = None):
+        """Initialize logger.
+        
+        Args:
+            name: Logger name
+            log_file: Path to log file. If None, uses config default
+        """
+        self.logger = logging.getLogger(name)
+        # Narrowed to the configured levels once the listener starts
+        self.logger.setLevel(
+            min(_levels()) if _listener is not None else logging.DEBUG)
+
+        # Route through the shared queue instead of per-logger handlers
+        self.logger.handlers = [_queue_handler]
+
+        if log_file is not None:
+            _add_file_handler(name, log_file)
 
     def debug(self, message: str, *args, **kwargs):
         """Log debug message."""
@@ -92,19 +364,23 @@ class Logger:
             body: Request body
             params: Query parameters
         """
-        self.info(f"Request: {method} {url}")
+        self.info("Request: %s %s", method, url)
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         if params:
-            self.debug(f"Query Parameters: {params}")
+            self.debug("Query Parameters: %s", params)
         if headers:
-            self.debug(f"Headers: {headers}")
+            self.debug("Headers: %s", headers)
         if body:
-            self.debug(f"Body: {body}")
+            self.debug("Body: %s", body)
 
     def log_response(self,
                      status_code: int,
                      headers: dict = None,
                      body: dict = None,
-                     elapsed_time: float = None):
+                     elapsed_time: float = None,
+                     response=None,
+                     max_body: int = 500):
         """Log HTTP response details.
         
         Args:
@@ -112,16 +388,25 @@ class Logger:
             headers: Response headers
             body: Response body
             elapsed_time: Request elapsed time in seconds
+            response: Optional response object; its headers and truncated
+                body are only rendered if the DEBUG record is emitted
+            max_body: Body preview length when ``response`` is given
         """
         if elapsed_time:
-            self.info(f"Response: {status_code} ({elapsed_time:.2f}s)")
+            self.info("Response: %s (%.2fs)", status_code, elapsed_time)
         else:
-            self.info(f"Response: {status_code}")
+            self.info("Response: %s", status_code)
 
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        if response is not None:
+            headers = headers or response.headers
+            if body is None and response.content:
+                body = _Lazy(lambda: response.text[:max_body])
         if headers:
-            self.debug(f"Response Headers: {headers}")
+            self.debug("Response Headers: %s", headers)
         if body:
-            self.debug(f"Response Body: {body}")
+            self.debug("Response Body: %s", body)
 
 
 def get_logger(name: str, log_file: Optional[str] = None) -> Logger:
@@ -134,4 +419,8 @@ def get_logger(name: str, log_file: Optional[str] = None) -> Logger:
     Returns:
         Logger instance
     """
-    return Logger(name, log_file)
+    key = (name, log_file)
+    logger = _loggers.get(key)
+    if logger is None:
+        logger = _loggers.setdefault(key, Logger(name, log_file))
+    return logger
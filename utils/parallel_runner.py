@@ -0,0 +1,512 @@
+"""Parallel behave runner.
+
+Discovers scenarios under ``features/``, balances them across worker
+processes using durations from previous runs (see ``utils.scheduler``) and
+merges the workers' JSON, JUnit, log and step metrics output into
+``reports/``::
+
+    python -m utils.parallel_runner --jobs 4 --tags=@smoke
+    python -m utils.parallel_runner --jobs 8 features/rest -- --no-capture
+
+Each worker is a separate ``behave`` process with a fresh step registry.
+``@matrix`` outlines are given to every worker, each expanding its own
+``MATRIX_SHARD`` slice of the instrument matrix.
+"""
+
+import argparse
+import heapq
+import html
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.config_manager import config
+from utils.log_rotation import open_segment, segment_paths
+from utils.logger import RUN_ID, get_logger, write_formatted
+from utils.scenario_matrix import MATRIX_TAG
+from utils.scheduler import Scheduler
+from utils.step_metrics import merge_files as merge_step_metrics
+
+logger = get_logger(__name__)
+
+_RECORD_START = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}')
+_FORMAT_FIELD = re.compile(r'%\((\w+)\)[#0 +-]*\d*(?:\.\d+)?[a-z]')
+
+
+def discover_scenarios(paths: List[str],
+                       tags: Optional[List[str]] = None
+                       ) -> List[Dict[str, Any]]:
+    """Discover runnable scenarios, applying a behave tag filter.
+
+    Args:
+        paths: Feature files or directories
+        tags: Behave ``--tags`` expressions
+
+    Returns:
+        List of scenario descriptors with ``location``, ``name``, ``tags``
+        and ``matrix`` keys, in file order
+    """
+    from behave.parser import parse_file
+    from behave.tag_expression import TagExpression
+
+    tag_expression = TagExpression(tags or [])
+    feature_files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            feature_files.extend(sorted(path.rglob('*.feature')))
+        elif path.suffix == '.feature':
+            feature_files.append(path)
+
+    scenarios = []
+    for feature_file in feature_files:
+        feature = parse_file(str(feature_file))
+        if feature is None:
+            continue
+        for scenario in feature.scenarios:
+            matrix = (scenario.type == "scenario_outline"
+                      and MATRIX_TAG in scenario.effective_tags)
+            rows = [scenario] if matrix else list(
+                getattr(scenario, 'scenarios', [scenario]))
+            for row in rows:
+                tags_ = list(row.effective_tags)
+                if not tag_expression.check(tags_):
+                    continue
+                line = row.examples[0].table.rows[0].line if matrix else row.line
+                scenarios.append({
+                    'location': f"{feature_file.as_posix()}:{line}",
+                    'name': row.name,
+                    'tags': [str(tag) for tag in tags_],
+                    'matrix': matrix,
+                })
+    return scenarios
+
+
+def _location_key(location: str):
+    """Sort key grouping locations by file, then line."""
+    filename, _, line = location.rpartition(':')
+    return filename, int(line)
+
+
+def run_worker(worker_id: int,
+               jobs: int,
+               scenarios: List[Dict[str, Any]],
+               workers_dir: Path,
+               tags: Optional[List[str]] = None,
+               behave_args: Optional[List[str]] = None,
+               stream: bool = False,
+               run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Run one shard in a separate behave process.
+
+    Args:
+        worker_id: Zero-based worker index
+        jobs: Total number of workers
+        scenarios: Scenarios assigned to this worker
+        workers_dir: Directory for per-worker output
+        tags: Behave ``--tags`` expressions, passed through
+        behave_args: Extra behave command line arguments
+        stream: Use the streaming formatter instead of the HTML formatter
+        run_id: Run ID to log under. Defaults to this process's ``RUN_ID``
+
+    Returns:
+        Worker result with return code, output paths and duration
+    """
+    name = f"w{worker_id}"
+    result = {
+        'worker': name,
+        'json': workers_dir / f"{name}.json",
+        'html': (workers_dir / name / 'index.html'
+                 if stream else workers_dir / f"{name}.html"),
+        'junit': workers_dir / f"junit-{name}",
+        'log': workers_dir / f"test_log.{name}.log",
+        'traffic': workers_dir / f"traffic.{name}.jsonl",
+        'metrics': workers_dir / f"{name}.metrics.json",
+        'scenarios': len(scenarios),
+    }
+    locations = sorted({s['location'] for s in scenarios}, key=_location_key)
+    # Worker logs append; start from empty files so a merge sees this run only
+    for key in ('log', 'traffic'):
+        result[key].unlink(missing_ok=True)
+
+    command = [
+        sys.executable, '-m', 'utils.parallel_runner', '--worker',
+        '--json-out', str(result['json']), '--html-out',
+        str(result['html']), '--html-format',
+        'stream' if stream else 'my_html', '--'
+    ]
+    command += [f"--tags={tag}" for tag in tags or []]
+    command += ['--junit', '--junit-directory', str(result['junit'])]
+    command += list(behave_args or []) + locations
+
+    env = dict(os.environ,
+               BEHAVE_RUN_ID=run_id or RUN_ID,
+               BEHAVE_WORKER_ID=str(worker_id),
+               LOG_FILE=str(result['log']),
+               TRAFFIC_LOG_FILE=str(result['traffic']),
+               STEP_METRICS_FILE=str(result['metrics']),
+               STEP_METRICS_OPENMETRICS_FILE=str(
+                   workers_dir / f"{name}.metrics.txt"),
+               MATRIX_SHARD=f"{worker_id}/{jobs}")
+
+    start = time.monotonic()
+    with open(workers_dir / f"{name}.out", 'w', encoding='utf-8') as out:
+        completed = subprocess.run(command,
+                                   env=env,
+                                   stdout=out,
+                                   stderr=subprocess.STDOUT)
+    result['returncode'] = completed.returncode
+    result['duration'] = time.monotonic() - start
+    logger.info(f"Worker {name} finished: {len(locations)} locations, "
+                f"exit {completed.returncode}, {result['duration']:.1f}s")
+    return result
+
+
+def merge_json(json_files: List[Path], out_path: Path) -> List[Dict]:
+    """Merge behave JSON results, combining elements of the same feature.
+
+    Args:
+        json_files: Per-worker JSON result files
+        out_path: Merged output path
+
+    Returns:
+        Merged feature list
+    """
+    features = {}
+    for json_file in json_files:
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                worker_features = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Missing or unreadable worker results: {json_file}")
+            continue
+        for feature in worker_features:
+            merged = features.setdefault(feature['location'],
+                                         dict(feature, elements={}))
+            # Workers report scenarios outside their shard as skipped
+            for element in feature.get('elements', []):
+                key = (element['location'], element.get('name'))
+                existing = merged['elements'].get(key)
+                if existing is None or (existing.get('status') == 'skipped'
+                                        and element.get('status') != 'skipped'):
+                    merged['elements'][key] = element
+            if feature.get('status') == 'failed':
+                merged['status'] = 'failed'
+
+    merged_features = sorted(features.values(),
+                             key=lambda f: _location_key(f['location']))
+    for feature in merged_features:
+        feature['elements'] = sorted(
+            feature['elements'].values(),
+            key=lambda e: _location_key(e['location']))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(merged_features, f, indent=2)
+    return merged_features
+
+
+def merge_junit(junit_dirs: List[Path], out_dir: Path):
+    """Merge per-worker JUnit files, one file per feature.
+
+    Test cases reported as skipped by one worker and run by another are
+    deduplicated and the suite totals recomputed.
+
+    Args:
+        junit_dirs: Per-worker JUnit directories
+        out_dir: Merged output directory
+    """
+    suites = {}
+    cases = {}
+    for junit_dir in junit_dirs:
+        for xml_file in sorted(Path(junit_dir).glob('TESTS-*.xml')):
+            suite = ET.parse(xml_file).getroot()
+            suites.setdefault(xml_file.name, suite)
+            suite_cases = cases.setdefault(xml_file.name, {})
+            for case in suite.findall('testcase'):
+                key = (case.get('classname'), case.get('name'))
+                existing = suite_cases.get(key)
+                if existing is None or (existing.find('skipped') is not None
+                                        and case.find('skipped') is None):
+                    suite_cases[key] = case
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, suite in suites.items():
+        for case in suite.findall('testcase'):
+            suite.remove(case)
+        suite_cases = list(cases[name].values())
+        suite.extend(suite_cases)
+        suite.set('tests', str(len(suite_cases)))
+        for attr, tag in (('errors', 'error'), ('failures', 'failure'),
+                          ('skipped', 'skipped')):
+            suite.set(
+                attr,
+                str(sum(1 for c in suite_cases if c.find(tag) is not None)))
+        suite.set(
+            'time',
+            str(round(sum(float(c.get('time', 0)) for c in suite_cases), 6)))
+        ET.ElementTree(suite).write(out_dir / name,
+                                    encoding='UTF-8',
+                                    xml_declaration=True)
+
+
+def log_records(log_file: Path, run_id: str = RUN_ID) -> Iterator[str]:
+    """Yield multi-line log records of one run, rotated segments first.
+
+    Args:
+        log_file: Active log file path
+        run_id: Run whose rotated segments are read
+
+    Returns:
+        Iterator over records in time order
+    """
+    for path in segment_paths(str(log_file), run_id=run_id):
+        record = []
+        with open_segment(path) as f:
+            for line in f:
+                if _RECORD_START.match(line) and record:
+                    yield ''.join(record)
+                    record = []
+                record.append(line)
+        if record:
+            yield ''.join(record)
+
+
+def _scenario_id_pattern() -> Optional[re.Pattern]:
+    """Regex capturing the scenario id of a record in the file log format."""
+    log_config = config.get_logging_config()
+    log_format = log_config.get('file_format', log_config.get('format', ''))
+    # Literal text and field names alternate
+    parts = _FORMAT_FIELD.split(log_format)
+    if 'scenario_id' not in parts[1::2]:
+        return None
+    return re.compile(''.join(
+        re.escape(part) if i % 2 == 0 else
+        '(?P<scenario_id>.*?)' if part == 'scenario_id' else '.*?'
+        for i, part in enumerate(parts)))
+
+
+def merge_logs(log_files: List[Path]):
+    """Merge per-worker logs into the shared log by record timestamp.
+
+    Rotated worker segments of this run are included. Records are written
+    through the shared log file handler, so the merged log is rotated like
+    any other and its segments are indexed by the workers' scenario ids.
+
+    Args:
+        log_files: Per-worker active log files
+    """
+    pattern = _scenario_id_pattern()
+    streams = [log_records(p) for p in log_files]
+    for record in heapq.merge(*streams, key=lambda r: r[:23]):
+        match = pattern.match(record) if pattern else None
+        write_formatted(record, match.group('scenario_id') if match else None)
+
+
+def concat_files(files: List[Path], out_path: Path):
+    """Write the contents of several files to one file, replacing it."""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'wb') as out:
+        for path in files:
+            if path.exists():
+                out.write(path.read_bytes())
+
+
+def _worker_link(result: Dict[str, Any], out_path: Path) -> str:
+    """Worker name, linked to its HTML report when there is one."""
+    name = html.escape(result['worker'])
+    if not result.get('html'):
+        return name
+    href = result['html'].relative_to(out_path.parent).as_posix()
+    return f"<a href=\"{html.escape(href)}\">{name}</a>"
+
+
+def write_index(features: List[Dict], results: List[Dict[str, Any]],
+                out_path: Path):
+    """Write the run summary page linking the per-worker HTML reports.
+
+    Args:
+        features: Merged behave JSON features
+        results: Worker results. ``html`` may be None for workers whose
+            report stayed on another host
+        out_path: Output HTML path
+    """
+    counts = {}
+    for feature in features:
+        for element in feature.get('elements', []):
+            if element.get('type') == 'scenario':
+                status = element.get('status', 'untested')
+                counts[status] = counts.get(status, 0) + 1
+
+    rows = ''.join(
+        f"<tr><td>{_worker_link(r, out_path)}</td><td>{r['scenarios']}</td>"
+        f"<td>{r['returncode']}</td><td>{r['duration']:.1f}s</td></tr>"
+        for r in results)
+    summary = ', '.join(f"{count} {status}"
+                        for status, count in sorted(counts.items()))
+    out_path.write_text(
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        "<title>Behave parallel run</title></head><body>"
+        f"<h1>Behave parallel run {html.escape(RUN_ID)}</h1>"
+        f"<p>Scenarios: {html.escape(summary or 'none')}</p>"
+        "<table border=\"1\"><tr><th>Worker</th><th>Scenarios</th>"
+        f"<th>Exit</th><th>Duration</th></tr>{rows}</table>"
+        "<p>Merged results: <a href=\"results.json\">results.json</a>, "
+        "<a href=\"junit/\">junit/</a></p></body></html>\n",
+        encoding='utf-8')
+
+
+def merge_results(results: List[Dict[str, Any]],
+                  reports_dir: Path,
+                  scheduler: Scheduler) -> List[Dict]:
+    """Merge worker output into the reports directory.
+
+    Writes ``results.json``, ``junit/``, the combined log, traffic and step
+    metrics files and ``index.html``, then records scenario durations for
+    the next run's schedule.
+
+    Args:
+        results: Worker results from ``run_worker``
+        reports_dir: Reports directory
+        scheduler: Scheduler whose duration store is updated
+
+    Returns:
+        Merged behave JSON features
+    """
+    features = merge_json([r['json'] for r in results],
+                          reports_dir / 'results.json')
+    merge_junit([r['junit'] for r in results], reports_dir / 'junit')
+    merge_logs([r['log'] for r in results])
+    concat_files([r['traffic'] for r in results],
+                 Path(config.get('logging.traffic.file_path',
+                                 'reports/traffic.jsonl')))
+    merge_step_metrics([r['metrics'] for r in results]).export()
+    write_index(features, results, reports_dir / 'index.html')
+
+    if scheduler.store.update_from_results(features):
+        scheduler.store.save()
+    return features
+
+
+def run_parallel(paths: List[str],
+                 jobs: int,
+                 tags: Optional[List[str]] = None,
+                 behave_args: Optional[List[str]] = None,
+                 stream: bool = False) -> int:
+    """Run scenarios in parallel and merge results into the reports directory.
+
+    Args:
+        paths: Feature files or directories
+        jobs: Number of worker processes
+        tags: Behave ``--tags`` expressions
+        behave_args: Extra behave command line arguments for every worker
+        stream: Workers write streaming reports instead of HTML reports
+
+    Returns:
+        0 if every worker passed, 1 otherwise
+    """
+    parallel_config = config.get('parallel', {})
+    reports_dir = Path(parallel_config.get('reports_dir', 'reports'))
+    workers_dir = Path(parallel_config.get('workers_dir', 'reports/workers'))
+    workers_dir.mkdir(parents=True, exist_ok=True)
+
+    scenarios = discover_scenarios(paths, tags)
+    if not scenarios:
+        logger.warning("No scenarios selected")
+        return 0
+
+    # Matrix outlines land in every shard; otherwise drop empty shards
+    scheduler = Scheduler()
+    shards = [shard for shard in scheduler.schedule(scenarios, jobs) if shard]
+    logger.info(f"Running {len(scenarios)} scenarios on {len(shards)} workers")
+
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [
+            pool.submit(run_worker, i, len(shards), shard, workers_dir, tags,
+                        behave_args, stream) for i, shard in enumerate(shards)
+        ]
+        results = [future.result() for future in futures]
+
+    merge_results(results, reports_dir, scheduler)
+
+    failed = [r['worker'] for r in results if r['returncode'] != 0]
+    if failed:
+        logger.error(f"Failed workers: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+def run_worker_process(json_out: str,
+                       html_out: str,
+                       behave_args: List[str],
+                       html_format: str = 'my_html') -> int:
+    """Run behave in this process, writing JSON and HTML to the given paths.
+
+    The formatters configured in ``behave.ini`` are replaced so workers never
+    write to the shared ``reports/index.html``. ``html_format`` is
+    ``my_html`` or ``stream`` (see ``utils.streaming_formatter``).
+    """
+    from behave.__main__ import run_behave
+    from behave.configuration import Configuration
+    from behave.formatter.base import StreamOpener
+
+    behave_config = Configuration(behave_args)
+    behave_config.format = ['json', html_format]
+    behave_config.outputs = [StreamOpener(json_out), StreamOpener(html_out)]
+    return run_behave(behave_config)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Run behave scenarios across worker processes",
+        epilog="Arguments after -- are passed to every behave worker.")
+    parser.add_argument('paths', nargs='*', default=['features'])
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=int(config.get('parallel.jobs', 4)),
+                        help="Worker processes (default: %(default)s)")
+    parser.add_argument('-t',
+                        '--tags',
+                        action='append',
+                        help="Behave tag expression (repeatable)")
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help="Workers stream their reports to disk "
+                        "(for large matrix runs)")
+    parser.add_argument('--startup-profile',
+                        action='store_true',
+                        help="Report per-module startup cost and exit")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--json-out', help=argparse.SUPPRESS)
+    parser.add_argument('--html-out', help=argparse.SUPPRESS)
+    parser.add_argument('--html-format',
+                        default='my_html',
+                        help=argparse.SUPPRESS)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, behave_args = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+
+    if args.startup_profile:
+        from utils.startup_profile import profile_startup
+        tag_args = [f"--tags={tags}" for tags in args.tags or []]
+        return profile_startup(tag_args + behave_args + args.paths)
+    if args.worker:
+        return run_worker_process(args.json_out, args.html_out, behave_args,
+                                  args.html_format)
+    return run_parallel(args.paths, max(1, args.jobs), args.tags, behave_args,
+                        args.stream)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Opt-in CPU and memory profiling of each scenario.
+
+Enabled with ``-D profile`` or ``BEHAVE_PROFILE=true``. Each scenario then
+runs under ``cProfile`` and ``tracemalloc``, and writes to
+``profiling.dir/<run id>``:
+
+- ``<scenario>.prof``: pstats file, e.g. for ``snakeviz`` or
+  ``python -m pstats``
+- ``<scenario>.alloc.json``: the top allocation sites by memory still held
+  at the end of the scenario, which is what a leak looks like
+
+``<scenario>`` is the scenario's location followed by the worker's pid and
+a per-process sequence number, since the rows of a ``@matrix`` outline all
+share their template's location.
+
+At the end of the run, ``summary.txt`` merges every profile of the run,
+so it covers all the parallel workers. It lists CPU time by area (decode,
+network, logging, validation, artifacts, framework), the top functions and
+the top allocation sites. Rebuild it at any time with::
+
+    python -m utils.profiling summary reports/profiles/<run id>
+
+Only the runner thread is profiled; the WebSocket reader thread's decode
+work shows up in allocations but not in CPU time.
+"""
+
+import argparse
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import re
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config_manager import config
+from utils.fileio import atomic_write
+from utils.logger import RUN_ID, get_logger
+from utils.run_context import LazySettings
+
+logger = get_logger(__name__)
+
+# Area -> substrings of a profiled function's file (or built-in's name)
+AREAS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('decode', ('json/', "'_json.", 'http_client.py')),
+    ('network', ('websocket/', 'urllib3/', 'requests/', 'http/client.py',
+                 'urllib/request.py', 'ssl.py', 'socket.py', "'_socket.",
+                 "'_ssl.")),
+    ('logging', ('logging/', 'utils/logger.py', 'utils/traffic_log.py')),
+    ('validation', ('features/steps/', 'utils/assertions.py',
+                    'utils/soft_assertions.py', 'jsonschema/')),
+    ('artifacts', ('utils/artifact_store.py', 'gzip.py', "'zlib.")),
+    ('framework', ('behave/', 'behave_html_formatter/', 'utils/step_metrics.py',
+                   'utils/run_history.py', 'utils/watchdog.py')),
+)
+
+
+def _area(filename: str, name: str) -> str:
+    location = f"{filename.replace(os.sep, '/')} {name}"
+    for area, patterns in AREAS:
+        if any(pattern in location for pattern in patterns):
+            return area
+    return 'other'
+
+
+def _slug(scenario, sequence: int) -> str:
+    """File-safe name from a scenario's location, unique within a run.
+
+    Expanded ``@matrix`` rows share a location, and parallel workers share
+    the run directory, so the pid and ``sequence`` are appended.
+    """
+    location = re.sub(r'[^A-Za-z0-9_.-]+', '_',
+                      str(scenario.location)).strip('_')
+    return f"{location}-{os.getpid()}-{sequence:04d}"
+
+
+class ScenarioProfiler(LazySettings):
+    """Profiles CPU time and allocations of each scenario."""
+    def __init__(self, profile_config: Optional[Dict[str, Any]] = None):
+        """Initialize scenario profiler.
+
+        Args:
+            profile_config: Profiling settings. Defaults to ``profiling``
+        """
+        self._profile_config = profile_config
+        self._profile: Optional[cProfile.Profile] = None
+        self._sequence = itertools.count(1)
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing = False
+
+    def _load_settings(self) -> Dict[str, Any]:
+        profile_config = self._profile_config or config.get('profiling', {})
+        # Parallel workers share the run directory
+        directory = Path(profile_config.get('dir', 'reports/profiles')) / RUN_ID
+        return {
+            'enabled': str(profile_config.get('enabled',
+                                              False)).lower() == 'true',
+            'directory': directory,
+            'top': int(profile_config.get('top', 25)),
+            'frames': int(profile_config.get('tracemalloc_frames', 5)),
+        }
+
+    def configure(self, userdata: Dict[str, Any]):
+        """Apply the ``profile`` userdata flag, which wins over config.
+
+        Args:
+            userdata: behave's ``-D`` userdata
+        """
+        flag = userdata.get('profile')
+        if flag is not None:
+            self.enabled = str(flag).lower() in ('true', 'yes', '1', '')
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Profiling scenarios into {self.directory}")
+
+    def start_scenario(self, scenario):
+        """Start profiling a scenario."""
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def end_scenario(self, scenario):
+        """Stop profiling and write the scenario's profile files."""
+        if self._profile is None:
+            return
+        self._profile.disable()
+        profile, self._profile = self._profile, None
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+
+        slug = _slug(scenario, next(self._sequence))
+        profile.dump_stats(str(self.directory / f"{slug}.prof"))
+
+        # Filter out tracemalloc's own bookkeeping
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        growth = snapshot.filter_traces(filters).compare_to(
+            self._baseline.filter_traces(filters), 'lineno')
+        self._baseline = None
+        growth.sort(key=lambda stat: stat.size_diff, reverse=True)
+        sites = [{
+            'site': f"{stat.traceback[0].filename}:"
+                    f"{stat.traceback[0].lineno}",
+            'size_diff': stat.size_diff,
+            'count_diff': stat.count_diff,
+        } for stat in growth[:self.top] if stat.size_diff > 0]
+        atomic_write(
+            self.directory / f"{slug}.alloc.json",
+            json.dumps({'scenario': scenario.name, 'peak_bytes': peak,
+                        'sites': sites}, indent=2))
+        logger.debug(f"Profile of {scenario.name}: "
+                     f"peak {peak / 1024:.0f} KiB")
+
+    def close(self):
+        """Write the run summary and stop tracing."""
+        if not self.settings_loaded or not self.enabled:
+            return
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        summary = write_summary(self.directory, self.top)
+        if summary:
+            logger.info(f"Profile summary written to {summary}")
+
+
+def summarize(directory: Path, top: int = 25) -> str:
+    """Merge the profiles in a directory into a text summary.
+
+    Args:
+        directory: Directory with ``.prof`` and ``.alloc.json`` files
+        top: Rows per table
+
+    Returns:
+        Summary text, empty if there are no profiles
+    """
+    profiles = sorted(directory.glob('*.prof'))
+    if not profiles:
+        return ''
+    out = io.StringIO()
+    stats = pstats.Stats(str(profiles[0]), stream=out)
+    for path in profiles[1:]:
+        stats.add(str(path))
+
+    areas: Dict[str, float] = {}
+    for (filename, _, name), row in stats.stats.items():
+        # row: call count, primitive calls, own time, cumulative time, callers
+        area = _area(filename, name)
+        areas[area] = areas.get(area, 0.0) + row[2]
+    total = sum(areas.values()) or 1.0
+    out.write(f"Profiled {len(profiles)} scenarios, "
+              f"{stats.total_tt:.2f}s CPU in the runner thread\n\n")
+    out.write("CPU time by area (own time):\n")
+    for area, seconds in sorted(areas.items(), key=lambda item: -item[1]):
+        out.write(f"  {area:<12} {seconds:8.3f}s "
+                  f"{100 * seconds / total:5.1f}%\n")
+    out.write("\n")
+
+    stats.files = []  # print_stats would list every merged file
+    stats.sort_stats('tottime').print_stats(top)
+    stats.sort_stats('cumulative').print_stats(top)
+
+    sites: Dict[str, List[int]] = {}
+    peaks: List[Tuple[int, str]] = []
+    for path in sorted(directory.glob('*.alloc.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                alloc = json.load(f)
+        except (OSError, ValueError):
+            continue
+        peaks.append((alloc.get('peak_bytes', 0), alloc.get('scenario', '')))
+        for site in alloc.get('sites', []):
+            totals = sites.setdefault(site['site'], [0, 0])
+            totals[0] += site['size_diff']
+            totals[1] += site['count_diff']
+    if sites:
+        out.write("Memory still held at scenario end, by allocation site:\n")
+        for site, (size, count) in sorted(sites.items(),
+                                          key=lambda item: -item[1][0])[:top]:
+            out.write(f"  {size / 1024:10.1f} KiB {count:8d} blocks  {site}\n")
+        out.write("\nHighest peak traced memory:\n")
+        for peak, name in sorted(peaks, reverse=True)[:top]:
+            out.write(f"  {peak / 1024:10.1f} KiB  {name}\n")
+    return out.getvalue()
+
+
+def write_summary(directory: Path, top: int = 25) -> Optional[Path]:
+    """Write ``summary.txt`` for a profile directory.
+
+    Returns:
+        Path of the summary, or None if there were no profiles
+    """
+    summary = summarize(directory, top)
+    if not summary:
+        return None
+    path = directory / 'summary.txt'
+    atomic_write(path, summary)
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Summarize per-scenario profiles")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    summary_parser = subparsers.add_parser(
+        'summary', help="Merge the profiles of a directory into summary.txt")
+    summary_parser.add_argument('directory',
+                                help="Run directory, e.g. "
+                                "reports/profiles/<run id>")
+    summary_parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args(argv)
+
+    path = write_summary(Path(args.directory), args.top)
+    if path is None:
+        print(f"No profiles in {args.directory}", file=sys.stderr)
+        return 1
+    print(path.read_text(encoding='utf-8'))
+    return 0
+
+
+# Global scenario profiler instance
+profiler = ScenarioProfiler()
+
+if __name__ == "__main__":
+    sys.exit(main())
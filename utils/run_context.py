@@ -0,0 +1,279 @@
+"""Run contexts: configuration, logging and clients bound to one environment.
+
+A ``RunContext`` bundles what a run against one environment needs:
+
+- ``config``: a ``ConfigManager`` with the environment's variables and
+  overrides, e.g. another ``BASE_URL``
+- ``logger`` and ``get_logger``: records carry the environment name
+  (``%(environment)s`` in ``logging.format``/``file_format``)
+- ``http_client``: its own ``HttpClient``, so pools and aborts are not
+  shared with other environments
+- ``state``: a ``SharedState`` for values shared by the context's threads
+
+Environments are defined under ``environments.definitions`` in the config.
+Several contexts can run side by side in one interpreter, in threads or
+asyncio tasks; ``activate`` makes a context's configuration and log scope
+the ones in effect for the current thread or task, so module-level
+``utils.config_manager.config`` reads resolve to it::
+
+    staging = RunContext.for_environment('staging')
+    with staging.activate():
+        ...
+
+    results = run_side_by_side(
+        [RunContext.for_environment(name) for name in ('uat', 'staging')],
+        fetch_candles)
+
+Process-wide singletons that time the behave runner (``watchdog``,
+``step_metrics``, ``profiler``) stay per process: a behave run selects one
+context with ``-D env=<name>`` or ``BEHAVE_ENV``.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+from utils.assertions import assertions
+from utils.config_manager import (ConfigManager, activate_config, config,
+                                  deactivate_config, install_config)
+from utils.logger import (Logger, enter_log_scope, exit_log_scope,
+                          get_logger, set_log_environment)
+
+logger = get_logger(__name__)
+
+DEFAULT_ENVIRONMENT = 'default'
+
+
+class SharedState:
+    """Thread-safe key-value state of a run context."""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._values: Dict[str, Any] = {}
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Lock to hold across several calls that must be atomic."""
+        return self._lock
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a value."""
+        with self._lock:
+            return self._values.get(key, default)
+
+    def set(self, key: str, value: Any):
+        """Set a value."""
+        with self._lock:
+            self._values[key] = value
+
+    def setdefault(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Get a value, creating it with ``factory`` if missing."""
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = factory()
+            return self._values[key]
+
+    def update(self, key: str, func: Callable[[Any], Any],
+               default: Any = None) -> Any:
+        """Replace a value with ``func(value)`` atomically.
+
+        Returns:
+            The new value
+        """
+        with self._lock:
+            value = func(self._values.get(key, default))
+            self._values[key] = value
+            return value
+
+    def increment(self, key: str, amount: float = 1) -> float:
+        """Add to a counter, starting from 0."""
+        return self.update(key, lambda value: value + amount, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Shallow copy of every value."""
+        with self._lock:
+            return dict(self._values)
+
+
+class LazySettings:
+    """Mixin for singletons that read their settings on first use.
+
+    Module-level singletons are created at import, before a run context is
+    installed. Subclasses implement ``_load_settings``, returning attribute
+    values; it runs the first time a missing attribute is read, and the
+    values then are plain instance attributes. Attributes assigned before
+    that keep their value::
+
+        class Watchdog(LazySettings):
+            def _load_settings(self):
+                return {'step_budget': float(config.get('watchdog.step_budget', 60))}
+    """
+    _settings_lock = threading.RLock()
+
+    def _load_settings(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @property
+    def settings_loaded(self) -> bool:
+        """Whether the settings have been read."""
+        return self.__dict__.get('_settings_loaded', False)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not found the usual way
+        if name.startswith('__') or self.settings_loaded:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}")
+        with LazySettings._settings_lock:
+            if not self.settings_loaded:
+                for key, value in self._load_settings().items():
+                    self.__dict__.setdefault(key, value)
+                self.__dict__['_settings_loaded'] = True
+        return getattr(self, name)
+
+
+class RunContext:
+    """Configuration, logger, clients and state of a run."""
+    def __init__(self,
+                 name: str = DEFAULT_ENVIRONMENT,
+                 env: Optional[Mapping[str, str]] = None,
+                 overrides: Optional[Mapping[str, Any]] = None,
+                 config_path: Optional[str] = None,
+                 config_manager: Optional[ConfigManager] = None,
+                 http_client=None):
+        """Initialize run context.
+
+        Args:
+            name: Environment name, stamped on log records
+            env: Environment variables for ``${VAR:default}`` config values,
+                taking precedence over the process environment
+            overrides: Config values by dot-separated key path
+            config_path: Config file. Defaults to config/config.yml
+            config_manager: Use this configuration instead of building one
+            http_client: Use this HTTP client instead of a new one
+        """
+        self.name = name
+        self.config = config_manager or ConfigManager(config_path, env,
+                                                      overrides)
+        self.logger = self.get_logger('run')
+        # Stateless; shared by every context
+        self.assertions = assertions
+        self.state = SharedState()
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'RunContext':
+        """Context of the process configuration and global clients."""
+        from utils.http_client import http_client
+
+        return cls(DEFAULT_ENVIRONMENT,
+                   config_manager=config,
+                   http_client=http_client)
+
+    @classmethod
+    def for_environment(cls, name: Optional[str] = None) -> 'RunContext':
+        """Context of an environment from ``environments.definitions``.
+
+        Args:
+            name: Environment name. Defaults to ``environments.selected``;
+                empty or ``default`` gives ``RunContext.default()``
+
+        Raises:
+            ValueError: If the environment is not defined
+        """
+        environments = config.get('environments', {}) or {}
+        name = name or environments.get('selected') or DEFAULT_ENVIRONMENT
+        if name == DEFAULT_ENVIRONMENT:
+            return cls.default()
+        definitions = environments.get('definitions') or {}
+        if name not in definitions:
+            raise ValueError(f"Unknown environment: {name} (defined: "
+                             f"{', '.join(sorted(definitions)) or 'none'})")
+        definition = definitions[name] or {}
+        return cls(name,
+                   env=definition.get('env'),
+                   overrides=definition.get('overrides'))
+
+    @property
+    def http_client(self):
+        """HTTP client of this context, created on first use."""
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    from utils.http_client import HttpClient
+
+                    self._http_client = HttpClient()
+        return self._http_client
+
+    def get_logger(self, name: str) -> Logger:
+        """Logger whose name carries this context's environment."""
+        if self.name == DEFAULT_ENVIRONMENT:
+            return get_logger(name)
+        return get_logger(f"{name}[{self.name}]")
+
+    @contextmanager
+    def activate(self):
+        """Make this context current for the calling thread or task.
+
+        Module-level ``config`` reads and log records inside the block use
+        this context's configuration and environment name.
+        """
+        config_token = activate_config(
+            None if self.config is config else self.config)
+        log_token = enter_log_scope(self.name)
+        try:
+            yield self
+        finally:
+            exit_log_scope(log_token)
+            deactivate_config(config_token)
+
+    def install(self):
+        """Make this context current for every thread, e.g. a behave run."""
+        install_config(None if self.config is config else self.config)
+        set_log_environment(self.name)
+        logger.info(f"Using environment: {self.name}")
+
+    def uninstall(self):
+        """Undo ``install``."""
+        install_config(None)
+        set_log_environment(None)
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call ``func`` with this context active."""
+        with self.activate():
+            return func(*args, **kwargs)
+
+    def close(self):
+        """Close the clients this context created."""
+        if self._owns_http_client and self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+
+
+def run_side_by_side(contexts: Iterable[RunContext],
+                     func: Callable[[RunContext], Any],
+                     max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Run ``func(context)`` for several contexts concurrently.
+
+    Each call runs in its own thread with its context active.
+
+    Args:
+        contexts: Contexts with distinct names
+        func: Called once per context
+        max_workers: Thread limit. Defaults to one per context
+
+    Returns:
+        Result of each call by context name
+
+    Raises:
+        Exception: The first failure, once every call has finished
+    """
+    contexts = list(contexts)
+    with ThreadPoolExecutor(max_workers=max_workers or len(contexts) or 1,
+                            thread_name_prefix='run-context') as executor:
+        futures = {
+            context.name: executor.submit(context.run, func, context)
+            for context in contexts
+        }
+    return {name: future.result() for name, future in futures.items()}
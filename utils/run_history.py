@@ -0,0 +1,398 @@
+"""SQLite store of per-run performance data with regression checks.
+
+Each run records per-request timings, step and scenario durations,
+WebSocket feed latency and pass/fail into ``history.db_path`` (default
+``.cache/run_history.db``, kept between CI runs). Rows are buffered in
+memory and written once per scenario; measurements taken outside a
+scenario are not recorded. A run is compared with a rolling baseline of
+earlier runs::
+
+    python -m utils.run_history runs
+    python -m utils.run_history compare --tag candlestick --quantile 95 \\
+        --days 7 --max-regression 20
+"""
+
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from utils.config_manager import config
+from utils.logger import RUN_ID, get_logger
+from utils.stats import percentile
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    scenario TEXT NOT NULL,
+    name TEXT,
+    status TEXT,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS scenario_tags (
+    run_id TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (run_id, scenario, tag)
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    scenario TEXT NOT NULL,
+    step TEXT NOT NULL,
+    status TEXT,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS requests (
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    scenario TEXT,
+    endpoint TEXT NOT NULL,
+    method TEXT,
+    status INTEGER,
+    failed INTEGER,
+    dns REAL, connect REAL, tls REAL, ttfb REAL,
+    download REAL, decode REAL, total REAL
+);
+CREATE TABLE IF NOT EXISTS ws_latency (
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    scenario TEXT,
+    channel TEXT,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_run ON scenarios (run_id, scenario);
+CREATE INDEX IF NOT EXISTS idx_scenario_tags_tag ON scenario_tags (tag, run_id);
+CREATE INDEX IF NOT EXISTS idx_steps_run ON steps (run_id, scenario);
+CREATE INDEX IF NOT EXISTS idx_requests_run ON requests (run_id, scenario);
+CREATE INDEX IF NOT EXISTS idx_requests_endpoint ON requests (endpoint, ts);
+CREATE INDEX IF NOT EXISTS idx_ws_latency_run ON ws_latency (run_id, scenario);
+"""
+
+TIMING_COLUMNS = ('dns', 'connect', 'tls', 'ttfb', 'download', 'decode',
+                  'total')
+
+# Metric name -> (table, value column); request metrics use a timing column
+METRICS = {
+    **{name: ('requests', name)
+       for name in TIMING_COLUMNS},
+    'step': ('steps', 'duration'),
+    'scenario': ('scenarios', 'duration'),
+    'ws_latency': ('ws_latency', 'latency'),
+}
+
+
+class RunHistory:
+    """Buffers this run's measurements and writes them to SQLite."""
+    def __init__(self,
+                 db_path: Optional[str] = None,
+                 run_id: str = RUN_ID):
+        """Initialize run history.
+
+        Args:
+            db_path: SQLite file. Defaults to ``history.db_path`` from config
+            run_id: Run the measurements belong to
+        """
+        self._db_path = db_path
+        self.run_id = run_id
+        self.enabled = None
+        self._started = time.time()
+        self.scenario = None
+        self._pending: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _is_enabled(self) -> bool:
+        if self.enabled is None:
+            value = config.get('history.enabled', True)
+            if isinstance(value, str):
+                value = value.strip().lower() in ('1', 'true', 'yes', 'on')
+            self.enabled = bool(value)
+        return self.enabled
+
+    def connect(self) -> sqlite3.Connection:
+        """Open the database, creating the schema on first use."""
+        if self._conn is None:
+            path = Path(self._db_path or config.get(
+                'history.db_path', '.cache/run_history.db'))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Parallel workers share the file; WAL lets them write in turn
+            conn = sqlite3.connect(str(path),
+                                   timeout=30,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _add(self, table: str, row: tuple):
+        # Rows are flushed by end_scenario; outside a scenario (CLI tools,
+        # benchmarks, frames between scenarios) they are not recorded
+        if self.scenario is None or not self._is_enabled():
+            return
+        with self._lock:
+            self._pending.setdefault(table, []).append(row)
+
+    def start_scenario(self, scenario):
+        """Attribute following measurements to a scenario."""
+        self.scenario = str(scenario.location)
+        for tag in scenario.effective_tags:
+            self._add('scenario_tags', (self.run_id, self.scenario, tag))
+
+    def record_step(self, step):
+        """Record a finished step."""
+        self._add('steps', (self.run_id, time.time(), self.scenario,
+                            step.name, step.status.name, step.duration))
+
+    def record_request(self,
+                       method: str,
+                       url: str,
+                       status: Optional[int],
+                       timings: Optional[Dict[str, float]]):
+        """Record one HTTP exchange.
+
+        Args:
+            method: HTTP method
+            url: Request URL; only the path is kept as the endpoint
+            status: Response status, None if no response
+            timings: Phase timings from ``utils.http_client``
+        """
+        timings = timings or {}
+        failed = status is None or status >= 400
+        self._add('requests',
+                  (self.run_id, time.time(), self.scenario,
+                   urlsplit(url).path, method, status, int(failed)) +
+                  tuple(timings.get(name) for name in TIMING_COLUMNS))
+
+    def record_ws_latency(self, channel: Optional[str], latency: float):
+        """Record the delay between an exchange timestamp and local receipt."""
+        self._add('ws_latency',
+                  (self.run_id, time.time(), self.scenario, channel, latency))
+
+    def end_scenario(self, scenario):
+        """Record a finished scenario and write everything buffered."""
+        if not self._is_enabled():
+            return
+        key = str(scenario.location)
+        self._add('scenarios', (self.run_id, time.time(), key, scenario.name,
+                                scenario.status.name, scenario.duration))
+        self.flush()
+        self.scenario = None
+
+    def flush(self):
+        """Write buffered rows in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO runs (run_id, started) VALUES (?, ?)',
+                (self.run_id, self._started))
+            for table, rows in pending.items():
+                placeholders = ', '.join('?' * len(rows[0]))
+                verb = ('INSERT OR IGNORE'
+                        if table == 'scenario_tags' else 'INSERT')
+                conn.executemany(
+                    f'{verb} INTO {table} VALUES ({placeholders})', rows)
+
+    def close(self):
+        """Flush and mark the run finished."""
+        if not self._is_enabled():
+            return
+        self.flush()
+        conn = self.connect()
+        with conn:
+            conn.execute('UPDATE runs SET finished = ? WHERE run_id = ?',
+                         (time.time(), self.run_id))
+        conn.close()
+        self._conn = None
+
+    def values(self,
+               metric: str,
+               tag: Optional[str] = None,
+               endpoint: Optional[str] = None,
+               scenario: Optional[str] = None,
+               run_id: Optional[str] = None,
+               since: Optional[float] = None,
+               exclude_run: Optional[str] = None) -> List[float]:
+        """Query measurements.
+
+        Args:
+            metric: A request phase (``total``, ``ttfb``, ...), ``step``,
+                ``scenario`` or ``ws_latency``
+            tag: Only scenarios with this tag (without ``@``)
+            endpoint: Only requests whose endpoint contains this text
+            scenario: Only this scenario location
+            run_id: Only this run
+            since: Only rows newer than this epoch time
+            exclude_run: Leave out this run (e.g. the current one)
+
+        Returns:
+            Matching values
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        table, column = METRICS[metric]
+        self.flush()
+
+        query = f'SELECT m.{column} FROM {table} m'
+        where = [f'm.{column} IS NOT NULL']
+        params: List[Any] = []
+        if tag:
+            query += (' JOIN scenario_tags t ON t.run_id = m.run_id'
+                      ' AND t.scenario = m.scenario')
+            where.append('t.tag = ?')
+            params.append(tag.lstrip('@'))
+        if endpoint:
+            if table != 'requests':
+                raise ValueError("endpoint only applies to request metrics")
+            where.append('m.endpoint LIKE ?')
+            params.append(f'%{endpoint}%')
+        for clause, value in (('m.scenario = ?', scenario),
+                              ('m.run_id = ?', run_id),
+                              ('m.ts >= ?', since),
+                              ('m.run_id != ?', exclude_run)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        query += ' WHERE ' + ' AND '.join(where)
+        return [row[0] for row in self.connect().execute(query, params)]
+
+    def compare(self,
+                metric: str = 'total',
+                quantile: float = 95,
+                days: float = 7,
+                max_regression: float = 20,
+                run_id: Optional[str] = None,
+                **filters) -> Dict[str, Any]:
+        """Compare a run's percentile with earlier runs in a rolling window.
+
+        Args:
+            metric: See ``values``
+            quantile: Percentile to compare, e.g. 95
+            days: Baseline window in days
+            max_regression: Allowed increase in percent
+            run_id: Run to check. Defaults to this run
+            **filters: ``tag``, ``endpoint`` or ``scenario``
+
+        Returns:
+            Dict with ``current``, ``baseline``, sample counts, ``change``
+            (percent, None without a baseline) and ``regressed``
+        """
+        run_id = run_id or self.run_id
+        current = self.values(metric, run_id=run_id, **filters)
+        baseline = self.values(metric,
+                               since=time.time() - days * 86400,
+                               exclude_run=run_id,
+                               **filters)
+        min_samples = int(config.get('history.min_baseline_samples', 5))
+        result = {
+            'metric': metric,
+            'quantile': quantile,
+            'current': percentile(current, quantile),
+            'current_samples': len(current),
+            'baseline': percentile(baseline, quantile),
+            'baseline_samples': len(baseline),
+            'change': None,
+            'regressed': False,
+        }
+        if (result['current'] is not None and result['baseline']
+                and len(baseline) >= min_samples):
+            result['change'] = (result['current'] / result['baseline'] -
+                                1) * 100
+            result['regressed'] = result['change'] > max_regression
+        return result
+
+
+def _recent_runs(history: RunHistory, limit: int) -> List[tuple]:
+    return history.connect().execute(
+        'SELECT r.run_id, r.started, r.finished,'
+        " SUM(s.status = 'passed'), SUM(s.status = 'failed'),"
+        ' COUNT(s.run_id)'
+        ' FROM runs r LEFT JOIN scenarios s ON s.run_id = r.run_id'
+        ' GROUP BY r.run_id ORDER BY r.started DESC LIMIT ?',
+        (limit, )).fetchall()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Query the run history and check for regressions")
+    parser.add_argument('--db', help="SQLite file (default from config)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runs = commands.add_parser('runs', help="List recent runs")
+    runs.add_argument('--limit', type=int, default=20)
+
+    compare = commands.add_parser(
+        'compare', help="Compare a run against earlier runs; exit 1 on regression")
+    compare.add_argument('--metric', default='total', choices=sorted(METRICS))
+    compare.add_argument('--tag')
+    compare.add_argument('--endpoint')
+    compare.add_argument('--scenario')
+    compare.add_argument('--quantile', type=float, default=95)
+    compare.add_argument('--days', type=float, default=7)
+    compare.add_argument('--max-regression',
+                         type=float,
+                         default=20,
+                         help="Allowed increase in percent")
+    compare.add_argument('--run-id', help="Run to check (default: latest)")
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.db)
+    if args.command == 'runs':
+        for run_id, started, finished, passed, failed, total in _recent_runs(
+                history, args.limit):
+            state = 'finished' if finished else 'incomplete'
+            print(f"{run_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}"
+                  f"  {total} scenarios, {passed or 0} passed, "
+                  f"{failed or 0} failed ({state})")
+        return 0
+
+    run_id = args.run_id
+    if not run_id:
+        latest = _recent_runs(history, 1)
+        if not latest:
+            print("No runs recorded")
+            return 0
+        run_id = latest[0][0]
+    result = history.compare(args.metric,
+                             args.quantile,
+                             args.days,
+                             args.max_regression,
+                             run_id=run_id,
+                             tag=args.tag,
+                             endpoint=args.endpoint,
+                             scenario=args.scenario)
+
+    def fmt(value):
+        return 'n/a' if value is None else f"{value:.3f}s"
+
+    change = ('no baseline' if result['change'] is None else
+              f"{result['change']:+.1f}%")
+    print(f"{run_id} {args.metric} p{args.quantile:g}: "
+          f"{fmt(result['current'])} ({result['current_samples']} samples) vs "
+          f"{fmt(result['baseline'])} over {args.days:g} days "
+          f"({result['baseline_samples']} samples): {change}")
+    return 1 if result['regressed'] else 0
+
+
+# Global run history instance
+run_history = RunHistory()
+
+if __name__ == "__main__":
+    sys.exit(main())
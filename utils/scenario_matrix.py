@@ -0,0 +1,139 @@
+"""Run-time expansion of ``@matrix`` scenario outlines."""
+
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config_manager import config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MATRIX_TAG = "matrix"
+
+
+def is_matrix_outline(scenario) -> bool:
+    """Check whether a scenario is a selected ``@matrix`` outline.
+
+    Outlines whose template rows were all deselected by a ``file:line``
+    location are left alone.
+
+    Args:
+        scenario: Parsed behave scenario or scenario outline
+
+    Returns:
+        True if the outline should be expanded
+    """
+    if scenario.type != "scenario_outline":
+        return False
+    if MATRIX_TAG not in scenario.effective_tags:
+        return False
+    built = scenario._scenarios
+    return not built or any(row.status != "skipped" for row in built)
+
+
+def parse_shard(value: Optional[str]) -> Tuple[int, int]:
+    """Parse a shard spec such as ``"1/4"`` into ``(index, count)``.
+
+    Args:
+        value: Shard spec, zero-based index over count
+
+    Returns:
+        Tuple of shard index and shard count
+    """
+    if not value:
+        return 0, 1
+    index, _, count = str(value).partition('/')
+    index, count = int(index), int(count or 1)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid matrix shard: {value}")
+    return index, count
+
+
+class ScenarioMatrix:
+    """Expands template outlines into an instrument x timeframe/channel matrix.
+
+    A ``Scenario Outline`` tagged ``@matrix`` keeps a single example row as its
+    template. Columns named ``instrument``, ``timeframe`` and ``channel`` are
+    replaced by the matrix values; any other column keeps the template value.
+    """
+    def __init__(self,
+                 instruments: List[str],
+                 matrix_config: Optional[Dict[str, Any]] = None,
+                 shard: Tuple[int, int] = (0, 1)):
+        """Initialize scenario matrix.
+
+        Args:
+            instruments: Instrument names to expand over
+            matrix_config: Matrix settings. Defaults to ``matrix`` from config
+            shard: Shard index and shard count selecting a slice of the rows
+        """
+        matrix_config = matrix_config or config.get('matrix', {})
+        limit = int(matrix_config.get('limit') or 0)
+        self.instruments = instruments[:limit] if limit else instruments
+        self.timeframes = matrix_config.get('timeframes') or []
+        self.channels = matrix_config.get('channels') or []
+        self.shard_index, self.shard_count = shard
+
+    def build_rows(self, headings: List[str],
+                   template: List[str]) -> List[List[str]]:
+        """Build the example rows for one outline.
+
+        Args:
+            headings: Examples table headings
+            template: Cells of the template row
+
+        Returns:
+            Rows belonging to this shard
+        """
+        base = dict(zip(headings, template))
+        dimensions = []
+        if 'instrument' in headings:
+            dimensions.append(('instrument', self.instruments))
+        if 'timeframe' in headings and self.timeframes:
+            dimensions.append(('timeframe', self.timeframes))
+        if 'channel' in headings and self.channels:
+            dimensions.append(('channel', self.channels))
+
+        rows = []
+        for values in itertools.product(*(v for _, v in dimensions)):
+            cells = dict(base)
+            cells.update(zip((name for name, _ in dimensions), values))
+            if 'channel' in cells:
+                cells['channel'] = cells['channel'].format(
+                    instrument=cells.get('instrument', ''))
+            rows.append([cells[name] for name in headings])
+
+        return rows[self.shard_index::self.shard_count]
+
+    def expand(self, features) -> int:
+        """Replace example rows of every ``@matrix`` outline in place.
+
+        Args:
+            features: Parsed behave features
+
+        Returns:
+            Number of scenarios generated
+        """
+        total = 0
+        for feature in features:
+            for outline in feature.scenarios:
+                if not is_matrix_outline(outline):
+                    continue
+                for example in outline.examples:
+                    table = example.table
+                    if not table.rows:
+                        continue
+                    template = table.rows[0]
+                    rows = self.build_rows(table.headings, template.cells)
+                    table.rows = []
+                    for cells in rows:
+                        table.add_row(cells, line=template.line)
+                    total += len(rows)
+                # Drop any scenarios built from the template row
+                outline._scenarios = []
+                logger.debug(f"Expanded matrix outline: {outline.name}")
+
+        logger.info(
+            f"Scenario matrix: {total} scenarios "
+            f"(shard {self.shard_index + 1}/{self.shard_count})")
+        return total
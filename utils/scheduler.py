@@ -0,0 +1,166 @@
+"""Duration-aware scenario scheduling for parallel runs."""
+
+import heapq
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.config_manager import config
+from utils.fileio import atomic_write
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DurationStore:
+    """Per-scenario durations persisted between runs.
+
+    Durations are keyed by scenario location and smoothed with an
+    exponential moving average, so one slow run does not dominate.
+    """
+    def __init__(self,
+                 path: Optional[str] = None,
+                 smoothing: float = 0.5):
+        """Initialize duration store.
+
+        Args:
+            path: JSON file path. Defaults to ``parallel.durations_file``
+            smoothing: Weight of the newest observation (0-1]
+        """
+        self.path = Path(
+            path or config.get('parallel.durations_file',
+                               '.cache/scenario_durations.json'))
+        self.smoothing = smoothing
+        self.durations: Dict[str, float] = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.durations = {
+                    k: float(v)
+                    for k, v in json.load(f).items()
+                }
+        except (OSError, ValueError):
+            pass
+
+    def get(self, location: str) -> Optional[float]:
+        """Get the recorded duration of a scenario, if any."""
+        return self.durations.get(location)
+
+    def update_from_results(self, features: List[Dict[str, Any]]) -> int:
+        """Record durations from behave JSON results.
+
+        Rows sharing a location (``@matrix`` outlines) are summed. Skipped
+        and untested scenarios are ignored.
+
+        Args:
+            features: Behave JSON features
+
+        Returns:
+            Number of locations updated
+        """
+        observed = {}
+        for feature in features:
+            for element in feature.get('elements', []):
+                if element.get('type') != 'scenario':
+                    continue
+                if element.get('status') in ('skipped', 'untested'):
+                    continue
+                duration = sum(
+                    step.get('result', {}).get('duration', 0)
+                    for step in element.get('steps', []))
+                location = element['location']
+                observed[location] = observed.get(location, 0.0) + duration
+
+        for location, duration in observed.items():
+            previous = self.durations.get(location)
+            if previous is None:
+                self.durations[location] = duration
+            else:
+                self.durations[location] = (self.smoothing * duration +
+                                            (1 - self.smoothing) * previous)
+        return len(observed)
+
+    def save(self):
+        """Atomically write the durations file."""
+        atomic_write(self.path,
+                     json.dumps(self.durations, indent=2, sort_keys=True))
+
+
+class Scheduler:
+    """Assigns scenarios to workers to minimize the makespan.
+
+    Uses longest-processing-time-first: scenarios are sorted by estimated
+    duration and each goes to the currently least-loaded worker.
+    """
+    def __init__(self,
+                 store: Optional[DurationStore] = None,
+                 parallel_config: Optional[Dict[str, Any]] = None):
+        """Initialize scheduler.
+
+        Args:
+            store: Historical durations. Defaults to a new DurationStore
+            parallel_config: Parallel settings. Defaults to ``parallel``
+        """
+        parallel_config = parallel_config or config.get('parallel', {})
+        self.store = store or DurationStore()
+        self.default_estimate = float(
+            parallel_config.get('default_estimate', 2.0))
+        self.tag_estimates = {
+            tag: float(seconds)
+            for tag, seconds in (parallel_config.get('tag_estimates')
+                                 or {}).items()
+        }
+
+    def estimate(self, scenario: Dict[str, Any]) -> float:
+        """Estimate a scenario's duration from history, then tags.
+
+        Args:
+            scenario: Scenario descriptor from ``discover_scenarios``
+
+        Returns:
+            Estimated duration in seconds
+        """
+        recorded = self.store.get(scenario['location'])
+        if recorded is not None:
+            return recorded
+        tag_values = [
+            self.tag_estimates[tag] for tag in scenario.get('tags', [])
+            if tag in self.tag_estimates
+        ]
+        return max(tag_values) if tag_values else self.default_estimate
+
+    def schedule(self, scenarios: List[Dict[str, Any]],
+                 jobs: int) -> List[List[Dict[str, Any]]]:
+        """Split scenarios into balanced shards.
+
+        ``@matrix`` outlines go to every shard (each worker runs its own
+        slice), and their estimate is spread evenly over the workers.
+
+        Args:
+            scenarios: Discovered scenarios
+            jobs: Number of workers
+
+        Returns:
+            One scenario list per worker
+        """
+        shards = [[] for _ in range(jobs)]
+        matrix = [s for s in scenarios if s['matrix']]
+        matrix_load = sum(self.estimate(s) for s in matrix) / jobs
+
+        heap = [(matrix_load, i) for i in range(jobs)]
+        plain = sorted((s for s in scenarios if not s['matrix']),
+                       key=self.estimate,
+                       reverse=True)
+        for scenario in plain:
+            load, i = heapq.heappop(heap)
+            shards[i].append(scenario)
+            heapq.heappush(heap, (load + self.estimate(scenario), i))
+
+        for shard in shards:
+            shard.extend(matrix)
+
+        loads = sorted(load for load, _ in heap)
+        if loads:
+            logger.info(f"Scheduled {len(scenarios)} scenarios on {jobs} "
+                        f"workers, estimated makespan {loads[-1]:.1f}s "
+                        f"(lightest shard {loads[0]:.1f}s)")
+        return shards
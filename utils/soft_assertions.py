@@ -0,0 +1,182 @@
+"""Soft assertions: record many checks, raise one aggregated error.
+
+A passing check costs a counter increment. A failing one stores its
+message template and arguments, which are %-formatted only when the error
+is raised, and only for the first ``max_messages`` failures::
+
+    with SoftAssertions("trade entries") as soft:
+        for i, trade in enumerate(trades):
+            soft.check(trade['s'] in ('BUY', 'SELL'),
+                       "entry %d: bad side %r", i, trade['s'])
+    # raises AssertionError listing every failure
+
+For per-element checks over large arrays, ``check_each`` and
+``require_fields`` keep the loop inside this module, and ``add_checks``
+lets a loop test conditions in place and call ``fail`` only on failure.
+"""
+
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from utils.assertions import AssertionError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SoftAssertions:
+    """Collects check failures and raises them together."""
+    def __init__(self, title: Optional[str] = None, max_messages: int = 50):
+        """Initialize soft assertions.
+
+        Args:
+            title: What is being checked, used in the error summary
+            max_messages: Failures listed in the error; the rest are counted
+        """
+        self.title = title
+        self.max_messages = max_messages
+        self.checks = 0
+        self.failures = 0
+        self._recorded: List[Tuple[str, tuple]] = []
+
+    def __enter__(self) -> 'SoftAssertions':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        # Don't mask an exception already raised inside the block
+        if exc_type is None:
+            self.assert_all()
+        return False
+
+    def fail(self, template: str, *args: Any):
+        """Record a failure; ``template % args`` is formatted on report."""
+        self.failures += 1
+        if len(self._recorded) < self.max_messages:
+            self._recorded.append((template, args))
+
+    def check(self, condition: Any, template: str, *args: Any) -> bool:
+        """Record one check.
+
+        Args:
+            condition: Passes when truthy
+            template: %-style failure message
+            *args: Message arguments, formatted only if reported
+
+        Returns:
+            Whether the check passed
+        """
+        self.checks += 1
+        if condition:
+            return True
+        self.fail(template, *args)
+        return False
+
+    def equal(self, actual: Any, expected: Any, label: str = 'value') -> bool:
+        """Check ``actual == expected``."""
+        return self.check(actual == expected, "%s: expected %r, got %r", label,
+                          expected, actual)
+
+    def check_each(self, items: Iterable[Any], predicate: Callable[[Any],
+                                                                  Any],
+                   template: str) -> int:
+        """Check a predicate over many items.
+
+        Args:
+            items: Items to check
+            predicate: Passes when it returns a truthy value
+            template: %-style message formatted with ``(index, item)``
+
+        Returns:
+            Number of items that failed
+        """
+        failed = 0
+        count = 0
+        for index, item in enumerate(items):
+            count += 1
+            if not predicate(item):
+                failed += 1
+                self.fail(template, index, item)
+        self.checks += count
+        return failed
+
+    def require_fields(self, items: Iterable[dict], fields: Sequence[str],
+                       label: str = 'entry') -> int:
+        """Check every item contains all of ``fields``.
+
+        Returns:
+            Number of items with missing fields
+        """
+        failed = 0
+        count = 0
+        for index, item in enumerate(items):
+            count += 1
+            for field in fields:
+                if field not in item:
+                    failed += 1
+                    self.fail("%s %d missing field(s): %s", label, index,
+                              ', '.join(f for f in fields if f not in item))
+                    break
+        self.checks += count
+        return failed
+
+    def add_checks(self, count: int):
+        """Count checks done inline, calling ``fail`` only when one fails.
+
+        In the hottest loops even a method call per passing check adds up,
+        so the condition can be tested in place::
+
+            for i, level in enumerate(levels):
+                if len(level) < 3:
+                    soft.fail("level %d too short: %r", i, level)
+            soft.add_checks(len(levels))
+        """
+        self.checks += count
+
+    @property
+    def passed(self) -> bool:
+        """Whether no check has failed."""
+        return not self.failures
+
+    def messages(self) -> List[str]:
+        """Formatted messages of the recorded failures."""
+        formatted = []
+        for template, args in self._recorded:
+            try:
+                formatted.append(template % args if args else template)
+            except (TypeError, ValueError):
+                formatted.append(f"{template} {args!r}")
+        return formatted
+
+    def error(self) -> Optional[AssertionError]:
+        """The aggregated error, or None if every check passed."""
+        if not self.failures:
+            return None
+        title = f"{self.title}: " if self.title else ''
+        lines = [f"{title}{self.failures} of {self.checks} checks failed"]
+        lines += [f"  - {message}" for message in self.messages()]
+        if self.failures > len(self._recorded):
+            lines.append(
+                f"  ... and {self.failures - len(self._recorded)} more")
+        return AssertionError('\n'.join(lines))
+
+    def assert_all(self):
+        """Raise the aggregated error if any check failed.
+
+        Raises:
+            AssertionError: Listing every recorded failure
+        """
+        error = self.error()
+        if error is not None:
+            logger.error(str(error))
+            raise error
+
+    def reset(self):
+        """Forget all checks, e.g. at the start of a scenario."""
+        self.checks = 0
+        self.failures = 0
+        self._recorded = []
+
+
+def is_numeric_string(value: Any) -> bool:
+    """Whether a value is a string of digits, optionally with '.' and '-'."""
+    return isinstance(value, str) and value.replace('.', '').replace(
+        '-', '').isdigit()
@@ -0,0 +1,164 @@
+"""Startup-time profile of a behave run.
+
+Runs ``behave --dry-run`` in a child interpreter with ``-X importtime`` and
+reports where startup time goes: per step/hook module (behave ``exec``s
+these, so they do not show up as imports) and per imported module::
+
+    python -m utils.startup_profile
+    python -m utils.startup_profile --top 30 -- --tags=@candlestick
+    python -m utils.parallel_runner --startup-profile -- --tags=@candlestick
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+_IMPORT_LINE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parse ``-X importtime`` output.
+
+    Args:
+        stderr: Child interpreter stderr
+
+    Returns:
+        List of dicts with ``module``, ``self_ms``, ``cumulative_ms`` and
+        ``depth`` (0 for modules imported directly by non-import code)
+    """
+    imports = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        imports.append({
+            'module': module,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            'depth': (len(indent) - 1) // 2,
+        })
+    return imports
+
+
+def _run_child(out_path: str, behave_args: List[str]) -> int:
+    """Run behave dry-run in this process, timing each exec'd module."""
+    import behave.runner
+    import behave.runner_util
+    from behave.__main__ import main as behave_main
+
+    timings = {}
+    original_exec_file = behave.runner_util.exec_file
+
+    def timed_exec_file(filename, globals_=None, locals_=None):
+        start = time.perf_counter()
+        try:
+            return original_exec_file(filename, globals_, locals_)
+        finally:
+            path = os.path.relpath(filename)
+            timings[path] = timings.get(path, 0.0) + (time.perf_counter() -
+                                                      start) * 1000
+
+    behave.runner_util.exec_file = timed_exec_file
+    behave.runner.exec_file = timed_exec_file
+
+    start = time.perf_counter()
+    status = behave_main(
+        ['--dry-run', '--no-summary', '-f', 'null', '-o', os.devnull] +
+        behave_args)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'exec_ms': timings,
+                'behave_ms': (time.perf_counter() - start) * 1000
+            }, f)
+    return status
+
+
+def profile_startup(behave_args: Optional[List[str]] = None,
+                    top: int = 20) -> int:
+    """Profile behave startup and print a report.
+
+    Args:
+        behave_args: Extra behave arguments, e.g. ``--tags``
+        top: Number of imported modules to list
+
+    Returns:
+        Child exit status
+    """
+    fd, out_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        completed = subprocess.run([
+            sys.executable, '-X', 'importtime', '-m', 'utils.startup_profile',
+            '--child', out_path, '--'
+        ] + list(behave_args or []),
+                                   stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE,
+                                   text=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+        try:
+            with open(out_path, 'r', encoding='utf-8') as f:
+                child = json.load(f)
+        except ValueError:
+            print(completed.stderr[-2000:], file=sys.stderr)
+            return completed.returncode or 1
+    finally:
+        os.unlink(out_path)
+
+    imports = parse_importtime(completed.stderr)
+    print(f"Startup profile (behave --dry-run {' '.join(behave_args or [])})")
+    print(f"  wall time:           {wall_ms:9.1f} ms")
+    print(f"  behave main:         {child['behave_ms']:9.1f} ms")
+    print(f"  imports (top level): "
+          f"{sum(i['cumulative_ms'] for i in imports if i['depth'] == 0):9.1f} ms")
+
+    print("\nStep and hook modules (exec time, including their imports):")
+    for path, ms in sorted(child['exec_ms'].items(),
+                           key=lambda item: item[1],
+                           reverse=True):
+        print(f"  {ms:9.1f} ms  {path}")
+
+    print(f"\nTop {top} imports by cumulative time:")
+    for item in sorted(imports, key=lambda i: i['cumulative_ms'],
+                       reverse=True)[:top]:
+        print(f"  {item['cumulative_ms']:9.1f} ms  "
+              f"{'  ' * item['depth']}{item['module']}")
+
+    print(f"\nTop {top} imports by self time:")
+    for item in sorted(imports, key=lambda i: i['self_ms'],
+                       reverse=True)[:top]:
+        print(f"  {item['self_ms']:9.1f} ms  {item['module']}")
+    return completed.returncode
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Report behave startup cost per module",
+        epilog="Arguments after -- are passed to behave.")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    behave_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, behave_args = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return _run_child(args.child, behave_args)
+    return profile_startup(behave_args, args.top)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
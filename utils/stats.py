@@ -0,0 +1,23 @@
+"""Small statistics helpers shared by the performance utilities."""
+
+import math
+from typing import Iterable, Optional
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (same as numpy's default).
+
+    Args:
+        values: Samples, in any order
+        q: Percentile in [0, 100]
+
+    Returns:
+        The percentile, or None if there are no samples
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
@@ -0,0 +1,400 @@
+"""Per-step-definition and per-scenario timing histograms.
+
+Step time is split into phases: ``network`` and ``waiting`` are measured
+where they happen (``with step_metrics.phase('network'): ...``), and
+``assertion`` is the rest of the step - assertions and step logic. At the
+end of the run the histograms are written as JSON (mergeable across runs
+and workers) and as an OpenMetrics text file::
+
+    python -m utils.step_metrics reports/workers/*.metrics.json --top 20
+"""
+
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.config_manager import config
+from utils.fileio import atomic_write
+from utils.logger import RUN_ID, get_logger
+
+logger = get_logger(__name__)
+
+PHASES = ('network', 'waiting', 'assertion')
+
+# 1ms doubling up to ~65s; everything above lands in +Inf
+DEFAULT_BUCKETS = [0.001 * 2**k for k in range(17)]
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        """Add one observation."""
+        index = 0
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = (self.buckets[index]
+                         if index < len(self.buckets) else self.max)
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def merge(self, data: Dict[str, Any]):
+        """Add the observations of a serialized histogram with equal buckets."""
+        if not data.get('count'):
+            return
+        for index, count in enumerate(data['counts']):
+            self.counts[index] += count
+        self.count += data['count']
+        self.sum += data['sum']
+        self.min = data['min'] if self.min is None else min(
+            self.min, data['min'])
+        self.max = data['max'] if self.max is None else max(
+            self.max, data['max'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize counts and summary statistics."""
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'counts': self.counts,
+        }
+
+
+class StepMetrics:
+    """Collects step and scenario durations from the behave hooks."""
+    def __init__(self, buckets: Optional[List[float]] = None):
+        """Initialize step metrics.
+
+        Args:
+            buckets: Histogram upper bounds in seconds. Defaults to
+                ``metrics.buckets`` from config, or 1ms doubling to ~65s
+        """
+        self._buckets = buckets
+        self.steps: Dict[str, Dict[str, Histogram]] = {}
+        self.scenarios: Dict[str, Histogram] = {}
+        self._definitions = {}
+        self._step_start = None
+        self._phase_totals = {}
+        self._phase_depth = 0
+        self._scenario_start = None
+
+    @property
+    def buckets(self) -> List[float]:
+        """Histogram bucket bounds, read from config on first use."""
+        if self._buckets is None:
+            self._buckets = [
+                float(b) for b in config.get('metrics.buckets') or []
+            ] or DEFAULT_BUCKETS
+        return self._buckets
+
+    def start_scenario(self):
+        """Mark the start of a scenario."""
+        self._scenario_start = time.perf_counter()
+
+    def end_scenario(self, scenario):
+        """Record a finished scenario's duration."""
+        if self._scenario_start is None:
+            return
+        elapsed = time.perf_counter() - self._scenario_start
+        self._scenario_start = None
+        key = f"{scenario.location.filename}:{scenario.line} {scenario.name}"
+        if key not in self.scenarios:
+            self.scenarios[key] = Histogram(self.buckets)
+        self.scenarios[key].observe(elapsed)
+
+    def start_step(self):
+        """Mark the start of a step and reset its phase totals."""
+        self._phase_totals = dict.fromkeys(PHASES, 0.0)
+        self._phase_depth = 0
+        self._step_start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Attribute the enclosed time to a phase of the current step.
+
+        Nested phases count towards the outermost one only.
+
+        Args:
+            name: ``network`` or ``waiting``
+        """
+        if self._step_start is None or self._phase_depth:
+            yield
+            return
+        self._phase_depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phase_depth -= 1
+            self._phase_totals[name] += time.perf_counter() - start
+
+    def end_step(self, runner, step):
+        """Record a finished step under its step definition.
+
+        Args:
+            runner: Behave runner, used to resolve the step definition
+            step: Finished step
+        """
+        if self._step_start is None:
+            return
+        total = time.perf_counter() - self._step_start
+        self._step_start = None
+        if step.status.name in ('undefined', 'skipped', 'untested'):
+            return
+
+        key = self._definition_key(runner, step)
+        phases = self._phase_totals
+        phases['assertion'] = max(
+            0.0, total - phases['network'] - phases['waiting'])
+        histograms = self.steps.get(key)
+        if histograms is None:
+            histograms = {
+                name: Histogram(self.buckets)
+                for name in ('total', ) + PHASES
+            }
+            self.steps[key] = histograms
+        histograms['total'].observe(total)
+        for name in PHASES:
+            histograms[name].observe(phases[name])
+
+    def _definition_key(self, runner, step) -> str:
+        """Get ``"<keyword> <pattern>"`` of the definition matching a step."""
+        match = runner.step_registry.find_match(step)
+        if match is None or match.func is None:
+            return f"{step.step_type} {step.name}"
+        if not self._definitions:
+            for step_type, definitions in runner.step_registry.steps.items():
+                for definition in definitions:
+                    self._definitions[definition.func] = (
+                        f"{step_type} {definition.pattern}")
+        return self._definitions.get(match.func,
+                                     f"{step.step_type} {step.name}")
+
+    def merge(self, data: Dict[str, Any]):
+        """Merge serialized metrics from another run or worker."""
+        if data.get('buckets') != self.buckets:
+            raise ValueError("Cannot merge step metrics with other buckets")
+        for key, phases in data.get('steps', {}).items():
+            histograms = self.steps.setdefault(key, {
+                name: Histogram(self.buckets)
+                for name in ('total', ) + PHASES
+            })
+            for name, histogram in phases.items():
+                histograms[name].merge(histogram)
+        for key, histogram in data.get('scenarios', {}).items():
+            self.scenarios.setdefault(key,
+                                      Histogram(self.buckets)).merge(histogram)
+
+    def slowest(self, top: int = 10) -> List[Dict[str, Any]]:
+        """Step definitions ordered by the wall-clock time they consumed."""
+        rows = []
+        for key, histograms in self.steps.items():
+            total = histograms['total']
+            rows.append({
+                'step': key,
+                'count': total.count,
+                'total_seconds': total.sum,
+                'mean_seconds': total.sum / total.count,
+                'p95_seconds': total.quantile(0.95),
+                'max_seconds': total.max,
+                **{
+                    f"{name}_seconds": histograms[name].sum
+                    for name in PHASES
+                },
+            })
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows[:top]
+
+    def to_dict(self, top: int = 10) -> Dict[str, Any]:
+        """Serialize all histograms plus the slowest-steps summary."""
+        return {
+            'run_id': RUN_ID,
+            'buckets': self.buckets,
+            'steps': {
+                key: {
+                    name: histogram.to_dict()
+                    for name, histogram in histograms.items()
+                }
+                for key, histograms in self.steps.items()
+            },
+            'scenarios': {
+                key: histogram.to_dict()
+                for key, histogram in self.scenarios.items()
+            },
+            'slowest': self.slowest(top),
+        }
+
+    def to_openmetrics(self) -> str:
+        """Render the histograms in OpenMetrics text format."""
+        lines = [
+            "# TYPE behave_step_duration_seconds histogram",
+            "# UNIT behave_step_duration_seconds seconds",
+            "# HELP behave_step_duration_seconds Step duration by step "
+            "definition and phase.",
+        ]
+        for key, histograms in sorted(self.steps.items()):
+            for name, histogram in histograms.items():
+                lines += _histogram_lines('behave_step_duration_seconds', {
+                    'step': key,
+                    'phase': name
+                }, histogram)
+        lines += [
+            "# TYPE behave_scenario_duration_seconds histogram",
+            "# UNIT behave_scenario_duration_seconds seconds",
+            "# HELP behave_scenario_duration_seconds Scenario duration.",
+        ]
+        for key, histogram in sorted(self.scenarios.items()):
+            lines += _histogram_lines('behave_scenario_duration_seconds',
+                                      {'scenario': key}, histogram)
+        lines.append("# EOF")
+        return '\n'.join(lines) + '\n'
+
+    def export(self,
+               json_path: Optional[str] = None,
+               openmetrics_path: Optional[str] = None,
+               top: Optional[int] = None):
+        """Write JSON and OpenMetrics files and log the slowest steps.
+
+        Args:
+            json_path: Defaults to ``metrics.json_path`` from config
+            openmetrics_path: Defaults to ``metrics.openmetrics_path``
+            top: Slowest steps to report. Defaults to ``metrics.slowest``
+        """
+        metrics_config = config.get('metrics', {})
+        json_path = Path(json_path or metrics_config.get(
+            'json_path', 'reports/step_metrics.json'))
+        openmetrics_path = Path(openmetrics_path or metrics_config.get(
+            'openmetrics_path', 'reports/step_metrics.txt'))
+        top = int(top or metrics_config.get('slowest', 10))
+
+        data = self.to_dict(top)
+        atomic_write(json_path, json.dumps(data, indent=2))
+        atomic_write(openmetrics_path, self.to_openmetrics())
+
+        logger.info(format_slowest(data['slowest']))
+        logger.debug(f"Step metrics written to {json_path} and "
+                     f"{openmetrics_path}")
+
+
+def _escape_label(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n'))
+
+
+def _histogram_lines(name: str, labels: Dict[str, str],
+                     histogram: Histogram) -> List[str]:
+    """Render one labelled histogram as OpenMetrics sample lines."""
+    label_text = ','.join(f'{key}="{_escape_label(value)}"'
+                          for key, value in labels.items())
+    lines = []
+    cumulative = 0
+    bounds = [repr(float(b)) for b in histogram.buckets] + ['+Inf']
+    for bound, count in zip(bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} '
+                     f'{cumulative}')
+    lines.append(f'{name}_count{{{label_text}}} {histogram.count}')
+    lines.append(f'{name}_sum{{{label_text}}} {histogram.sum!r}')
+    return lines
+
+
+def format_slowest(rows: List[Dict[str, Any]]) -> str:
+    """Format the slowest-steps summary as a text table."""
+    lines = [
+        "Slowest steps (seconds):",
+        f"  {'total':>9} {'count':>6} {'mean':>8} {'p95':>8} {'network':>8} "
+        f"{'waiting':>8} {'assert':>8}  step",
+    ]
+    for row in rows:
+        lines.append(
+            f"  {row['total_seconds']:9.3f} {row['count']:6d} "
+            f"{row['mean_seconds']:8.3f} {row['p95_seconds']:8.3f} "
+            f"{row['network_seconds']:8.3f} {row['waiting_seconds']:8.3f} "
+            f"{row['assertion_seconds']:8.3f}  {row['step']}")
+    return '\n'.join(lines)
+
+
+def merge_files(paths: List[Path]) -> StepMetrics:
+    """Merge step metrics JSON files; missing files are skipped.
+
+    Args:
+        paths: JSON files written by ``StepMetrics.export``
+
+    Returns:
+        Combined metrics
+    """
+    merged = None
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if merged is None:
+            merged = StepMetrics(data['buckets'])
+        merged.merge(data)
+    return merged or StepMetrics()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Merge metrics files and print the slowest steps."""
+    parser = argparse.ArgumentParser(
+        description="Merge step metrics and show the slowest steps")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json-out', help="Write the merged JSON here")
+    parser.add_argument('--openmetrics-out',
+                        help="Write merged OpenMetrics text here")
+    args = parser.parse_args(argv)
+
+    metrics = merge_files([Path(p) for p in args.files])
+    if args.json_out:
+        atomic_write(Path(args.json_out),
+                      json.dumps(metrics.to_dict(args.top), indent=2))
+    if args.openmetrics_out:
+        atomic_write(Path(args.openmetrics_out), metrics.to_openmetrics())
+    print(format_slowest(metrics.slowest(args.top)))
+    return 0
+
+
+# Global step metrics instance
+step_metrics = StepMetrics()
+
+if __name__ == "__main__":
+    sys.exit(main())
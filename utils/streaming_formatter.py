@@ -0,0 +1,304 @@
+"""Behave formatter that streams results to disk as the run progresses.
+
+Unlike the HTML formatter, nothing is kept in memory beyond the scenario
+being run. Output, in the directory of the ``-o`` file (default
+``reports/stream``):
+
+- ``events.jsonl``: one JSON object per line (``run``, ``feature``,
+  ``scenario``, ``run_end``), flushed after every scenario
+- ``page-00001.js`` ...: the same scenario events in pages of
+  ``report.page_size``, one ``R({...});`` line each, for the viewer
+- ``manifest.js``: run info, page count and status counts
+- ``index.html``: static viewer that pages through the results
+
+Every file is valid after each flush, so a killed run still leaves a
+usable report. Error messages and captured output are truncated to
+``report.max_output_chars`` per step::
+
+    behave -f stream -o reports/stream/index.html
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from behave.formatter.base import Formatter
+
+from utils.config_manager import config
+from utils.fileio import atomic_write
+from utils.logger import RUN_ID
+
+
+def truncate(text: Optional[str], limit: int) -> Optional[str]:
+    """Truncate text, noting how much was cut."""
+    if text is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n... [{len(text) - limit} chars truncated]"
+
+
+class StreamingFormatter(Formatter):
+    """Writes JSONL events and a paged static HTML report incrementally."""
+    name = 'stream'
+    description = 'Streams JSONL events and a paged HTML viewer to disk'
+
+    def __init__(self, stream_opener, behave_config):
+        super().__init__(stream_opener, behave_config)
+        report_config = config.get('report', {})
+        self.page_size = int(report_config.get('page_size', 200))
+        self.max_output = int(report_config.get('max_output_chars', 2000))
+
+        target = Path(stream_opener.name or
+                      report_config.get('stream_dir', 'reports/stream'))
+        self.directory = target.parent if target.suffix else target
+        self.viewer_path = (target if target.suffix == '.html' else
+                            self.directory / 'index.html')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.directory.glob('page-*.js'):
+            stale.unlink()
+
+        self.started = time.time()
+        self.counts: Dict[str, int] = {}
+        self.pages = 0
+        self.page_rows = 0
+        self.page_file = None
+        self.finished = False
+        self.current_feature = None
+        self.current = None
+
+        self.events = open(self.directory / 'events.jsonl',
+                           'w',
+                           encoding='utf-8')
+        with open(self.viewer_path, 'w', encoding='utf-8') as f:
+            f.write(VIEWER_HTML)
+        self._write_event({
+            'type': 'run',
+            'run_id': RUN_ID,
+            'started': self.started
+        })
+        self._write_manifest()
+
+    def feature(self, feature):
+        self._finish_scenario()
+        self.current_feature = feature
+        self._write_event({
+            'type': 'feature',
+            'name': feature.name,
+            'location': str(feature.location),
+            'tags': list(feature.tags),
+        })
+
+    def scenario(self, scenario):
+        self._finish_scenario()
+        self.current = {
+            'type': 'scenario',
+            'feature': self.current_feature.name
+            if self.current_feature else None,
+            'name': scenario.name,
+            'location': str(scenario.location),
+            'tags': list(scenario.effective_tags),
+            'steps': [],
+            '_scenario': scenario,
+        }
+
+    def result(self, step):
+        if self.current is None:
+            return
+        captured = getattr(step, 'captured', None)
+        self.current['steps'].append({
+            'keyword': step.keyword,
+            'name': step.name,
+            'status': step.status.name,
+            'duration': round(step.duration, 6),
+            'error': truncate(step.error_message, self.max_output),
+            'captured': truncate(captured.output, self.max_output)
+            if captured else None,
+        })
+
+    def eof(self):
+        self._finish_scenario()
+        self._write_manifest()
+
+    def close(self):
+        self._finish_scenario()
+        self._write_event({
+            'type': 'run_end',
+            'finished': time.time(),
+            'counts': self.counts
+        })
+        self.finished = True
+        self._write_manifest()
+        self.events.close()
+        if self.page_file:
+            self.page_file.close()
+
+    def _finish_scenario(self):
+        """Write the scenario in progress, now that its result is known."""
+        if self.current is None:
+            return
+        scenario = self.current.pop('_scenario')
+        self.current['status'] = scenario.status.name
+        self.current['duration'] = round(scenario.duration, 6)
+        # Set by after_scenario for failed scenarios (see utils.artifact_store)
+        self.current['artifacts'] = list(getattr(scenario, 'artifacts', []))
+        self.counts[scenario.status.name] = self.counts.get(
+            scenario.status.name, 0) + 1
+        self._write_event(self.current)
+        self._write_page_row(self.current)
+        self.current = None
+
+    def _write_event(self, event: Dict[str, Any]):
+        self.events.write(json.dumps(event, default=str) + '\n')
+        self.events.flush()
+
+    def _write_page_row(self, event: Dict[str, Any]):
+        if self.page_file is None or self.page_rows >= self.page_size:
+            if self.page_file:
+                self.page_file.close()
+            self.pages += 1
+            self.page_rows = 0
+            self.page_file = open(self.directory / f"page-{self.pages:05d}.js",
+                                  'w',
+                                  encoding='utf-8')
+            # List the page before it has rows, so a killed run shows it
+            self._write_manifest()
+        self.page_file.write(f"R({json.dumps(event, default=str)});\n")
+        self.page_file.flush()
+        self.page_rows += 1
+
+    def _write_manifest(self):
+        manifest = {
+            'run_id': RUN_ID,
+            'started': self.started,
+            'updated': time.time(),
+            'finished': self.finished,
+            'pages': self.pages,
+            'page_size': self.page_size,
+            'counts': self.counts,
+        }
+        atomic_write(self.directory / 'manifest.js',
+                     f"M({json.dumps(manifest)});\n")
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Test Report</title>
+<style>
+body { font-family: sans-serif; margin: 1em 2em; }
+table { border-collapse: collapse; width: 100%; }
+td, th { border-bottom: 1px solid #ddd; padding: 4px 8px; text-align: left;
+         vertical-align: top; }
+tr.scenario { cursor: pointer; }
+.passed { color: #2a7d2a; } .failed { color: #c62828; }
+.skipped, .untested { color: #888; } .undefined { color: #b26a00; }
+pre { white-space: pre-wrap; background: #f6f6f6; padding: 4px; margin: 2px 0; }
+#pager button { margin-right: 4px; }
+</style>
+</head>
+<body>
+<h1>Test Report</h1>
+<p id="summary">Loading...</p>
+<p id="pager">
+  <button id="prev">&laquo; Prev</button>
+  <span id="page"></span>
+  <button id="next">Next &raquo;</button>
+  <label><input type="checkbox" id="failed-only"> Failed only</label>
+</p>
+<table>
+  <thead><tr><th>Status</th><th>Scenario</th><th>Feature</th>
+  <th>Duration</th></tr></thead>
+  <tbody id="rows"></tbody>
+</table>
+<script>
+var manifest = null, rows = [], current = 1;
+function M(data) { manifest = data; }
+function R(row) { rows.push(row); }
+function load(src, done) {
+  var script = document.createElement('script');
+  script.src = src + '?t=' + Date.now();
+  script.onload = done;
+  script.onerror = done;
+  document.body.appendChild(script);
+}
+function cell(tr, text, cls) {
+  var td = document.createElement('td');
+  td.textContent = text;
+  if (cls) td.className = cls;
+  tr.appendChild(td);
+  return td;
+}
+function render() {
+  var failedOnly = document.getElementById('failed-only').checked;
+  var tbody = document.getElementById('rows');
+  tbody.innerHTML = '';
+  rows.forEach(function (row) {
+    if (failedOnly && row.status !== 'failed') return;
+    var tr = document.createElement('tr');
+    tr.className = 'scenario';
+    cell(tr, row.status, row.status);
+    cell(tr, row.name + ' (' + row.location + ')');
+    cell(tr, row.feature || '');
+    cell(tr, row.duration.toFixed(3) + 's');
+    var detail = document.createElement('tr');
+    detail.style.display = row.status === 'failed' ? '' : 'none';
+    var td = document.createElement('td');
+    td.colSpan = 4;
+    row.steps.forEach(function (step) {
+      var div = document.createElement('div');
+      div.className = step.status;
+      div.textContent = step.keyword + ' ' + step.name + ' [' +
+        step.status + ', ' + step.duration.toFixed(3) + 's]';
+      td.appendChild(div);
+      [step.error, step.captured].forEach(function (text) {
+        if (!text) return;
+        var pre = document.createElement('pre');
+        pre.textContent = text;
+        td.appendChild(pre);
+      });
+    });
+    (row.artifacts || []).forEach(function (path) {
+      var link = document.createElement('a');
+      link.href = path.indexOf('/') === 0 ? 'file://' + path : '../../' + path;
+      link.textContent = path;
+      var div = document.createElement('div');
+      div.appendChild(link);
+      td.appendChild(div);
+    });
+    detail.appendChild(td);
+    tr.onclick = function () {
+      detail.style.display = detail.style.display ? '' : 'none';
+    };
+    tbody.appendChild(tr);
+    tbody.appendChild(detail);
+  });
+}
+function showPage(page) {
+  current = Math.max(1, Math.min(page, manifest.pages || 1));
+  rows = [];
+  document.getElementById('page').textContent =
+    'Page ' + current + ' of ' + (manifest.pages || 1);
+  if (!manifest.pages) { render(); return; }
+  load('page-' + ('0000' + current).slice(-5) + '.js', render);
+}
+load('manifest.js', function () {
+  if (!manifest) {
+    document.getElementById('summary').textContent = 'No results yet.';
+    return;
+  }
+  var counts = Object.keys(manifest.counts).map(function (status) {
+    return manifest.counts[status] + ' ' + status;
+  });
+  document.getElementById('summary').textContent =
+    'Run ' + manifest.run_id + ': ' + (counts.join(', ') || 'no scenarios') +
+    (manifest.finished ? '' : ' (incomplete: run still going or killed)');
+  showPage(1);
+});
+document.getElementById('prev').onclick = function () { showPage(current - 1); };
+document.getElementById('next').onclick = function () { showPage(current + 1); };
+document.getElementById('failed-only').onchange = render;
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,90 @@
+"""Candlestick timeframe codes and candle boundary arithmetic.
+
+The exchange accepts both the current codes (``1m``, ``5m``, ``1h``,
+``1D``, ...) and the legacy ones (``M1``, ``M5``, ``H1``, ``D1``, ...).
+Candle ``t`` values are the candle open time in milliseconds since the epoch.
+``1M`` candles follow calendar months, so use ``next_open`` rather than
+adding ``timeframe_ms`` when stepping through candles.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+MINUTE_MS = 60_000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# Timeframe code -> candle length in milliseconds (None for calendar months)
+TIMEFRAMES = {
+    '1m': MINUTE_MS,
+    '5m': 5 * MINUTE_MS,
+    '15m': 15 * MINUTE_MS,
+    '30m': 30 * MINUTE_MS,
+    '1h': HOUR_MS,
+    '2h': 2 * HOUR_MS,
+    '4h': 4 * HOUR_MS,
+    '6h': 6 * HOUR_MS,
+    '12h': 12 * HOUR_MS,
+    '1D': DAY_MS,
+    '7D': 7 * DAY_MS,
+    '14D': 14 * DAY_MS,
+    '1M': None,
+    'M1': MINUTE_MS,
+    'M5': 5 * MINUTE_MS,
+    'M15': 15 * MINUTE_MS,
+    'M30': 30 * MINUTE_MS,
+    'H1': HOUR_MS,
+    'H2': 2 * HOUR_MS,
+    'H4': 4 * HOUR_MS,
+    'H6': 6 * HOUR_MS,
+    'H12': 12 * HOUR_MS,
+    'D1': DAY_MS,
+}
+
+
+def timeframe_ms(timeframe: str) -> Optional[int]:
+    """Get the candle length of a timeframe.
+
+    Args:
+        timeframe: Timeframe code, e.g. ``M5`` or ``1h``
+
+    Returns:
+        Length in milliseconds, or None for calendar-month candles
+
+    Raises:
+        ValueError: If the timeframe is unknown
+    """
+    try:
+        return TIMEFRAMES[timeframe]
+    except KeyError:
+        raise ValueError(f"Unknown timeframe: {timeframe}") from None
+
+
+def _month_start(t: int, months_ahead: int = 0) -> int:
+    """Open time of the calendar month containing ``t``, plus some months."""
+    moment = datetime.fromtimestamp(t / 1000, tz=timezone.utc)
+    month = moment.month - 1 + months_ahead
+    start = datetime(moment.year + month // 12, month % 12 + 1, 1,
+                     tzinfo=timezone.utc)
+    return int(start.timestamp() * 1000)
+
+
+def candle_open(t: int, timeframe: str) -> int:
+    """Open time of the candle containing ``t`` (epoch-aligned, UTC)."""
+    length = timeframe_ms(timeframe)
+    if length is None:
+        return _month_start(t)
+    return t - t % length
+
+
+def next_open(t: int, timeframe: str) -> int:
+    """Open time of the candle after the one opening at ``t``."""
+    length = timeframe_ms(timeframe)
+    if length is None:
+        return _month_start(t, 1)
+    return t + length
+
+
+def is_aligned(t: int, timeframe: str) -> bool:
+    """Whether ``t`` is a valid candle open time for the timeframe."""
+    return candle_open(t, timeframe) == t
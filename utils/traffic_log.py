@@ -0,0 +1,170 @@
+"""Structured JSONL log of HTTP exchanges with sampling."""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.config_manager import config
+from utils.logger import _DeferredQueueHandler, _Lazy
+from utils.run_context import LazySettings
+
+
+def _as_bool(value: Any) -> bool:
+    """Interpret a config value (possibly an env string) as a boolean."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+class TrafficLog(LazySettings):
+    """Writes one JSON line per sampled HTTP exchange.
+
+    The sampling decision is made before anything about the exchange is
+    formatted. Sampled entries are serialized on a background listener thread,
+    so unsampled traffic costs one ``random()`` call.
+    """
+    def __init__(self, traffic_config: Optional[Dict[str, Any]] = None):
+        """Initialize traffic log.
+
+        Args:
+            traffic_config: Traffic log settings. Defaults to ``logging.traffic``
+        """
+        self._traffic_config = traffic_config
+
+        self._logger = logging.getLogger('traffic')
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def _load_settings(self) -> Dict[str, Any]:
+        traffic_config = self._traffic_config or config.get(
+            'logging.traffic', {})
+        return {
+            'enabled': _as_bool(traffic_config.get('enabled', True)),
+            'file_path': traffic_config.get('file_path',
+                                            'reports/traffic.jsonl'),
+            'success_sample_rate': float(
+                traffic_config.get('success_sample_rate', 0.01)),
+            'failure_sample_rate': float(
+                traffic_config.get('failure_sample_rate', 1.0)),
+            'max_body_bytes': int(traffic_config.get('max_body_bytes', 500)),
+        }
+
+    def should_record(self, failed: bool) -> bool:
+        """Decide whether an exchange is sampled.
+
+        Args:
+            failed: Whether the exchange failed (error or status >= 400)
+
+        Returns:
+            True if the exchange should be written
+        """
+        if not self.enabled:
+            return False
+        rate = self.failure_sample_rate if failed else self.success_sample_rate
+        return rate >= 1.0 or random.random() < rate
+
+    def record(self,
+               method: str,
+               url: str,
+               params: dict = None,
+               request_body: Any = None,
+               response=None,
+               elapsed_time: float = None,
+               error: Exception = None,
+               timings: Dict[str, float] = None):
+        """Record an HTTP exchange if it is sampled.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            params: Query parameters
+            request_body: Request JSON body
+            response: Response object, if one was received
+            elapsed_time: Exchange duration in seconds
+            error: Exception raised by the transport, if any
+            timings: Optional per-phase timings in seconds
+        """
+        status_code = response.status_code if response is not None else None
+        failed = error is not None or status_code is None or status_code >= 400
+        if not self.should_record(failed):
+            return
+
+        self._ensure_listener()
+        timestamp = time.time()
+        self._logger.info(
+            '%s',
+            _Lazy(lambda: self._to_json(timestamp, method, url, params,
+                                        request_body, response, elapsed_time,
+                                        error, timings, failed)))
+
+    def _to_json(self, timestamp, method, url, params, request_body,
+                 response, elapsed_time, error, timings, failed) -> str:
+        """Build the JSON line for an exchange."""
+        limit = self.max_body_bytes
+        entry = {
+            'ts': timestamp,
+            'method': method,
+            'url': url,
+            'params': params,
+            'status': None,
+            'failed': failed,
+            'elapsed': elapsed_time,
+            'timings': timings,
+            'request_bytes': None,
+            'request_body': None,
+            'response_bytes': None,
+            'response_headers': None,
+            'response_body': None,
+            'error': str(error) if error is not None else None,
+        }
+        if request_body is not None:
+            body = json.dumps(request_body, default=str)
+            entry['request_bytes'] = len(body)
+            entry['request_body'] = body[:limit]
+        if response is not None:
+            entry['status'] = response.status_code
+            entry['response_bytes'] = len(response.content or b'')
+            entry['response_headers'] = dict(response.headers)
+            entry['response_body'] = response.text[:limit]
+        return json.dumps(entry, default=str)
+
+    def _ensure_listener(self):
+        """Open the JSONL file and start the writer thread on first use."""
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            path = Path(self.file_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            file_handler = logging.FileHandler(path, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter('%(message)s'))
+
+            log_queue = queue.SimpleQueue()
+            self._logger.handlers = [_DeferredQueueHandler(log_queue)]
+            self._listener = QueueListener(log_queue, file_handler)
+            self._listener.start()
+            atexit.register(self.close)
+
+    def close(self):
+        """Flush pending entries and close the JSONL file."""
+        with self._lock:
+            if self._listener is None:
+                return
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+
+# Global traffic log instance
+traffic_log = TrafficLog()
@@ -0,0 +1,360 @@
+"""Connection setup shared by the REST and WebSocket clients.
+
+- DNS answers are cached for ``transport.dns_ttl`` seconds, so only the
+  first connection to a host pays for resolution.
+- Every TLS connection uses one ``SSLContext``, which offers the last TLS
+  session (ticket) of the same host and port, so later handshakes are
+  resumed instead of full ones. Sessions are kept from REST responses and
+  from WebSocket upgrades, which is when TLS 1.3 tickets arrive.
+- ``prewarm`` connects to the API and WebSocket hosts in parallel before the
+  first scenario: the REST connection goes into the keep-alive pool and the
+  WebSocket handshake leaves a session to resume. It runs outside any step,
+  so the warm-up is not part of the measured timings.
+
+``utils.ws_storm`` keeps its own resolution and handshakes, since a storm is
+meant to measure cold connection setup.
+"""
+
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from utils.config_manager import config
+from utils.logger import get_logger
+from utils.run_context import LazySettings
+
+logger = get_logger(__name__)
+
+
+class DnsCache:
+    """``getaddrinfo`` answers, kept for a fixed TTL.
+
+    The resolver does not expose record TTLs, so one TTL applies to every
+    answer. Failed lookups are not cached.
+    """
+    def __init__(self, ttl: float = 60):
+        """Initialize DNS cache.
+
+        Args:
+            ttl: Seconds to keep an answer; 0 disables caching
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._answers: Dict[tuple, Tuple[float, List[tuple]]] = {}
+
+    def resolve(self,
+                host: str,
+                port: int,
+                family: int = 0,
+                type: int = socket.SOCK_STREAM) -> List[tuple]:
+        """Resolve like ``socket.getaddrinfo``, from the cache if fresh.
+
+        Raises:
+            socket.gaierror: If the name does not resolve
+        """
+        key = (host, port, family, type)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._answers.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        answer = socket.getaddrinfo(host, port, family, type)
+        if self.ttl > 0:
+            with self._lock:
+                self._answers[key] = (now + self.ttl, answer)
+        return answer
+
+    def clear(self):
+        """Forget every answer."""
+        with self._lock:
+            self._answers.clear()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client context that resumes the last TLS session of each host."""
+    def __new__(cls, protocol=ssl.PROTOCOL_TLS_CLIENT):
+        return super().__new__(cls, protocol)
+
+    def __init__(self, protocol=ssl.PROTOCOL_TLS_CLIENT):
+        """Initialize context; verifies certificates and hostnames."""
+        super().__init__()
+        self._sessions: Dict[Tuple[str, int], ssl.SSLSession] = {}
+        self._sessions_lock = threading.Lock()
+        self._loaded_locations = set()
+        # Handshakes so far, for logging
+        self.resumed = 0
+        self.full = 0
+
+    def load_verify_locations(self, cafile=None, capath=None, cadata=None):
+        """Load CA certificates once per location.
+
+        urllib3 loads the CA bundle into the context for every new
+        connection; parsing it again would add to each handshake.
+        """
+        key = (cafile, capath, cadata)
+        if key in self._loaded_locations:
+            return
+        super().load_verify_locations(cafile, capath, cadata)
+        self._loaded_locations.add(key)
+
+    def wrap_socket(self,
+                    sock,
+                    server_side=False,
+                    do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True,
+                    server_hostname=None,
+                    session=None):
+        """Wrap a connected socket, offering the host's last session."""
+        key = None
+        if not server_side and server_hostname:
+            try:
+                key = (server_hostname, sock.getpeername()[1])
+            except OSError:
+                pass
+        if session is None and key is not None:
+            with self._sessions_lock:
+                session = self._sessions.get(key)
+            if session is not None and (session.time + session.timeout <
+                                        time.time()):
+                session = None
+        ssl_sock = super().wrap_socket(
+            sock,
+            server_side=server_side,
+            do_handshake_on_connect=do_handshake_on_connect,
+            suppress_ragged_eofs=suppress_ragged_eofs,
+            server_hostname=server_hostname,
+            session=session)
+        if key is not None and do_handshake_on_connect:
+            if ssl_sock.session_reused:
+                self.resumed += 1
+                logger.debug("Resumed TLS session with %s:%d", *key)
+            else:
+                self.full += 1
+        return ssl_sock
+
+    def remember(self, sock):
+        """Keep a connection's session to resume the next one.
+
+        Call after data was read, so TLS 1.3 tickets have arrived.
+        """
+        if not isinstance(sock, ssl.SSLSocket) or not sock.server_hostname:
+            return
+        try:
+            session = sock.session
+            key = (sock.server_hostname, sock.getpeername()[1])
+        except (OSError, ValueError):
+            return
+        if session is not None:
+            with self._sessions_lock:
+                self._sessions[key] = session
+
+    def forget(self):
+        """Drop every kept session."""
+        with self._sessions_lock:
+            self._sessions.clear()
+
+
+class Transport(LazySettings):
+    """DNS cache, shared TLS context and pre-warming."""
+    def __init__(self, transport_config: Optional[Dict[str, Any]] = None):
+        """Initialize transport.
+
+        Args:
+            transport_config: Transport settings. Defaults to ``transport``
+        """
+        self._transport_config = transport_config
+        self._lock = threading.Lock()
+        self._ssl_context: Optional[ResumingSSLContext] = None
+
+    def _load_settings(self) -> Dict[str, Any]:
+        transport_config = self._transport_config or config.get(
+            'transport', {})
+        return {
+            'dns': DnsCache(float(transport_config.get('dns_ttl', 60))),
+            'tls_resumption': str(transport_config.get(
+                'tls_resumption', True)).lower() != 'false',
+            'prewarm_enabled': str(transport_config.get(
+                'prewarm', True)).lower() != 'false',
+            'prewarm_timeout': float(
+                transport_config.get('prewarm_timeout', 10)),
+        }
+
+    def resolve(self, host: str, port: int, family: int = 0,
+                type: int = socket.SOCK_STREAM) -> List[tuple]:
+        """Resolve a host through the DNS cache."""
+        return self.dns.resolve(host, port, family, type)
+
+    @property
+    def ssl_context(self) -> Optional[ResumingSSLContext]:
+        """The shared TLS context, or None if resumption is disabled."""
+        if not self.tls_resumption:
+            return None
+        if self._ssl_context is None:
+            with self._lock:
+                if self._ssl_context is None:
+                    context = ResumingSSLContext()
+                    context.load_default_certs(ssl.Purpose.SERVER_AUTH)
+                    # As ssl.create_default_context does
+                    keylog = os.environ.get('SSLKEYLOGFILE')
+                    if keylog:
+                        context.keylog_filename = keylog
+                    self._ssl_context = context
+        return self._ssl_context
+
+    def remember_session(self, sock):
+        """Keep a TLS socket's session for resumption."""
+        if self._ssl_context is not None:
+            self._ssl_context.remember(sock)
+
+    def open_socket(self, url: str, timeout: float) -> Optional[socket.socket]:
+        """Connect to a ``ws://`` or ``wss://`` URL's host, with TLS.
+
+        Returns:
+            Connected socket, or None if the URL goes through a proxy, in
+            which case the WebSocket client should connect by itself
+        """
+        parts = urlsplit(url)
+        host = parts.hostname
+        secure = parts.scheme in ('wss', 'https')
+        port = parts.port or (443 if secure else 80)
+        if _proxied(parts.scheme, host):
+            return None
+
+        error: Optional[Exception] = None
+        for family, type_, proto, _, address in self.resolve(host, port):
+            sock = socket.socket(family, type_, proto)
+            sock.settimeout(timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                sock.connect(address)
+                break
+            except OSError as e:
+                sock.close()
+                error = e
+        else:
+            raise error or OSError(f"No addresses for {host}")
+
+        context = self.ssl_context if secure else None
+        if secure and context is None:
+            context = ssl.create_default_context()
+        if context is not None:
+            try:
+                sock = context.wrap_socket(sock, server_hostname=host)
+            except BaseException:
+                sock.close()
+                raise
+        return sock
+
+    def should_prewarm(self, userdata: Dict[str, Any]) -> bool:
+        """Whether to pre-warm; the ``prewarm`` userdata flag wins."""
+        flag = userdata.get('prewarm')
+        if flag is None:
+            return self.prewarm_enabled
+        return str(flag).lower() in ('true', 'yes', '1', '')
+
+    def prewarm(self, http_client, urls: Iterable[Optional[str]],
+                ws_urls: Iterable[Optional[str]]) -> float:
+        """Open connections to the given hosts in parallel.
+
+        Failures are logged and otherwise ignored; the scenarios then
+        connect as usual.
+
+        Args:
+            http_client: ``HttpClient`` whose pool receives the REST
+                connections
+            urls: REST base URLs
+            ws_urls: WebSocket URLs
+
+        Returns:
+            Seconds the warm-up took
+        """
+        jobs = [(self._prewarm_http, http_client, url) for url in urls if url]
+        jobs += [(self._prewarm_ws, url) for url in ws_urls if url]
+        if not jobs:
+            return 0.0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(jobs),
+                                thread_name_prefix='prewarm') as executor:
+            futures = [(job[-1], executor.submit(*job)) for job in jobs]
+        warmed = 0
+        for url, future in futures:
+            try:
+                future.result()
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-warm {url}: {e}")
+        elapsed = time.perf_counter() - start
+        logger.info("Pre-warmed %d of %d connections in %.3fs", warmed,
+                    len(jobs), elapsed)
+        return elapsed
+
+    def _prewarm_http(self, http_client, url: str):
+        """Put an open connection into the client's keep-alive pool."""
+        adapter = http_client.session.get_adapter(url)
+        pool = adapter.poolmanager.connection_from_url(url)
+        connection = pool._get_conn()
+        try:
+            connection.timeout = self.prewarm_timeout
+            connection.connect()
+        except BaseException:
+            connection.close()
+            raise
+        finally:
+            pool._put_conn(connection)
+
+    def _prewarm_ws(self, url: str):
+        """Resolve, connect and upgrade once, keeping the TLS session."""
+        import websocket
+
+        sock = self.open_socket(url, self.prewarm_timeout)
+        ws = websocket.create_connection(url,
+                                         timeout=self.prewarm_timeout,
+                                         socket=sock)
+        try:
+            self.remember_session(ws.sock)
+        finally:
+            ws.close()
+
+
+def read_pending_tickets(sock) -> bool:
+    """Process TLS records waiting on an idle socket, without blocking.
+
+    Servers may send TLS 1.3 session tickets well after the handshake,
+    which makes an idle keep-alive socket look readable, i.e. closed.
+
+    Returns:
+        True if only TLS records (e.g. tickets) were pending, False on
+        EOF or unexpected application data
+    """
+    if not isinstance(sock, ssl.SSLSocket):
+        return False
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        sock.recv(1)
+        return False
+    except ssl.SSLWantReadError:
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def _proxied(scheme: str, host: str) -> bool:
+    """Whether proxy environment variables apply to a host."""
+    proxies = urllib.request.getproxies()
+    if not proxies:
+        return False
+    proxy_scheme = 'https' if scheme in ('wss', 'https') else 'http'
+    return proxy_scheme in proxies and not urllib.request.proxy_bypass(host)
+
+
+# Global transport instance
+transport = Transport()
@@ -0,0 +1,142 @@
+"""Condition-based waits.
+
+A ``Signal`` is notified by whatever produces new data: the WebSocket
+reader thread for every frame, ``poll_until`` for every REST response.
+``wait_until`` re-checks its condition each time the signal fires and
+returns as soon as the condition holds, so a step waits only as long as the
+data takes to arrive. Conditions nothing signals are re-checked on a
+backoff from ``waits.poll_min`` to ``waits.poll_max`` seconds.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from utils.config_manager import config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Signal:
+    """Wakes waiters whenever new data arrives."""
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Number of notifications so far."""
+        return self._version
+
+    def notify(self):
+        """Record new data and wake every waiter."""
+        with self._condition:
+            self._version += 1
+            self._condition.notify_all()
+
+    def wait(self, version: int, timeout: float) -> bool:
+        """Wait until notified after ``version`` was read.
+
+        Args:
+            version: ``version`` read before the caller checked its condition,
+                so a notification in between is not missed
+            timeout: Maximum wait in seconds
+
+        Returns:
+            Whether a notification arrived
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._version != version, timeout)
+
+
+def _backoff(poll_min: Optional[float],
+             poll_max: Optional[float]) -> Tuple[float, float]:
+    wait_config = config.get('waits', {})
+    if poll_min is None:
+        poll_min = float(wait_config.get('poll_min', 0.05))
+    if poll_max is None:
+        poll_max = float(wait_config.get('poll_max', 1.0))
+    return poll_min, max(poll_min, poll_max)
+
+
+def wait_until(condition: Callable[[], Any],
+               timeout: float,
+               signal: Optional[Signal] = None,
+               poll_min: Optional[float] = None,
+               poll_max: Optional[float] = None) -> Any:
+    """Wait until ``condition()`` returns a truthy value.
+
+    Args:
+        condition: Checked at once, on every signal and on each backoff
+            tick; must be cheap and must not block
+        timeout: Maximum wait in seconds
+        signal: Signal of the data the condition depends on
+        poll_min: First backoff delay. Defaults to ``waits.poll_min``
+        poll_max: Backoff cap. Defaults to ``waits.poll_max``
+
+    Returns:
+        The condition's last value: truthy if it held in time
+    """
+    delay, poll_max = _backoff(poll_min, poll_max)
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        version = signal.version if signal is not None else 0
+        value = condition()
+        if value:
+            logger.debug("Condition met after %.3fs", time.monotonic() - start)
+            return value
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return value
+        if signal is not None and signal.wait(version, min(delay, remaining)):
+            # New data: check again without growing the backoff
+            continue
+        if signal is None:
+            time.sleep(min(delay, remaining))
+        delay = min(delay * 2, poll_max)
+
+
+def poll_until(fetch: Callable[[], Any],
+               condition: Callable[[Any], Any],
+               timeout: float,
+               signal: Optional[Signal] = None,
+               poll_min: Optional[float] = None,
+               poll_max: Optional[float] = None) -> Tuple[bool, Any]:
+    """Call ``fetch`` on a backoff until ``condition(result)`` holds.
+
+    For sources that cannot push, such as a REST endpoint. Each result
+    notifies ``signal``, so other waiters on the same data wake too.
+
+    Args:
+        fetch: Gets the current data, e.g. sends a request
+        condition: Checked on every result
+        timeout: Maximum wait in seconds; a fetch already running is not
+            interrupted
+        signal: Notified after every fetch
+        poll_min: First delay between fetches. Defaults to ``waits.poll_min``
+        poll_max: Delay cap. Defaults to ``waits.poll_max``
+
+    Returns:
+        Whether the condition held in time, and the last result
+    """
+    delay, poll_max = _backoff(poll_min, poll_max)
+    start = time.monotonic()
+    deadline = start + timeout
+    fetches = 0
+    while True:
+        result = fetch()
+        fetches += 1
+        if signal is not None:
+            signal.notify()
+        if condition(result):
+            logger.debug("Condition met after %d fetches in %.3fs", fetches,
+                         time.monotonic() - start)
+            return True, result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, result
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, poll_max)
@@ -0,0 +1,294 @@
+"""Wall-clock budgets for steps and scenarios.
+
+Every step gets ``watchdog.step_budget`` seconds and every scenario
+``watchdog.scenario_budget``; ``watchdog.tag_budgets`` raises or lowers them
+per tag (the largest budget among a scenario's tags wins). When a budget
+runs out, a monitor thread:
+
+1. logs a timing dump: the scenario's steps so far and the stack of the
+   stuck step,
+2. calls the registered cancellers, which cut in-flight HTTP and WebSocket
+   I/O so a blocked ``recv`` returns at once,
+3. after ``watchdog.grace`` seconds, raises ``WatchdogTimeout`` in the
+   runner thread if it is still inside the step function, and again every
+   ``grace`` seconds in case the step swallows it.
+
+The step fails with the dump as its error, behave skips the rest of the
+scenario, and the worker moves on. Code blocked in C outside cancellable
+I/O (e.g. a long ``time.sleep``) is interrupted once it returns. A step
+that returns on its own past its budget is failed by ``after_step``
+instead, and a timeout still pending for it is withdrawn, so it cannot
+land in behave's hooks or reporting code.
+"""
+
+import ctypes
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.config_manager import config
+from utils.logger import get_logger
+from utils.run_context import LazySettings
+
+logger = get_logger(__name__)
+
+
+class WatchdogTimeout(AssertionError):
+    """A step or scenario ran past its wall-clock budget."""
+
+
+class Watchdog(LazySettings):
+    """Enforces step and scenario budgets from a monitor thread."""
+    def __init__(self, watchdog_config: Optional[Dict[str, Any]] = None):
+        """Initialize watchdog.
+
+        Args:
+            watchdog_config: Watchdog settings. Defaults to ``watchdog``
+        """
+        self._watchdog_config = watchdog_config
+        self._condition = threading.Condition()
+        self._cancellers: List[Callable[[], Any]] = []
+        self._monitor: Optional[threading.Thread] = None
+        self._runner_thread: Optional[int] = None
+        self._generation = 0
+        self._deadline: Optional[float] = None
+        self._deadline_kind = ''
+        self._scenario = None
+        self._scenario_start = 0.0
+        self._scenario_budget = 0.0
+        self._step_budget = 0.0
+        self._step = None
+        self._step_start = 0.0
+        self._steps: List[Tuple[str, float, str]] = []
+        self._fired: Optional[str] = None
+        # A WatchdogTimeout may be pending in the runner thread
+        self._interrupted = False
+
+    def _load_settings(self) -> Dict[str, Any]:
+        watchdog_config = self._watchdog_config or config.get('watchdog', {})
+        return {
+            'enabled': str(watchdog_config.get('enabled',
+                                               True)).lower() != 'false',
+            'step_budget': float(watchdog_config.get('step_budget', 60)),
+            'scenario_budget': float(
+                watchdog_config.get('scenario_budget', 180)),
+            'grace': float(watchdog_config.get('grace', 2)),
+            'tag_budgets': watchdog_config.get('tag_budgets') or {},
+        }
+
+    def budgets(self, tags: List[str]) -> Tuple[float, float]:
+        """Step and scenario budgets in seconds for a set of tags."""
+        step_budget, scenario_budget = self.step_budget, self.scenario_budget
+        tagged = [
+            self.tag_budgets[tag] for tag in tags if tag in self.tag_budgets
+        ]
+        if tagged:
+            step_budget = max(
+                float(budget.get('step', step_budget)) for budget in tagged)
+            scenario_budget = max(
+                float(budget.get('scenario', scenario_budget))
+                for budget in tagged)
+        return step_budget, scenario_budget
+
+    def add_canceller(self, cancel: Callable[[], Any]):
+        """Call ``cancel`` whenever a budget runs out, until removed."""
+        with self._condition:
+            if cancel not in self._cancellers:
+                self._cancellers.append(cancel)
+
+    def remove_canceller(self, cancel: Callable[[], Any]):
+        """Stop calling ``cancel`` on timeouts."""
+        with self._condition:
+            if cancel in self._cancellers:
+                self._cancellers.remove(cancel)
+
+    def start_scenario(self, scenario):
+        """Start the scenario budget.
+
+        Args:
+            scenario: Behave scenario; its effective tags select the budgets
+        """
+        if not self.enabled:
+            return
+        step_budget, scenario_budget = self.budgets(scenario.effective_tags)
+        with self._condition:
+            self._runner_thread = threading.get_ident()
+            self._scenario = scenario
+            self._scenario_start = time.monotonic()
+            self._scenario_budget = scenario_budget
+            self._step_budget = step_budget
+            self._steps = []
+            self._step = None
+            self._fired = None
+            self._set_deadline(self._scenario_start + scenario_budget,
+                               'scenario')
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self._run,
+                                             name='watchdog',
+                                             daemon=True)
+            self._monitor.start()
+
+    def start_step(self, step):
+        """Start a step's budget, capped by what is left of the scenario's.
+
+        Raises:
+            WatchdogTimeout: If the scenario budget is already spent
+        """
+        if not self.enabled or self._scenario is None:
+            return
+        now = time.monotonic()
+        with self._condition:
+            scenario_deadline = self._scenario_start + self._scenario_budget
+            if now >= scenario_deadline:
+                raise WatchdogTimeout(
+                    self._dump('scenario', self._scenario_budget))
+            self._step = step
+            self._step_start = now
+            self._fired = None
+            step_deadline = now + self._step_budget
+            if step_deadline < scenario_deadline:
+                self._set_deadline(step_deadline, 'step')
+            else:
+                self._set_deadline(scenario_deadline, 'scenario')
+
+    def end_step(self, step) -> Optional[str]:
+        """Stop the step's budget.
+
+        Returns:
+            The timing dump if the step ran out of budget, else None
+        """
+        if not self.enabled or self._scenario is None:
+            return None
+        with self._condition:
+            # The step returned before the timeout reached it; after_step
+            # raises it instead of behave's reporting code
+            self._clear_interrupt()
+            self._steps.append((f"{step.keyword} {step.name}",
+                                time.monotonic() - self._step_start,
+                                step.status.name))
+            self._step = None
+            fired, self._fired = self._fired, None
+            scenario_deadline = self._scenario_start + self._scenario_budget
+            # A spent scenario budget fails the next step in start_step
+            self._set_deadline(
+                scenario_deadline
+                if scenario_deadline > time.monotonic() else None, 'scenario')
+        return fired
+
+    def end_scenario(self):
+        """Stop the scenario budget."""
+        with self._condition:
+            self._scenario = None
+            self._step = None
+            self._clear_interrupt()
+            self._set_deadline(None, '')
+
+    def _set_deadline(self, deadline: Optional[float], kind: str):
+        """Move the deadline; a new generation voids pending timeouts."""
+        self._generation += 1
+        self._deadline = deadline
+        self._deadline_kind = kind
+        self._condition.notify_all()
+
+    def _dump(self, kind: str, budget: float) -> str:
+        """Describe the stuck scenario: steps so far and the runner's stack."""
+        now = time.monotonic()
+        scenario = self._scenario
+        lines = [
+            f"Watchdog: {kind} budget of {budget:.0f}s exceeded",
+            f"  scenario: {scenario.name} ({scenario.location}), "
+            f"{now - self._scenario_start:.1f}s of "
+            f"{self._scenario_budget:.0f}s",
+        ]
+        for name, duration, status in self._steps:
+            lines.append(f"  {duration:8.2f}s {status:<8} {name}")
+        if self._step is not None:
+            lines.append(f"  {now - self._step_start:8.2f}s {'running':<8} "
+                         f"{self._step.keyword} {self._step.name}")
+        frame = sys._current_frames().get(self._runner_thread)
+        if frame is not None:
+            # Drop behave's own frames, down to the step function
+            stack = traceback.extract_stack(frame)
+            for i, frame_summary in enumerate(stack):
+                if frame_summary.filename.endswith(
+                        os.path.join('behave', 'matchers.py')):
+                    stack = stack[i + 1:]
+                    break
+            lines.append("  stack of the running step:")
+            lines.extend(f"  {line}"
+                         for entry in traceback.format_list(stack[-10:])
+                         for line in entry.rstrip().splitlines())
+        return '\n'.join(lines)
+
+    def _run(self):
+        """Monitor loop: sleep until the deadline, then time out."""
+        fired_generation = None
+        while True:
+            with self._condition:
+                while self._deadline is None or time.monotonic(
+                ) < self._deadline:
+                    timeout = (None if self._deadline is None else
+                               self._deadline - time.monotonic())
+                    self._condition.wait(timeout)
+                generation = self._generation
+                if generation != fired_generation:
+                    kind = self._deadline_kind
+                    budget = (self._step_budget
+                              if kind == 'step' else self._scenario_budget)
+                    message = self._dump(kind, budget)
+                    self._fired = message
+                    logger.error(message)
+                    fired_generation = generation
+                cancellers = list(self._cancellers)
+                # Re-raise later if the step swallows the timeout
+                self._deadline = time.monotonic() + self.grace
+            for cancel in cancellers:
+                try:
+                    cancel()
+                except Exception as e:
+                    logger.warning(f"Watchdog canceller failed: {e}")
+            time.sleep(self.grace)
+            with self._condition:
+                if (self._generation == generation
+                        and self._step is not None):
+                    self._interrupt(message)
+
+    def _in_step_function(self) -> bool:
+        """Whether the runner thread is inside a step function right now."""
+        frame = sys._current_frames().get(self._runner_thread)
+        matchers = os.path.join('behave', 'matchers.py')
+        while frame is not None:
+            if frame.f_code.co_filename.endswith(matchers):
+                return True
+            frame = frame.f_back
+        return False
+
+    def _interrupt(self, message: str):
+        """Raise ``WatchdogTimeout`` in the runner thread.
+
+        Skipped if the step function has already returned, e.g. the runner
+        is waiting for the lock in ``end_step``.
+        """
+        if not self._in_step_function():
+            return
+        timeout_type = type('WatchdogTimeout', (WatchdogTimeout, ), {
+            '__init__': lambda self: WatchdogTimeout.__init__(self, message)
+        })
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ctypes.c_ulong(self._runner_thread),
+            ctypes.py_object(timeout_type))
+        self._interrupted = True
+
+    def _clear_interrupt(self):
+        """Withdraw a ``WatchdogTimeout`` not yet raised in the runner thread."""
+        if self._interrupted:
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(self._runner_thread), None)
+            self._interrupted = False
+
+
+# Global watchdog instance
+watchdog = Watchdog()
@@ -0,0 +1,427 @@
+"""WebSocket connection storms and subscription fan-out.
+
+Opens many connections to one WebSocket URL from a single asyncio event
+loop rather than one thread per socket, so hundreds of connections cost a
+few megabytes::
+
+    storm = ConnectionStorm(url, connections=500, concurrency=50,
+                            message={"id": 1, "method": "subscribe",
+                                     "params": {"channels": ["trade.BTCUSD-PERP"]}})
+    result = storm.run()
+    result.summary()
+
+At most ``concurrency`` connections are being set up at any time. Each
+connection records:
+
+- connect time: TCP connect, TLS handshake and the HTTP upgrade
+- first message latency: from sending ``message`` to the first data
+  message (``result.data``) of the subscription
+- the reason it failed, e.g. ``connect timeout``, ``HTTP 429``,
+  ``no message``
+
+Connections stay open until every connection has its first message (or
+failed), then for ``storm.hold`` more seconds, so the server carries the
+full fan-out at once. Connections are ``websockets`` clients without
+compression or keepalive pings of their own; pings from the server are
+answered, and so are exchange heartbeats, so long holds are not
+disconnected. A message over ``storm.max_message_kb`` closes its connection
+with 1009 and fails it as ``closed 1009``. Text messages are parsed as JSON;
+binary messages are only counted.
+
+From the command line::
+
+    python -m utils.ws_storm --connections 500 --concurrency 50 \\
+        --channel trade.BTCUSD-PERP
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import ssl
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from utils.config_manager import config
+from utils.logger import get_logger
+from utils.stats import percentile
+from utils.watchdog import watchdog
+
+logger = get_logger(__name__)
+
+
+class StormFailure(Exception):
+    """A storm connection failed; the message is its failure reason."""
+
+
+def _failure_reason(error: BaseException) -> str:
+    """Short, groupable reason for a failed connection."""
+    from websockets.exceptions import (ConnectionClosed, InvalidHandshake,
+                                       InvalidStatus)
+
+    if isinstance(error, StormFailure):
+        return str(error)
+    if isinstance(error, InvalidStatus):
+        return f"HTTP {error.response.status_code}"
+    if isinstance(error, InvalidHandshake):
+        return 'bad handshake'
+    if isinstance(error, ConnectionClosed):
+        # Our own close frame when we gave up, e.g. 1009 for a message
+        # over max_size, otherwise the server's
+        frame = (error.sent if error.rcvd is None
+                 or error.rcvd_then_sent is False else error.rcvd)
+        return 'closed' if frame is None else f"closed {frame.code}"
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(error, socket.gaierror):
+        return 'dns'
+    if isinstance(error, ssl.SSLError):
+        return 'tls'
+    if isinstance(error, ConnectionRefusedError):
+        return 'refused'
+    if isinstance(error, ConnectionResetError):
+        return 'reset'
+    return type(error).__name__
+
+
+class ConnectionResult:
+    """Outcome of one storm connection."""
+    def __init__(self, index: int):
+        self.index = index
+        self.connect_time: Optional[float] = None
+        self.first_message_latency: Optional[float] = None
+        self.messages = 0
+        self.failure: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the connection did everything asked of it."""
+        return self.failure is None
+
+
+class StormResult:
+    """Connect-time and first-message-latency distributions of a storm."""
+    def __init__(self, results: List[ConnectionResult], duration: float):
+        self.results = results
+        self.duration = duration
+
+    @property
+    def failures(self) -> Counter:
+        """Failed connections by reason."""
+        return Counter(result.failure for result in self.results
+                       if result.failure is not None)
+
+    @property
+    def failure_rate(self) -> float:
+        """Failed connections in percent."""
+        if not self.results:
+            return 0.0
+        return 100 * sum(self.failures.values()) / len(self.results)
+
+    @property
+    def connect_times(self) -> List[float]:
+        """Connect times of the connections that connected."""
+        return [
+            result.connect_time for result in self.results
+            if result.connect_time is not None
+        ]
+
+    @property
+    def first_message_latencies(self) -> List[float]:
+        """First message latencies of the connections that got one."""
+        return [
+            result.first_message_latency for result in self.results
+            if result.first_message_latency is not None
+        ]
+
+    def distribution(self, values: List[float]) -> Dict[str, Optional[float]]:
+        """p50, p95, p99 and max of a list of seconds."""
+        return {
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': max(values) if values else None,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Everything worth reporting, as plain data."""
+        return {
+            'connections': len(self.results),
+            'failed': sum(self.failures.values()),
+            'failure_rate': round(self.failure_rate, 2),
+            'failures': dict(self.failures.most_common()),
+            'duration': round(self.duration, 3),
+            'connect_time': self.distribution(self.connect_times),
+            'first_message_latency': self.distribution(
+                self.first_message_latencies),
+            'messages': sum(result.messages for result in self.results),
+        }
+
+    def describe(self) -> str:
+        """One-paragraph text summary for logs and assertion messages."""
+        def fmt(distribution):
+            if distribution['p50'] is None:
+                return 'n/a'
+            return ', '.join(f"{name} {value * 1000:.0f}ms"
+                             for name, value in distribution.items())
+
+        summary = self.summary()
+        failures = ', '.join(f"{reason}: {count}"
+                             for reason, count in summary['failures'].items())
+        return (f"{summary['connections']} connections in "
+                f"{summary['duration']:.1f}s, {summary['failed']} failed"
+                f"{f' ({failures})' if failures else ''}; "
+                f"connect {fmt(summary['connect_time'])}; "
+                f"first message {fmt(summary['first_message_latency'])}")
+
+
+class ConnectionStorm:
+    """Opens many WebSocket connections at once from one event loop."""
+    def __init__(self,
+                 url: str,
+                 connections: int,
+                 concurrency: int,
+                 message: Optional[Dict[str, Any]] = None,
+                 storm_config: Optional[Dict[str, Any]] = None):
+        """Initialize connection storm.
+
+        Args:
+            url: ``ws://`` or ``wss://`` URL
+            connections: Connections to open
+            concurrency: Connections being set up at the same time
+            message: Sent on every connection once connected, e.g. a
+                subscription; each then waits for its first data message
+            storm_config: Timeouts, hold time and message size limit.
+                Defaults to ``storm``
+        """
+        storm_config = storm_config or config.get('storm', {})
+        self.url = url
+        self.connections = connections
+        self.concurrency = max(1, concurrency)
+        self.message = message
+        self.connect_timeout = float(storm_config.get('connect_timeout', 10))
+        self.message_timeout = float(storm_config.get('message_timeout', 10))
+        self.hold = float(storm_config.get('hold', 0))
+        self.max_size = int(
+            float(storm_config.get('max_message_kb', 1024)) * 1024)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def run(self) -> StormResult:
+        """Run the storm to completion in a new event loop.
+
+        Returns:
+            Per-connection results; connections cut by ``cancel`` fail with
+            ``cancelled``
+        """
+        results = [ConnectionResult(i) for i in range(self.connections)]
+        start = time.monotonic()
+        watchdog.add_canceller(self.cancel)
+        try:
+            asyncio.run(self._storm(results))
+        finally:
+            watchdog.remove_canceller(self.cancel)
+        result = StormResult(results, time.monotonic() - start)
+        logger.info("WebSocket storm: %s", result.describe())
+        return result
+
+    def cancel(self):
+        """Stop the storm from any thread; open connections are dropped."""
+        with self._lock:
+            if self._loop is not None and self._task is not None:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _storm(self, results: List[ConnectionResult]):
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.current_task()
+        ssl_context = (ssl.create_default_context()
+                       if self.url.startswith('wss:') else None)
+        gate = asyncio.Semaphore(self.concurrency)
+        payload = (json.dumps(self.message)
+                   if self.message is not None else None)
+        # Set by the last connection to finish its setup
+        pending = [self.connections]
+        everyone_ready = asyncio.Event()
+        if not self.connections:
+            everyone_ready.set()
+
+        def ready():
+            pending[0] -= 1
+            if pending[0] == 0:
+                everyone_ready.set()
+
+        tasks = [
+            asyncio.ensure_future(
+                self._connection(result, gate, ssl_context, payload, ready,
+                                 everyone_ready)) for result in results
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if result.failure is None and (
+                        result.connect_time is None or
+                        (payload is not None
+                         and result.first_message_latency is None)):
+                    result.failure = 'cancelled'
+            logger.warning("WebSocket storm cancelled")
+        finally:
+            with self._lock:
+                self._loop = self._task = None
+
+    async def _connection(self, result: ConnectionResult,
+                          gate: asyncio.Semaphore,
+                          ssl_context: Optional[ssl.SSLContext],
+                          payload: Optional[str], ready,
+                          everyone_ready: asyncio.Event):
+        from websockets.asyncio.client import connect
+        from websockets.exceptions import WebSocketException
+
+        connection = None
+        try:
+            async with gate:
+                start = time.monotonic()
+                try:
+                    connection = await connect(
+                        self.url,
+                        ssl=ssl_context,
+                        compression=None,
+                        open_timeout=self.connect_timeout,
+                        ping_interval=None,
+                        close_timeout=1,
+                        max_size=self.max_size)
+                except asyncio.TimeoutError:
+                    raise StormFailure('connect timeout') from None
+                result.connect_time = time.monotonic() - start
+            if payload is not None:
+                sent = time.monotonic()
+                await connection.send(payload)
+                try:
+                    await asyncio.wait_for(
+                        self._first_message(connection, result),
+                        self.message_timeout)
+                except asyncio.TimeoutError:
+                    raise StormFailure('no message') from None
+                result.first_message_latency = time.monotonic() - sent
+        except (StormFailure, OSError, asyncio.TimeoutError,
+                WebSocketException) as e:
+            result.failure = _failure_reason(e)
+            logger.debug("Storm connection %d failed: %s", result.index, e)
+        finally:
+            ready()
+
+        if connection is None:
+            return
+        try:
+            if result.ok:
+                # Keep the fan-out up until everyone is set up, then hold
+                await everyone_ready.wait()
+                if self.hold > 0:
+                    await self._drain(connection, result, self.hold)
+        finally:
+            await connection.close()
+
+    async def _first_message(self, connection, result: ConnectionResult):
+        """Read until the subscription's first data message."""
+        while True:
+            message = await self._receive(connection, result)
+            if not isinstance(message, dict):
+                continue
+            code = message.get('code')
+            if code not in (None, 0):
+                raise StormFailure(f"error code {code}")
+            data = message.get('result')
+            if isinstance(data, dict) and data.get('data'):
+                return
+
+    async def _drain(self, connection, result: ConnectionResult,
+                     seconds: float):
+        """Keep reading (and counting) messages for ``seconds``."""
+        from websockets.exceptions import WebSocketException
+
+        try:
+            await asyncio.wait_for(self._read_forever(connection, result),
+                                   seconds)
+        except asyncio.TimeoutError:
+            pass
+        except (StormFailure, OSError, WebSocketException) as e:
+            # Dropped while holding: the server did not carry the fan-out
+            result.failure = f"dropped: {_failure_reason(e)}"
+
+    async def _read_forever(self, connection, result: ConnectionResult):
+        while True:
+            await self._receive(connection, result)
+
+    async def _receive(self, connection, result: ConnectionResult) -> Any:
+        """Next message, parsed if JSON text; answers exchange heartbeats."""
+        data = await connection.recv()
+        if isinstance(data, bytes):
+            result.messages += 1
+            return data
+        try:
+            message = json.loads(data)
+        except ValueError:
+            result.messages += 1
+            return data
+        if isinstance(message,
+                      dict) and message.get('method') == 'public/heartbeat':
+            await connection.send(
+                json.dumps({
+                    'id': message.get('id'),
+                    'method': 'public/respond-heartbeat'
+                }))
+            return message
+        result.messages += 1
+        return message
+
+
+def subscription_message(channel: str) -> Dict[str, Any]:
+    """Subscription request for one channel."""
+    return {"id": 1, "method": "subscribe", "params": {"channels": [channel]}}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Open many WebSocket connections at once")
+    parser.add_argument('--url',
+                        default=config.get('websocket', {}).get('url'),
+                        help="WebSocket URL. Defaults to websocket.url")
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--channel',
+                        help="Subscribe every connection to this channel")
+    parser.add_argument('--hold',
+                        type=float,
+                        help="Seconds to keep the connections open once "
+                        "all are set up. Defaults to storm.hold")
+    parser.add_argument('--json', action='store_true',
+                        help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    message = None
+    if args.channel:
+        message = subscription_message(args.channel)
+    storm_config = dict(config.get('storm', {}))
+    if args.hold is not None:
+        storm_config['hold'] = args.hold
+    storm = ConnectionStorm(args.url, args.connections, args.concurrency,
+                            message, storm_config)
+    result = storm.run()
+    if args.json:
+        print(json.dumps(result.summary(), indent=2))
+    else:
+        print(result.describe())
+    return 1 if result.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())